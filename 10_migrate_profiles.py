@@ -0,0 +1,72 @@
+"""
+Profile Migration Script
+Moves college from the skills table (where it was copied into every skill
+row) to one profiles row per user, and deletes the empty placeholder skill
+rows that only existed to hold it. Run once after upgrading; safe to run
+again - profiles saved since then are never overwritten.
+
+    python 10_migrate_profiles.py
+    python 10_migrate_profiles.py --drop-column   # also drop skills.college
+
+Only use --drop-column once no older copy of sapp.py still reads the column.
+"""
+
+import argparse
+import sqlite3
+import sys
+import os
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from sqlalchemy import text
+from sapp import app, db, Profile
+
+def migrate_profiles(drop_column=False):
+    with app.app_context():
+        try:
+            # Creates the profiles table if it is missing (never drops anything)
+            db.create_all()
+
+            columns = {row[1] for row in db.session.execute(text("PRAGMA table_info(skills)"))}
+            if "college" in columns:
+                print("🏫 Copying college from skills to profiles...")
+                # Every row of one save had the same college: take the newest per user
+                moved = db.session.execute(text("""
+                    INSERT INTO profiles (user_id, college, updated_at)
+                    SELECT s.user_id, trim(s.college), CURRENT_TIMESTAMP
+                    FROM skills s
+                    WHERE s.id IN (
+                        SELECT max(id) FROM skills
+                        WHERE college IS NOT NULL AND trim(college) NOT IN ('', 'Not Set')
+                        GROUP BY user_id
+                    )
+                    ON CONFLICT (user_id) DO NOTHING
+                """)).rowcount
+                print(f"   ✓ {moved} profiles created")
+            else:
+                print("ℹ️  skills.college is already gone - nothing to copy")
+
+            removed = db.session.execute(text("DELETE FROM skills WHERE trim(skill_name) = ''")).rowcount
+            print(f"   ✓ {removed} placeholder skill rows deleted")
+            db.session.commit()
+
+            if drop_column and "college" in columns:
+                if sqlite3.sqlite_version_info < (3, 35, 0):
+                    print(f"   ⚠️  SQLite {sqlite3.sqlite_version} cannot DROP COLUMN (needs 3.35) - column kept")
+                else:
+                    db.session.execute(text("ALTER TABLE skills DROP COLUMN college"))
+                    db.session.commit()
+                    print("   ✓ skills.college dropped")
+
+            print(f"\n✅ {Profile.query.count()} profiles")
+
+        except Exception as e:
+            db.session.rollback()
+            print(f"\n❌ Error migrating profiles: {e}")
+            sys.exit(1)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Move college from skills to profiles")
+    parser.add_argument("--drop-column", action="store_true", help="drop skills.college afterwards")
+    args = parser.parse_args()
+    migrate_profiles(args.drop_column)
@@ -0,0 +1,64 @@
+"""
+Message Archive Script
+Moves conversations with no message for --days days (default
+MESSAGE_ARCHIVE_AFTER_DAYS) from database.db to the attached archive file.
+Needs MESSAGE_ARCHIVE=1 (for every app, so they all read the archive).
+sapp.py already does this every MESSAGE_ARCHIVE_INTERVAL seconds; run this
+from cron when the server runs with the interval set to 0.
+
+    python 11_archive_messages.py
+    python 11_archive_messages.py --days 365 --dry-run
+    python 11_archive_messages.py --vacuum     # also shrink database.db
+
+Archived chats stay readable: /get-messages reads through to the archive.
+"""
+
+import argparse
+import time
+import sys
+import os
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from datetime import datetime, timedelta
+from sqlalchemy import text
+from sapp import app, db, archive_cold_messages
+import message_archive
+
+def archive_messages(days=message_archive.ARCHIVE_AFTER_DAYS, dry_run=False, vacuum=False):
+    with app.app_context():
+        try:
+            if not message_archive.archiving():
+                print("ℹ️  Archiving is off - set MESSAGE_ARCHIVE=1 for every app to use it")
+                return
+            db.create_all()
+            print(f"🗄️  Archive file: {message_archive.path}")
+
+            if dry_run:
+                cutoff = datetime.utcnow() - timedelta(days=days)
+                pairs = message_archive.cold_pairs(db.session, cutoff)
+                print(f"\n✅ {len(pairs)} conversations idle for {days}+ days would be archived")
+                return
+
+            started = time.perf_counter()
+            pairs, moved = archive_cold_messages(days)
+            print(f"\n✅ {moved} messages from {pairs} conversations archived "
+                  f"in {time.perf_counter() - started:.2f}s")
+
+            if vacuum and moved:
+                print("🧹 Vacuuming the main database...")
+                db.session.execute(text("VACUUM main"))
+                db.session.commit()
+
+        except Exception as e:
+            db.session.rollback()
+            print(f"\n❌ Error archiving messages: {e}")
+            sys.exit(1)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Move idle conversations to the message archive")
+    parser.add_argument("--days", type=int, default=message_archive.ARCHIVE_AFTER_DAYS)
+    parser.add_argument("--dry-run", action="store_true")
+    parser.add_argument("--vacuum", action="store_true", help="VACUUM database.db afterwards")
+    args = parser.parse_args()
+    archive_messages(args.days, args.dry_run, args.vacuum)
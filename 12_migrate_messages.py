@@ -0,0 +1,306 @@
+"""
+Message Migration Script
+Brings an existing deployment onto the one shared database
+(database.DATABASE_PATH: instance/database.db unless DATABASE_PATH is set)
+and the one messages table of message_service.py:
+
+  - alapp.py's own database.db next to the code is merged in. Its users
+    are matched to existing accounts by username, then email, or added;
+    its messages(sender TEXT, receiver TEXT, ...) rows are resolved to
+    those user ids. The file itself is left as it was and recorded in
+    legacy_imports, so it is never merged twice.
+  - A messages table with alapp.py's layout inside the shared database
+    (DATABASE_PATH pointing at alapp's file) is renamed to
+    messages_legacy_alapp and its rows are converted the same way.
+  - chatdb.py's chat_messages rows are added and the table is renamed to
+    chat_messages_legacy.
+
+Message ids are then assigned again over every source (archived messages
+included) in timestamp order: cursors, "last message" and the archive
+all take id order as send order. It is all one transaction, so a failed
+run changes nothing and can simply be repeated. Stop the apps while it
+runs. Afterwards the conversation summaries are rebuilt (history counts
+as read) and the stats counters reconciled.
+
+    python 12_migrate_messages.py
+    python 12_migrate_messages.py --drop-legacy   # also drop the old tables
+    python 12_migrate_messages.py --vacuum
+
+Legacy rows whose sender or receiver matches no user are skipped and
+listed below. Those of the shared database stay in messages_legacy_alapp,
+which --drop-legacy keeps while any are left.
+"""
+
+import argparse
+import time
+import sys
+import os
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from datetime import datetime
+import database
+import message_service
+from sapp import app, db, Conversation, rebuild_conversations, reconcile_counters
+
+LEGACY_TABLE = "messages_legacy_alapp"
+CHATDB_TABLE = "chat_messages"
+CHATDB_DONE = "chat_messages_legacy"
+ALAPP_SCHEMA = "alapp_db"
+USER_COLUMNS = ("username", "email", "password_hash", "role", "department",
+                "batch_year", "linkedin_url", "created_at")
+BATCH_SIZE = 1000
+
+# Tie-break for messages with the same timestamp
+SOURCE_SHARED, SOURCE_ALAPP_TABLE, SOURCE_ALAPP_FILE, SOURCE_CHATDB = range(4)
+
+def table_exists(conn, name, schema="main"):
+    return conn.execute(
+        f"SELECT 1 FROM {schema}.sqlite_master WHERE type = 'table' AND name = ?", (name,)
+    ).fetchone() is not None
+
+def attached(conn, schema):
+    return any(row[1] == schema for row in conn.execute("PRAGMA database_list"))
+
+def legacy_timestamp(value):
+    if not value:
+        return datetime.utcnow().strftime(message_service.TIMESTAMP_FORMAT)
+    return datetime.fromisoformat(str(value)).strftime(message_service.TIMESTAMP_FORMAT)
+
+def create_staging(conn):
+    conn.execute("""
+        CREATE TEMP TABLE merge_messages (
+            sender_id INTEGER NOT NULL,
+            receiver_id INTEGER NOT NULL,
+            content TEXT NOT NULL,
+            timestamp DATETIME,
+            client_id VARCHAR(64),
+            source INTEGER NOT NULL,
+            source_id INTEGER
+        )
+    """)
+
+def merge_users(conn):
+    """Match alapp.py's users to shared accounts (username, then email) or add them; returns ({old id: id}, added)"""
+    columns = ", ".join(USER_COLUMNS)
+    placeholders = ", ".join("?" for _ in USER_COLUMNS)
+    user_ids, added = {}, 0
+    for row in conn.execute(f"SELECT id, {columns} FROM {ALAPP_SCHEMA}.users ORDER BY id").fetchall():
+        old_id, values = row[0], tuple(row)[1:]
+        match = (
+            conn.execute("SELECT id FROM main.users WHERE username = ? ORDER BY id LIMIT 1", (values[0],)).fetchone()
+            or conn.execute("SELECT id FROM main.users WHERE email = ? ORDER BY id LIMIT 1", (values[1],)).fetchone()
+        )
+        if match:
+            user_ids[old_id] = match[0]
+        else:
+            user_ids[old_id] = conn.execute(
+                f"INSERT INTO main.users ({columns}) VALUES ({placeholders})", values
+            ).lastrowid
+            added += 1
+    return user_ids, added
+
+def file_resolver(conn, user_ids):
+    """User id in the shared database for a sender/receiver value of alapp.py's old file"""
+    def resolve(value):
+        # Same order as message_service.resolve_user: an id, else a username
+        if value.isdigit() and int(value) in user_ids:
+            return user_ids[int(value)]
+        row = conn.execute(
+            f"SELECT id FROM {ALAPP_SCHEMA}.users WHERE username = ? ORDER BY id LIMIT 1", (value,)
+        ).fetchone()
+        return user_ids.get(row[0]) if row else None
+    return resolve
+
+def stage_alapp_rows(conn, source_table, resolve, source):
+    """Copy alapp.py-layout rows into merge_messages with resolved user ids; returns (staged, unresolved rows)"""
+    cache, staged, unresolved = {}, 0, []
+    def user_id(value):
+        value = str(value).strip() if value is not None else ""
+        if value not in cache:
+            cache[value] = resolve(value) if value else None
+        return cache[value]
+
+    rows_cursor = conn.cursor()
+    rows_cursor.execute(f"SELECT id, sender, receiver, content, timestamp FROM {source_table} ORDER BY id")
+    while True:
+        rows = rows_cursor.fetchmany(BATCH_SIZE)
+        if not rows:
+            break
+        batch = []
+        for msg_id, sender, receiver, content, timestamp in rows:
+            sender_id, receiver_id = user_id(sender), user_id(receiver)
+            if sender_id is None or receiver_id is None or content is None:
+                unresolved.append((msg_id, sender, receiver))
+                continue
+            batch.append((sender_id, receiver_id, content, legacy_timestamp(timestamp), source, msg_id))
+        conn.executemany("""
+            INSERT INTO temp.merge_messages (sender_id, receiver_id, content, timestamp, source, source_id)
+            VALUES (?, ?, ?, ?, ?, ?)
+        """, batch)
+        staged += len(batch)
+        print(f"   … {staged} staged")
+    return staged, unresolved
+
+def stage_chatdb(conn):
+    """Copy chat_messages into merge_messages and retire the table; returns rows staged"""
+    staged = conn.execute(f"""
+        INSERT INTO temp.merge_messages (sender_id, receiver_id, content, timestamp, source, source_id)
+        SELECT sender_id, receiver_id, content, timestamp, {SOURCE_CHATDB}, id FROM {CHATDB_TABLE}
+    """).rowcount
+    conn.execute(f"ALTER TABLE {CHATDB_TABLE} RENAME TO {CHATDB_DONE}")
+    return staged
+
+def renumber(conn):
+    """
+    Rewrite messages from the shared table, the archive and everything
+    staged, with ids in (timestamp, source, old id) order; returns rows written
+    """
+    conn.execute(f"""
+        INSERT INTO temp.merge_messages (sender_id, receiver_id, content, timestamp, client_id, source, source_id)
+        SELECT sender_id, receiver_id, content, timestamp, client_id, {SOURCE_SHARED}, id FROM main.messages
+    """)
+    if attached(conn, "archive"):
+        # Archived rows come back to the hot table; the archiver moves them out again.
+        # A row left in both files by an interrupted archive run is taken once.
+        conn.execute(f"""
+            INSERT INTO temp.merge_messages (sender_id, receiver_id, content, timestamp, client_id, source, source_id)
+            SELECT sender_id, receiver_id, content, timestamp, client_id, {SOURCE_SHARED}, id FROM archive.messages
+            WHERE id NOT IN (SELECT id FROM main.messages)
+        """)
+        conn.execute("DELETE FROM archive.messages")
+    conn.execute("DELETE FROM main.messages")
+    return conn.execute("""
+        INSERT INTO main.messages (id, sender_id, receiver_id, content, timestamp, client_id)
+        SELECT row_number() OVER (ORDER BY timestamp, source, source_id),
+               sender_id, receiver_id, content, timestamp, client_id
+        FROM temp.merge_messages
+    """).rowcount
+
+def print_unresolved(unresolved, kept_in):
+    for msg_id, sender, receiver in unresolved[:20]:
+        print(f"      #{msg_id}: {sender!r} -> {receiver!r} (unknown user or empty message)")
+    if len(unresolved) > 20:
+        print(f"      … and {len(unresolved) - 20} more in {kept_in}")
+
+def migrate_messages(drop_legacy=False, vacuum=False):
+    with app.app_context():
+        conn = None
+        try:
+            path = database.DATABASE_PATH
+            print(f"📂 Database: {path}")
+            # users, chat tables, ... the merge below writes into, with the
+            # columns they lack (sapp.py skips this while messages is legacy);
+            # messages itself is brought up to date after its conversion
+            with db.engine.begin() as schema_conn:
+                tables = [t for t in db.metadata.sorted_tables if t.name != message_service.TABLE_NAME]
+                for statement in message_service.schema_statements(schema_conn, tables):
+                    message_service.execute(schema_conn, statement)
+
+            conn = database.connect(path)
+            conn.isolation_level = None   # explicit BEGIN/COMMIT so the DDL is part of the transaction
+            started = time.perf_counter()
+
+            alapp_file = database.ALAPP_LEGACY_PATH
+            merge_file = message_service.legacy_file_pending(conn, alapp_file)
+            if merge_file:
+                conn.execute(f"ATTACH DATABASE ? AS {ALAPP_SCHEMA}", (alapp_file,))
+            create_staging(conn)
+
+            staged = 0
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                if message_service.is_legacy(conn):
+                    print("💬 Converting alapp.py's messages table...")
+                    conn.execute(f"ALTER TABLE messages RENAME TO {LEGACY_TABLE}")
+                    count, unresolved = stage_alapp_rows(
+                        conn, LEGACY_TABLE, lambda v: message_service.resolve_user(conn, v), SOURCE_ALAPP_TABLE
+                    )
+                    # Only the rows that could not be converted stay behind
+                    conn.execute(f"""
+                        DELETE FROM {LEGACY_TABLE} WHERE id IN
+                            (SELECT source_id FROM temp.merge_messages WHERE source = {SOURCE_ALAPP_TABLE})
+                    """)
+                    staged += count
+                    print(f"   ✓ {count} messages converted, {len(unresolved)} skipped")
+                    print_unresolved(unresolved, LEGACY_TABLE)
+                else:
+                    print("ℹ️  messages already uses the shared layout")
+                message_service.ensure_schema(conn)
+
+                if merge_file:
+                    print(f"💬 Merging alapp.py's {alapp_file}...")
+                    user_ids, added = merge_users(conn) if table_exists(conn, "users", ALAPP_SCHEMA) else ({}, 0)
+                    print(f"   ✓ {added} users added, {len(user_ids) - added} matched to existing accounts")
+                    if table_exists(conn, "messages", ALAPP_SCHEMA):
+                        count, unresolved = stage_alapp_rows(
+                            conn, f"{ALAPP_SCHEMA}.messages", file_resolver(conn, user_ids), SOURCE_ALAPP_FILE
+                        )
+                        staged += count
+                        print(f"   ✓ {count} messages merged, {len(unresolved)} skipped")
+                        print_unresolved(unresolved, alapp_file)
+                    conn.execute(f"""
+                        CREATE TABLE IF NOT EXISTS {message_service.LEGACY_IMPORTS} (
+                            source TEXT PRIMARY KEY,
+                            imported_at DATETIME
+                        )
+                    """)
+                    conn.execute(
+                        f"INSERT INTO {message_service.LEGACY_IMPORTS} (source, imported_at) VALUES (?, ?)",
+                        (os.path.realpath(alapp_file), datetime.utcnow().strftime(message_service.TIMESTAMP_FORMAT))
+                    )
+
+                if table_exists(conn, CHATDB_TABLE):
+                    print("💬 Merging chatdb.py's chat_messages...")
+                    count = stage_chatdb(conn)
+                    staged += count
+                    print(f"   ✓ {count} messages merged")
+
+                if staged:
+                    print("🔢 Numbering messages in timestamp order...")
+                    print(f"   ✓ {renumber(conn)} messages")
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+            if merge_file:
+                conn.execute(f"DETACH DATABASE {ALAPP_SCHEMA}")
+
+            print("💬 Rebuilding conversation summaries...")
+            rebuild_conversations()
+            reconcile_counters()
+
+            if drop_legacy:
+                if table_exists(conn, LEGACY_TABLE):
+                    left = conn.execute(f"SELECT count(*) FROM {LEGACY_TABLE}").fetchone()[0]
+                    if left:
+                        print(f"   ⚠️  {left} rows of {LEGACY_TABLE} were not migrated - table kept")
+                    else:
+                        conn.execute(f"DROP TABLE {LEGACY_TABLE}")
+                        print(f"   ✓ {LEGACY_TABLE} dropped")
+                if table_exists(conn, CHATDB_DONE):
+                    conn.execute(f"DROP TABLE {CHATDB_DONE}")
+                    print(f"   ✓ {CHATDB_DONE} dropped")
+
+            if vacuum:
+                print("🧹 Vacuuming...")
+                conn.execute("VACUUM")
+
+            total = conn.execute("SELECT count(*) FROM messages").fetchone()[0]
+            print(f"\n✅ {total} messages, {Conversation.query.count()} conversation rows "
+                  f"in {time.perf_counter() - started:.2f}s")
+
+        except Exception as e:
+            db.session.rollback()
+            print(f"\n❌ Error migrating messages: {e}")
+            sys.exit(1)
+        finally:
+            if conn is not None:
+                conn.close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Merge the old chat tables and alapp.py's database into the shared one")
+    parser.add_argument("--drop-legacy", action="store_true", help="drop the old tables afterwards")
+    parser.add_argument("--vacuum", action="store_true", help="VACUUM the database afterwards")
+    args = parser.parse_args()
+    migrate_messages(args.drop_legacy, args.vacuum)
@@ -10,6 +10,7 @@ import os
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
 from sapp import app, db, User, Skill, Event, Job, Message
+import message_archive
 
 def init_database():
     """Initialize the database with all tables"""
@@ -18,6 +19,8 @@ def init_database():
             # Drop all existing tables (WARNING: Deletes all data)
             print("⚠️  Dropping existing tables...")
             db.drop_all()
+            # Archived chat history would otherwise collide with the new message ids
+            message_archive.clear(db.session)
             
             # Create all tables fresh
             print("📦 Creating new tables...")
@@ -4,6 +4,7 @@ import os
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
 from sapp import app, db, User, Message, bcrypt
+import message_service
 from datetime import datetime
 
 def create_test_users():
@@ -70,34 +71,19 @@ def create_test_users():
             # Alice → Bob
             msg1 = Message.query.filter_by(sender_id=alice.id, receiver_id=bob.id).first()
             if not msg1:
-                msg1 = Message(
-                    sender_id=alice.id,
-                    receiver_id=bob.id,
-                    content="Hey Bob! Welcome to the alumni network! 👋"
-                )
-                db.session.add(msg1)
+                message_service.send(db.session, alice.id, bob.id, "Hey Bob! Welcome to the alumni network! 👋")
                 print(f"✅ Alice → Bob: Welcome message")
             
             # Bob → Alice
             msg2 = Message.query.filter_by(sender_id=bob.id, receiver_id=alice.id).first()
             if not msg2:
-                msg2 = Message(
-                    sender_id=bob.id,
-                    receiver_id=alice.id,
-                    content="Thanks Alice! Happy to be here! 😊"
-                )
-                db.session.add(msg2)
+                message_service.send(db.session, bob.id, alice.id, "Thanks Alice! Happy to be here! 😊")
                 print(f"✅ Bob → Alice: Reply message")
             
             # Carol → Bob
             msg3 = Message.query.filter_by(sender_id=carol.id, receiver_id=bob.id).first()
             if not msg3:
-                msg3 = Message(
-                    sender_id=carol.id,
-                    receiver_id=bob.id,
-                    content="Hi Bob! Let me know if you need any career advice."
-                )
-                db.session.add(msg3)
+                message_service.send(db.session, carol.id, bob.id, "Hi Bob! Let me know if you need any career advice.")
                 print(f"✅ Carol → Bob: Mentoring message")
             
             db.session.commit()
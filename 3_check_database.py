@@ -1,101 +1,257 @@
 """
 Database Checker - Use this to debug database issues
-Run this anytime to see what's in your database
+Prints a health and statistics report for the sapp.py database: row
+counts, table/index sizes, index usage of the hot queries, orphaned
+foreign keys, duplicate users, counter drift and journal/WAL state.
+
+Everything is aggregate SQL (no rows are loaded into Python), so it stays
+fast on large databases. Exits with status 1 if any problem is found.
 """
 
+import importlib
 import sys
 import os
+import time
 
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
-from app import app, db, User, Message, Event, Job, Skill
+from sqlalchemy import text
+from sapp import app, db, actual_counts, StatCounter
+import message_archive
+import message_service
+
+# Full scans of smaller tables are cheaper than an index and are not reported
+SCAN_WARNING_ROWS = 1000
+
+# (child table, column, parent table) for every reference to a user or event
+REFERENCES = [
+    ("messages", "sender_id", "users"),
+    ("messages", "receiver_id", "users"),
+    ("skills", "user_id", "users"),
+    ("profiles", "user_id", "users"),
+    ("events", "created_by", "users"),
+    ("jobs", "posted_by", "users"),
+    ("sessions", "user_id", "users"),
+    ("conversations", "user_id", "users"),
+    ("event_rsvps", "user_id", "users"),
+    ("event_rsvps", "event_id", "events"),
+    ("event_seats", "event_id", "events"),
+    ("mentor_recommendations", "student_id", "users"),
+    ("mentor_recommendations", "alumni_id", "users"),
+]
+
+def scalar(sql, **params):
+    return db.session.execute(text(sql), params).scalar()
+
+def rows(sql, **params):
+    return db.session.execute(text(sql), params).fetchall()
+
+def heading(title):
+    print(f"\n{title}")
+    print("-" * 70)
+
+def human_size(n):
+    for unit in ("B", "KB", "MB", "GB"):
+        if n < 1024 or unit == "GB":
+            return f"{n:.0f} {unit}" if unit == "B" else f"{n:.1f} {unit}"
+        n /= 1024
+
+def existing_tables():
+    return [name for (name,) in rows(
+        "SELECT name FROM sqlite_master WHERE type = 'table' AND name NOT LIKE 'sqlite_%' "
+        "AND name NOT LIKE 'users_fts_%' AND name NOT LIKE 'jobs_fts_%' ORDER BY name"
+    )]
+
+def report_storage():
+    heading("💾 STORAGE & JOURNAL:")
+    path = db.engine.url.database
+    page_size = scalar("PRAGMA page_size")
+    pages = scalar("PRAGMA page_count")
+    free = scalar("PRAGMA freelist_count")
+    wal_path = f"{path}-wal"
+    wal_size = os.path.getsize(wal_path) if os.path.exists(wal_path) else 0
+
+    print(f"   File:            {path}")
+    print(f"   Size:            {human_size(page_size * pages)} ({pages:,} pages of {page_size} B)")
+    print(f"   Free pages:      {free:,} ({human_size(page_size * free)} reclaimable with VACUUM)")
+    print(f"   Journal mode:    {scalar('PRAGMA journal_mode')}")
+    print(f"   Synchronous:     {scalar('PRAGMA synchronous')} (0=OFF 1=NORMAL 2=FULL)")
+    print(f"   WAL file:        {human_size(wal_size)} (autocheckpoint every {scalar('PRAGMA wal_autocheckpoint')} pages)")
+    if message_archive.enabled():
+        archive_size = scalar("PRAGMA archive.page_size") * scalar("PRAGMA archive.page_count")
+        archived = scalar("SELECT count(*) FROM archive.messages")
+        print(f"   Message archive: {message_archive.path}")
+        print(f"                    {human_size(archive_size)}, {archived:,} messages")
+    return []
+
+def report_tables(tables):
+    heading("📊 TABLES (rows, size incl. indexes):")
+    sizes = {}
+    try:
+        # dbstat needs SQLITE_ENABLE_DBSTAT_VTAB (standard in the python.org / Debian builds)
+        sizes = dict(rows("SELECT name, sum(pgsize) FROM dbstat GROUP BY name"))
+    except Exception:
+        db.session.rollback()
+        print("   ℹ️  dbstat is not available in this SQLite build - sizes skipped")
+
+    index_sizes = {}
+    for name, tbl_name in rows("SELECT name, tbl_name FROM sqlite_master WHERE type = 'index'"):
+        index_sizes[tbl_name] = index_sizes.get(tbl_name, 0) + sizes.get(name, 0)
+    # The full-text indexes live in their shadow tables
+    for fts in ("users_fts", "jobs_fts"):
+        sizes[fts] = sum(size for name, size in sizes.items() if name.startswith(f"{fts}_"))
+
+    counts = {}
+    for table in tables:
+        counts[table] = scalar(f'SELECT count(*) FROM "{table}"')
+        size = ""
+        if sizes:
+            size = f"{human_size(sizes.get(table, 0)):>10s} data  {human_size(index_sizes.get(table, 0)):>10s} indexes"
+        print(f"   {table:28s} {counts[table]:>12,d}   {size}")
+    return counts
+
+def report_message_schema(tables):
+    heading("💬 MESSAGE SCHEMA:")
+    problems = []
+    if "messages" in tables and message_service.is_legacy(db.session):
+        print("   ⚠️  messages still has alapp.py's sender/receiver text layout")
+        problems.append("legacy messages table")
+    if "chat_messages" in tables:
+        print(f"   ⚠️  chat_messages still holds {scalar('SELECT count(*) FROM chat_messages'):,} unmerged messages")
+        problems.append("unmerged chat_messages")
+    if problems:
+        print("   Run 12_migrate_messages.py to merge them")
+    else:
+        print("   ✓ One messages table shared by every app")
+    return problems
+
+def report_indexes(counts):
+    heading("🗂️  INDEXES:")
+    problems = []
+    present = {name for (name,) in rows("SELECT name FROM sqlite_master WHERE type = 'index'")}
+    for table in db.metadata.sorted_tables:
+        for index in sorted(table.indexes, key=lambda i: i.name):
+            if index.name not in present:
+                print(f"   ❌ {index.name} is missing - run 4_migrate_indexes.py")
+                problems.append(f"missing index {index.name}")
+
+    try:
+        stats = rows(
+            "SELECT tbl, idx, stat FROM sqlite_stat1 "
+            "WHERE idx IS NOT NULL AND tbl NOT LIKE 'users_fts%' AND tbl NOT LIKE 'jobs_fts%' ORDER BY tbl, idx"
+        )
+    except Exception:
+        db.session.rollback()
+        stats = []
+    if stats:
+        print("   Rows per key (sqlite_stat1, from the last ANALYZE):")
+        for tbl, idx, stat in stats:
+            parts = stat.split()
+            print(f"      {idx:36s} {tbl:20s} {parts[0]:>10s} rows, {' / '.join(parts[1:])}")
+    else:
+        print("   ℹ️  No ANALYZE statistics - run 4_migrate_indexes.py")
+
+    print("\n   Hot query plans:")
+    migrate = importlib.import_module("4_migrate_indexes")
+    for label, stmt in migrate.sample_queries():
+        sql = str(stmt.compile(db.engine, compile_kwargs={"literal_binds": True}))
+        plan = "; ".join(row[-1] for row in rows(f"EXPLAIN QUERY PLAN {sql}"))
+        full_scan = any(
+            step.startswith("SCAN ") and "USING" not in step
+            and counts.get(step.split()[1], 0) >= SCAN_WARNING_ROWS
+            for step in plan.split("; ")
+        )
+        print(f"   {'⚠️ ' if full_scan else '✓ '} {label:28s} {plan}")
+        if full_scan:
+            problems.append(f"full table scan in {label}")
+    return problems
+
+def report_orphans(tables):
+    heading("🔗 ORPHANED REFERENCES:")
+    problems = []
+    for child, column, parent in REFERENCES:
+        if child not in tables or parent not in tables:
+            continue
+        # Grouping first walks the child's index once; only distinct ids are looked up
+        orphans = scalar(f"""
+            SELECT coalesce(sum(n), 0) FROM (
+                SELECT {column} AS ref, count(*) AS n FROM "{child}"
+                WHERE {column} IS NOT NULL GROUP BY {column}
+            ) WHERE ref NOT IN (SELECT id FROM "{parent}")
+        """)
+        if orphans:
+            print(f"   ❌ {child}.{column}: {orphans:,} rows point at missing {parent}")
+            problems.append(f"{orphans} orphaned {child}.{column}")
+    if not problems:
+        print("   ✓ None")
+    return problems
+
+def report_duplicates():
+    heading("👥 DUPLICATE USERS:")
+    problems = []
+    for label, expr in (("username", "username"), ("email", "lower(email)")):
+        dupes = rows(f"""
+            SELECT {expr} AS value, count(*) AS n FROM users
+            GROUP BY {expr} HAVING count(*) > 1 ORDER BY n DESC LIMIT 10
+        """)
+        for value, n in dupes:
+            print(f"   ❌ {label} '{value}' is used by {n} users")
+        if dupes:
+            problems.append(f"duplicate {label}s")
+    if not problems:
+        print("   ✓ None")
+    return problems
+
+def report_counters():
+    heading("🔢 DASHBOARD COUNTERS:")
+    actual = actual_counts()
+    stored = {c.name: c.value for c in StatCounter.query.all()}
+    drifted = [name for name in sorted(set(actual) | set(stored)) if stored.get(name) != actual.get(name, 0)]
+    for name in drifted:
+        print(f"   ⚠️  {name:20s} stored {stored.get(name)} but actually {actual.get(name, 0)}")
+    if drifted:
+        print("   Run 6_reconcile_stats.py to fix")
+        return ["counter drift"]
+    print("   ✓ In sync")
+    return []
 
 def check_database():
     """Check the current state of the database"""
     with app.app_context():
         try:
+            started = time.perf_counter()
             print("\n" + "="*70)
-            print("DATABASE STATUS CHECK")
+            print("DATABASE HEALTH CHECK")
             print("="*70)
-            
-            # Check Users
-            print("\n👥 USERS TABLE:")
-            print("-" * 70)
-            users = User.query.all()
-            if users:
-                for u in users:
-                    print(f"   ID: {u.id:3d} | {u.username:20s} | Role: {u.role:8s} | {u.department}")
-            else:
-                print("   ⚠️  No users found!")
-            print(f"\n   Total Users: {len(users)}")
-            
-            # Check Messages
-            print("\n💬 MESSAGES TABLE:")
-            print("-" * 70)
-            messages = Message.query.all()
-            if messages:
-                for m in messages:
-                    sender = User.query.get(m.sender_id)
-                    receiver = User.query.get(m.receiver_id)
-                    sender_name = sender.username if sender else "Unknown"
-                    receiver_name = receiver.username if receiver else "Unknown"
-                    preview = m.content[:40] + "..." if len(m.content) > 40 else m.content
-                    print(f"   {sender_name} → {receiver_name}: {preview}")
-            else:
-                print("   ℹ️  No messages found")
-            print(f"\n   Total Messages: {len(messages)}")
-            
-            # Check Events
-            print("\n📅 EVENTS TABLE:")
-            print("-" * 70)
-            events = Event.query.all()
-            if events:
-                for e in events:
-                    print(f"   ID: {e.id:3d} | {e.title[:40]:40s} | {e.event_date}")
-            else:
-                print("   ℹ️  No events found")
-            print(f"\n   Total Events: {len(events)}")
-            
-            # Check Jobs
-            print("\n💼 JOBS TABLE:")
-            print("-" * 70)
-            jobs = Job.query.all()
-            if jobs:
-                for j in jobs:
-                    print(f"   ID: {j.id:3d} | {j.role:30s} | {j.company_name}")
-            else:
-                print("   ℹ️  No jobs found")
-            print(f"\n   Total Jobs: {len(jobs)}")
-            
-            # Check Skills
-            print("\n⭐ SKILLS TABLE:")
-            print("-" * 70)
-            skills = Skill.query.all()
-            if skills:
-                skill_count = {}
-                for s in skills:
-                    user = User.query.get(s.user_id)
-                    username = user.username if user else "Unknown"
-                    if username not in skill_count:
-                        skill_count[username] = []
-                    if s.skill_name:
-                        skill_count[username].append(s.skill_name)
-                
-                for username, user_skills in skill_count.items():
-                    skills_str = ", ".join(user_skills) if user_skills else "No skills"
-                    print(f"   {username}: {skills_str}")
+
+            tables = existing_tables()
+            problems = []
+            problems += report_storage()
+            problems += report_message_schema(tables)
+            counts = report_tables(tables)
+            if message_service.is_legacy(db.session):
+                print("\n   ℹ️  Index, query plan and reference checks skipped until messages is migrated")
             else:
-                print("   ℹ️  No skills found")
-            print(f"\n   Total Skill Entries: {len(skills)}")
-            
+                problems += report_indexes(counts)
+                problems += report_orphans(tables)
+            problems += report_duplicates()
+            if "stats_counters" in tables:
+                problems += report_counters()
+
             print("\n" + "="*70)
-            print("✅ Database check complete!")
+            elapsed = time.perf_counter() - started
+            if problems:
+                print(f"⚠️  {len(problems)} problem(s) found in {elapsed:.2f}s: {', '.join(problems)}")
+            else:
+                print(f"✅ Database check complete - no problems ({elapsed:.2f}s)")
             print("="*70 + "\n")
-            
+            if problems:
+                sys.exit(1)
+
         except Exception as e:
+            db.session.rollback()
             print(f"\n❌ Error checking database: {e}")
-            import traceback
-            traceback.print_exc()
+            sys.exit(1)
 
 if __name__ == "__main__":
     check_database()
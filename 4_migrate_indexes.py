@@ -0,0 +1,114 @@
+"""
+Index Migration Script
+Adds the model indexes (and any nullable model columns the tables are
+still missing, which some indexes need) to an existing database.db
+without dropping data. Safe to run any number of times - existing
+columns and indexes are skipped.
+"""
+
+import sys
+import os
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from sqlalchemy import select, text
+from sapp import app, db, Event, Job, Message, profile_query
+import job_search
+import search_index
+
+def sample_queries():
+    """The hot read paths, built the same way the routes build them"""
+    return [
+        ("get_messages", select(Message).filter(Message.pair_filter(1, 2)).order_by(Message.id.desc()).limit(51)),
+        ("get_chat_users (sent)", select(Message.receiver_id).filter(Message.sender_id == 1)),
+        ("get_chat_users (received)", select(Message.sender_id).filter(Message.receiver_id == 1)),
+        ("get_profile", profile_query([1])),
+        ("events by date", select(Event).order_by(Event.event_date.asc())),
+        ("calendar month (one-off)", select(Event).filter(Event.recurrence.is_(None), Event.event_date.between("2026-02-01", "2026-02-28"))),
+        ("calendar month (series)", select(Event).filter(Event.series_end >= "2026-02-01", Event.event_date <= "2026-02-28")),
+        ("jobs newest first", select(Job).order_by(Job.created_at.desc())),
+    ]
+
+def print_query_plans(heading):
+    print(f"\n🔍 EXPLAIN QUERY PLAN ({heading}):")
+    print("-" * 70)
+    for label, stmt in sample_queries():
+        sql = str(stmt.compile(db.engine, compile_kwargs={"literal_binds": True}))
+        try:
+            plan = db.session.execute(text(f"EXPLAIN QUERY PLAN {sql}")).fetchall()
+            details = "; ".join(row[-1] for row in plan)
+        except Exception as e:
+            db.session.rollback()
+            details = f"unavailable ({e.__class__.__name__})"
+        print(f"   {label:28s} {details}")
+
+def add_missing_columns():
+    """ALTER TABLE ... ADD COLUMN for nullable model columns the database lacks"""
+    added = 0
+    for table in db.metadata.sorted_tables:
+        present = {row[1] for row in db.session.execute(text(f"PRAGMA table_info({table.name})"))}
+        for column in table.columns:
+            if column.name in present:
+                continue
+            if not column.nullable:
+                print(f"   ⚠️  {table.name}.{column.name} is NOT NULL - recreate the table with 1_init_database.py")
+                continue
+            column_type = column.type.compile(dialect=db.engine.dialect)
+            db.session.execute(text(f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}"))
+            print(f"   ✓ {table.name}.{column.name} ({column_type})")
+            added += 1
+    db.session.commit()
+    return added
+
+def migrate_indexes():
+    """Create every index declared on the models that is missing from the database"""
+    with app.app_context():
+        try:
+            # Create any table that does not exist yet (never drops anything)
+            db.create_all()
+
+            print("\n📦 Adding columns...")
+            add_missing_columns()
+            print_query_plans("before")
+
+            print("\n📦 Adding indexes...")
+            created, skipped, failed = 0, 0, 0
+            for table in db.metadata.sorted_tables:
+                existing = {
+                    row[0] for row in db.session.execute(
+                        text("SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = :t"),
+                        {"t": table.name}
+                    )
+                }
+                for index in sorted(table.indexes, key=lambda i: i.name):
+                    if index.name in existing:
+                        print(f"   ℹ️  {index.name} already exists")
+                        skipped += 1
+                        continue
+                    try:
+                        index.create(bind=db.engine)
+                        print(f"   ✓ {index.name}")
+                        created += 1
+                    except Exception as e:
+                        print(f"   ❌ {index.name}: {e.__class__.__name__}: {e}")
+                        failed += 1
+
+            # Full-text user and job search tables and their sync triggers
+            search_index.ensure_index(db.session)
+            job_search.ensure_index(db.session)
+
+            db.session.execute(text("ANALYZE"))
+            db.session.commit()
+
+            print_query_plans("after")
+            print(f"\n✅ Index migration complete: {created} created, {skipped} already present, {failed} failed")
+            if failed:
+                sys.exit(1)
+
+        except Exception as e:
+            db.session.rollback()
+            print(f"\n❌ Error migrating indexes: {e}")
+            sys.exit(1)
+
+if __name__ == "__main__":
+    migrate_indexes()
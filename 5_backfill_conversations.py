@@ -0,0 +1,32 @@
+"""
+Conversation Backfill Script
+Builds the conversations summary table (chat sidebar) from existing messages.
+Run once after upgrading; new messages keep the table current by themselves.
+Existing history is marked as read.
+"""
+
+import sys
+import os
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from sapp import app, db, Conversation, Message, rebuild_conversations
+
+def backfill_conversations():
+    with app.app_context():
+        try:
+            # Creates the conversations table if it is missing (never drops anything)
+            db.create_all()
+
+            print("💬 Rebuilding conversation summaries...")
+            rebuild_conversations()
+
+            print(f"\n✅ {Conversation.query.count()} conversation rows built from {Message.query.count()} messages")
+
+        except Exception as e:
+            db.session.rollback()
+            print(f"\n❌ Error backfilling conversations: {e}")
+            sys.exit(1)
+
+if __name__ == "__main__":
+    backfill_conversations()
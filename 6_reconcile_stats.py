@@ -0,0 +1,33 @@
+"""
+Stats Reconciliation Script
+Recounts users, events and jobs and corrects the /dashboard-stats counters.
+sapp.py already does this every STATS_RECONCILE_INTERVAL seconds; run this
+from cron when the server runs with the interval set to 0.
+"""
+
+import sys
+import os
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from sapp import app, db, reconcile_counters
+
+def reconcile_stats():
+    with app.app_context():
+        try:
+            db.create_all()
+            drift = reconcile_counters()
+
+            if drift:
+                print("\n⚠️  Counters that had drifted:")
+                for name, (was, now) in sorted(drift.items()):
+                    print(f"   {name:20s} {was} → {now}")
+            print("\n✅ Stats counters are in sync")
+
+        except Exception as e:
+            db.session.rollback()
+            print(f"\n❌ Error reconciling stats: {e}")
+            sys.exit(1)
+
+if __name__ == "__main__":
+    reconcile_stats()
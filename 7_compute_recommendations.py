@@ -0,0 +1,37 @@
+"""
+Mentor Recommendation Batch Job
+Scores every student against every relevant alumnus and stores the top
+matches in mentor_recommendations. Run nightly (cron) or after a bulk import;
+sapp.py's background thread only scores new and changed students.
+"""
+
+import sys
+import os
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from sapp import app, db, MentorRecommendation
+import recommendations
+from skill_index import skill_index
+
+def compute_recommendations():
+    with app.app_context():
+        try:
+            db.create_all()
+
+            print("🤝 Computing mentor recommendations...")
+            started = time.perf_counter()
+            students = recommendations.compute_all(db.session, skill_index)
+            elapsed = time.perf_counter() - started
+
+            print(f"\n✅ {MentorRecommendation.query.count()} recommendations stored "
+                  f"for {students} students in {elapsed:.2f}s")
+
+        except Exception as e:
+            db.session.rollback()
+            print(f"\n❌ Error computing recommendations: {e}")
+            sys.exit(1)
+
+if __name__ == "__main__":
+    compute_recommendations()
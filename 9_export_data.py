@@ -0,0 +1,46 @@
+"""
+Data Export Script
+Streams users, messages, events or jobs to a file (or stdout) as NDJSON
+or CSV - the same export as GET /export/<kind>, with constant memory.
+
+    python 9_export_data.py messages -o messages.jsonl
+    python 9_export_data.py users --format csv --gzip -o users.csv.gz
+"""
+
+import argparse
+import sys
+import os
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from sapp import app, db, export_tables
+import export
+
+def export_data(kind, fmt="ndjson", gzip=False, output=None):
+    with app.app_context():
+        try:
+            stmt = export.build_statement(kind, export_tables())
+            out = open(output, "wb") if output else sys.stdout.buffer
+            written = 0
+            try:
+                for chunk in export.encode(export.iter_chunks(db.engine, stmt, fmt), gzip=gzip):
+                    out.write(chunk)
+                    written += len(chunk)
+            finally:
+                if output:
+                    out.close()
+            if output:
+                print(f"✅ Exported {kind} to {output} ({written:,} bytes)", file=sys.stderr)
+
+        except (OSError, ValueError) as e:
+            print(f"\n❌ Error exporting {kind}: {e}", file=sys.stderr)
+            sys.exit(1)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export users, messages, events or jobs")
+    parser.add_argument("kind", choices=export.KINDS)
+    parser.add_argument("--format", choices=list(export.FORMATS), default="ndjson")
+    parser.add_argument("--gzip", action="store_true")
+    parser.add_argument("-o", "--output", help="file to write (default: stdout)")
+    args = parser.parse_args()
+    export_data(args.kind, args.format, args.gzip, args.output)
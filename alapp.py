@@ -1,54 +1,61 @@
 from flask import Flask, request, jsonify
 from flask_cors import CORS
-import sqlite3
-import hashlib
-from datetime import datetime
+import database
+import hashing
+import message_service
+import write_behind
 
 alapp = Flask(__name__)
 CORS(alapp)
 
-DB_NAME = "database.db"
+DB_NAME = database.DATABASE_PATH
+
+# Connections are reused across requests instead of opened per request
+pool = database.ConnectionPool(DB_NAME, max_size=8)
 
 def get_db():
-    conn = sqlite3.connect(DB_NAME)
-    conn.row_factory = sqlite3.Row
-    return conn
+    """Borrow a pooled connection: `with get_db() as conn: ...`"""
+    return pool.connection()
 
 def hash_password(password):
-    return hashlib.sha256(password.encode()).hexdigest()
+    # bcrypt via the shared hashing pool (old SHA-256 hashes still verify at login)
+    return hashing.hash_password(password)
+
+def busy_response():
+    return jsonify({"message": "Server busy, please try again shortly"}), 503, {
+        "Retry-After": str(hashing.RETRY_AFTER_SECONDS)
+    }
 
 def init_db():
-    conn = get_db()
-    cur = conn.cursor()
+    with get_db() as conn:
+        cur = conn.cursor()
     
-    # Users table
-    cur.execute("""
-        CREATE TABLE IF NOT EXISTS users (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            username VARCHAR(100) NOT NULL UNIQUE,
-            email VARCHAR(120) NOT NULL,
-            password_hash VARCHAR(200) NOT NULL,
-            role VARCHAR(20) NOT NULL,
-            department VARCHAR(100),
-            batch_year INTEGER,
-            linkedin_url VARCHAR(200),
-            created_at DATETIME DEFAULT CURRENT_TIMESTAMP
-        )
-    """)
+        # Users table
+        cur.execute("""
+            CREATE TABLE IF NOT EXISTS users (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                username VARCHAR(100) NOT NULL UNIQUE,
+                email VARCHAR(120) NOT NULL,
+                password_hash VARCHAR(200) NOT NULL,
+                role VARCHAR(20) NOT NULL,
+                department VARCHAR(100),
+                batch_year INTEGER,
+                linkedin_url VARCHAR(200),
+                created_at DATETIME DEFAULT CURRENT_TIMESTAMP
+            )
+        """)
     
-    # Messages table
-    cur.execute("""
-        CREATE TABLE IF NOT EXISTS messages (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            sender TEXT,
-            receiver TEXT,
-            content TEXT,
-            timestamp DATETIME DEFAULT CURRENT_TIMESTAMP
-        )
-    """)
+        # Messages table: the integer-keyed schema shared with sapp.py and
+        # chat.py (raises if the old sender/receiver text table is still there)
+        message_service.ensure_schema(conn)
+
+        # This app's users and messages used to live in ./database.db
+        if message_service.legacy_file_pending(conn, database.ALAPP_LEGACY_PATH):
+            raise message_service.LegacySchemaError(
+                f"{database.ALAPP_LEGACY_PATH} still holds alapp.py's old data - run 12_migrate_messages.py"
+            )
     
-    conn.commit()
-    conn.close()
+        conn.commit()
 
 init_db()
 
@@ -70,27 +77,30 @@ def signup():
         return jsonify({"message": "Missing required fields"}), 400
     
     try:
-        conn = get_db()
-        cur = conn.cursor()
-        
         # Check if username already exists
-        existing = cur.execute("SELECT * FROM users WHERE username = ?", (username,)).fetchone()
+        with get_db() as conn:
+            existing = conn.execute("SELECT 1 FROM users WHERE username = ?", (username,)).fetchone()
         if existing:
-            conn.close()
             return jsonify({"message": "Username already exists"}), 400
         
-        # Hash password and insert user
+        # Hash password without holding a pooled connection (bcrypt takes ~250ms)
         hashed_pw = hash_password(password)
-        cur.execute("""
-            INSERT INTO users (username, email, password_hash, role, department, batch_year)
-            VALUES (?, ?, ?, ?, ?, ?)
-        """, (username, email, hashed_pw, role, department, batch_year))
         
-        conn.commit()
-        conn.close()
+        with get_db() as conn:
+            # The check again, in the insert: a concurrent signup may have taken the name
+            cur = conn.execute("""
+                INSERT INTO users (username, email, password_hash, role, department, batch_year)
+                SELECT ?, ?, ?, ?, ?, ?
+                WHERE NOT EXISTS (SELECT 1 FROM users WHERE username = ?)
+            """, (username, email, hashed_pw, role, department, batch_year, username))
+            conn.commit()
+        if cur.rowcount == 0:
+            return jsonify({"message": "Username already exists"}), 400
         
         return jsonify({"message": "Signup successful"}), 201
         
+    except hashing.HashingBusy:
+        return busy_response()
     except Exception as e:
         return jsonify({"message": f"Database error: {str(e)}"}), 500
 
@@ -106,21 +116,29 @@ def login():
         return jsonify({"message": "Username and password required"}), 400
     
     try:
-        conn = get_db()
-        user = conn.execute(
-            "SELECT * FROM users WHERE username = ?", 
-            (username,)
-        ).fetchone()
-        conn.close()
+        with get_db() as conn:
+            user = conn.execute(
+                "SELECT * FROM users WHERE username = ?", 
+                (username,)
+            ).fetchone()
         
         if not user:
             return jsonify({"message": "Invalid username or password"}), 401
         
         # Verify password
-        hashed_pw = hash_password(password)
-        if user["password_hash"] != hashed_pw:
+        if not hashing.check_password(user["password_hash"], password):
             return jsonify({"message": "Invalid username or password"}), 401
         
+        # Replace unsalted SHA-256 (or old-cost) hashes with a fresh bcrypt hash
+        if hashing.needs_rehash(user["password_hash"]):
+            try:
+                new_hash = hash_password(password)
+                with get_db() as conn:
+                    conn.execute("UPDATE users SET password_hash = ? WHERE id = ?", (new_hash, user["id"]))
+                    conn.commit()
+            except hashing.HashingBusy:
+                pass  # try again on a later login
+        
         # Return user data with role for frontend routing
         return jsonify({
             "message": "Login successful",
@@ -133,42 +151,84 @@ def login():
             }
         }), 200
         
+    except hashing.HashingBusy:
+        return busy_response()
     except Exception as e:
         return jsonify({"message": f"Database error: {str(e)}"}), 500
 
 # EXISTING MESSAGE ENDPOINTS
+def write_messages(items):
+    """Insert a batch of messages (user ids) in one transaction; returns their ids"""
+    with get_db() as conn:
+        msgs = message_service.send_many(conn, items)
+        conn.commit()
+    return [m.id for m in msgs]
+
+# Group commits when MESSAGE_WRITE_MODE is group or queued (see write_behind.py)
+message_writer = write_behind.writer_for(write_messages)
+
 @alapp.route("/send", methods=["POST"])
 def send_message():
-    data = request.json
-    conn = get_db()
-    conn.execute(
-        "INSERT INTO messages (sender, receiver, content) VALUES (?, ?, ?)",
-        (data["sender"], data["receiver"], data["content"])
-    )
-    conn.commit()
-    conn.close()
-    return jsonify({"ok": True})
+    data = request.json or {}
+    if not data.get("sender") or not data.get("receiver") or not data.get("content"):
+        return jsonify({"message": "sender, receiver and content are required"}), 400
+
+    # Clients may send usernames or ids; messages are stored by user id
+    with get_db() as conn:
+        sender_id = message_service.resolve_user(conn, data["sender"])
+        receiver_id = message_service.resolve_user(conn, data["receiver"])
+    if sender_id is None or receiver_id is None:
+        return jsonify({"message": "Unknown sender or receiver"}), 404
+    try:
+        client_id = message_service.client_id(data.get("client_id"))
+    except ValueError as e:
+        return jsonify({"message": str(e)}), 400
+
+    item = {"sender": sender_id, "receiver": receiver_id, "content": data["content"], "client_id": client_id}
+    try:
+        if message_writer is None:
+            write_messages([item])
+            return jsonify({"ok": True, "client_id": client_id})
+        message_writer.submit(item)
+    except write_behind.CommitTimeout:
+        # The batch may still commit; a resend with client_id is stored once
+        return jsonify({"ok": True, "queued": True, "client_id": client_id}), 202
+    except write_behind.WriterBusy:
+        return jsonify({"message": "Server busy, please try again shortly"}), 503, {
+            "Retry-After": str(write_behind.RETRY_AFTER_SECONDS)
+        }
+    except Exception as e:
+        return jsonify({"message": f"Database error: {str(e)}"}), 500
+    if message_writer.mode == "queued":
+        return jsonify({"ok": True, "queued": True, "client_id": client_id}), 202
+    return jsonify({"ok": True, "client_id": client_id})
 
 @alapp.route("/messages/<sender>/<receiver>")
 def get_messages(sender, receiver):
-    conn = get_db()
-    rows = conn.execute("""
-        SELECT * FROM messages
-        WHERE (sender=? AND receiver=?)
-           OR (sender=? AND receiver=?)
-        ORDER BY timestamp
-    """, (sender, receiver, receiver, sender)).fetchall()
-    conn.close()
+    with get_db() as conn:
+        sender_id = message_service.resolve_user(conn, sender)
+        receiver_id = message_service.resolve_user(conn, receiver)
+        if sender_id is None or receiver_id is None:
+            return jsonify([])
+        msgs = message_service.conversation(conn, sender_id, receiver_id)
 
+    # Echo the names the client asked with, so it can tell its own messages apart
+    names = {sender_id: sender, receiver_id: receiver}
     return jsonify([
         {
-            "sender": r["sender"],
-            "receiver": r["receiver"],
-            "content": r["content"],
-            "time": r["timestamp"]
-        } for r in rows
+            "id": m.id,
+            "sender": names[m.sender_id],
+            "receiver": names[m.receiver_id],
+            "content": m.content,
+            "time": m.timestamp.strftime("%Y-%m-%d %H:%M:%S")
+        } for m in msgs
     ])
 
+# POOL STATS
+@alapp.route("/pool-stats")
+def pool_stats():
+    return jsonify(pool.stats())
+
 if __name__ == "__main__":
     # Run signup on port 5000 and login on port 5001
     # You'll need to run two instances or update your frontend
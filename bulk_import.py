@@ -0,0 +1,302 @@
+"""
+Bulk import of users, events and jobs from CSV or JSONL (one JSON object
+per line), used by the /import/<kind> routes and 8_bulk_import.py.
+
+Input is read as a stream and validated row by row; valid rows are
+written in batches of BATCH_SIZE with one executemany INSERT and one
+commit per batch, so a file of any size needs one batch of memory and
+one short write lock at a time. Invalid rows do not stop the import -
+they are reported with their line number.
+
+Users need either "password" (hashed with bcrypt on every CPU at
+IMPORT_BCRYPT_ROUNDS) or an existing bcrypt "password_hash". bcrypt is
+what bounds user import speed, so imports hash at a deliberately low
+cost: 6 (about 4 ms a hash) instead of BCRYPT_LOG_ROUNDS=12 (about
+250 ms), and 100k users take seconds per core rather than hours. Each
+hash is upgraded to BCRYPT_LOG_ROUNDS at that user's first login
+(hashing.needs_rehash); accounts that never log in keep the import cost.
+"skills" is a list of skill names separated by ";" or "|".
+"""
+
+import csv
+import io
+import json
+import os
+import re
+import time
+from datetime import datetime
+
+from sqlalchemy import select
+
+import hashing
+import recurrence
+
+BATCH_SIZE = int(os.environ.get("IMPORT_BATCH_SIZE", 5000))
+IMPORT_BCRYPT_ROUNDS = int(os.environ.get("IMPORT_BCRYPT_ROUNDS", 6))
+MAX_REPORTED_ERRORS = 1000
+
+KINDS = ("users", "events", "jobs")
+FORMATS = ("csv", "jsonl")
+
+_BCRYPT_HASH = re.compile(r"^\$2[aby]?\$\d{2}\$.{53}$")
+
+
+def read_records(stream, fmt):
+    """(line number, row dict or None, error or None) for each record in a binary stream"""
+    text_stream = io.TextIOWrapper(stream, encoding="utf-8-sig", newline="")
+    if fmt == "csv":
+        reader = csv.DictReader(text_stream)
+        for row in reader:
+            if None in row:
+                yield reader.line_num, None, "More values than header columns"
+            else:
+                yield reader.line_num, row, None
+        return
+
+    for line_no, line in enumerate(text_stream, start=1):
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError as e:
+            yield line_no, None, f"Invalid JSON: {e}"
+            continue
+        if isinstance(row, dict):
+            yield line_no, row, None
+        else:
+            yield line_no, None, "Each line must be a JSON object"
+
+
+# --- validation: raw row -> column values, ValueError with a message if invalid ---
+
+def _text(row, name, required=True, max_length=None):
+    value = row.get(name)
+    value = "" if value is None else str(value).strip()
+    if required and not value:
+        raise ValueError(f"Missing required field: {name}")
+    if max_length and len(value) > max_length:
+        raise ValueError(f"{name} is longer than {max_length} characters")
+    return value or None
+
+def _int(row, name, required=True):
+    value = _text(row, name, required)
+    if value is None:
+        return None
+    try:
+        return int(value)
+    except ValueError:
+        raise ValueError(f"Invalid {name}: {value}")
+
+def _parsed(row, name, fmt, label):
+    value = _text(row, name)
+    try:
+        return datetime.strptime(value, fmt)
+    except ValueError:
+        raise ValueError(f"Invalid {name} (expected {label}): {value}")
+
+def validate_user(row):
+    values = {
+        "username": _text(row, "username", max_length=100),
+        "email": _text(row, "email", max_length=120),
+        "role": _text(row, "role", max_length=20).lower(),
+        "department": _text(row, "department", required=False, max_length=100),
+        "batch_year": _int(row, "batch_year", required=False),
+        "linkedin_url": _text(row, "linkedin_url", required=False, max_length=200),
+        "password": _text(row, "password", required=False),
+        "password_hash": _text(row, "password_hash", required=False),
+        "skills": [s.strip() for s in re.split(r"[;|]", _text(row, "skills", required=False) or "") if s.strip()],
+    }
+    if "@" not in values["email"]:
+        raise ValueError(f"Invalid email: {values['email']}")
+    if values["password_hash"]:
+        if not _BCRYPT_HASH.match(values["password_hash"]):
+            raise ValueError("password_hash must be a bcrypt hash")
+    elif not values["password"]:
+        raise ValueError("Missing required field: password (or password_hash)")
+    return values
+
+def validate_event(row):
+    values = {
+        "title": _text(row, "title", max_length=200),
+        "mode": _text(row, "mode", max_length=20),
+        "location": _text(row, "location", max_length=300),
+        "event_date": _parsed(row, "event_date", "%Y-%m-%d", "YYYY-MM-DD").date(),
+        "start_time": _parsed(row, "start_time", "%H:%M", "HH:MM").time(),
+        "end_time": _parsed(row, "end_time", "%H:%M", "HH:MM").time(),
+        "capacity": _int(row, "capacity"),
+        "description": _text(row, "description", required=False) or "",
+        "created_by": _int(row, "created_by", required=False),
+        "recurrence": _text(row, "recurrence", required=False, max_length=200),
+        "series_end": None,
+    }
+    if values["capacity"] < 0:
+        raise ValueError("capacity cannot be negative")
+    if values["recurrence"]:
+        values["series_end"] = recurrence.series_end(values["recurrence"], values["event_date"])
+    return values
+
+def validate_job(row):
+    return {
+        "role": _text(row, "role", max_length=150),
+        "company_name": _text(row, "company_name", max_length=200),
+        "location": _text(row, "location", max_length=200),
+        "paid_status": _text(row, "paid_status", max_length=50),
+        "duration": _text(row, "duration", max_length=100),
+        "posted_by": _int(row, "posted_by", required=False),
+    }
+
+VALIDATORS = {"users": validate_user, "events": validate_event, "jobs": validate_job}
+
+
+class ImportReport:
+    def __init__(self, kind, dry_run=False):
+        self.kind = kind
+        self.dry_run = dry_run
+        self.rows = 0
+        self.inserted = 0
+        self.failed = 0
+        self.errors = []
+        self._started = time.perf_counter()
+
+    def fail(self, line, message):
+        self.failed += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({"line": line, "error": message})
+
+    def as_dict(self):
+        return {
+            "kind": self.kind,
+            "dry_run": self.dry_run,
+            "rows": self.rows,
+            "inserted": self.inserted,
+            "failed": self.failed,
+            "errors": sorted(self.errors, key=lambda e: e["line"]),
+            "errors_truncated": self.failed > len(self.errors),
+            "seconds": round(time.perf_counter() - self._started, 3)
+        }
+
+
+class Importer:
+    """
+    tables   - {"users", "skills", "events", "jobs": sqlalchemy Table}
+    on_batch - fn(kind, inserted rows) called inside each batch's
+               transaction, before its commit (counters, ...)
+    bcrypt_rounds - cost for imported passwords (4-31)
+    """
+
+    def __init__(self, session, tables, batch_size=BATCH_SIZE, on_batch=None,
+                 bcrypt_rounds=IMPORT_BCRYPT_ROUNDS):
+        if not 4 <= bcrypt_rounds <= 31:
+            raise ValueError("bcrypt rounds must be between 4 and 31")
+        self.session = session
+        self.tables = tables
+        self.batch_size = max(1, batch_size)
+        self.on_batch = on_batch
+        self.bcrypt_rounds = bcrypt_rounds
+
+    def run(self, kind, records, dry_run=False):
+        if kind not in VALIDATORS:
+            raise ValueError(f"Unknown import kind: {kind}")
+        validate = VALIDATORS[kind]
+        report = ImportReport(kind, dry_run)
+        # Uniqueness across the whole file, not just within a batch
+        self._seen = {"email": set(), "username": set()}
+
+        hasher = hashing.BulkHasher(self.bcrypt_rounds) if kind == "users" and not dry_run else None
+        try:
+            batch = []
+            for line, row, error in records:
+                report.rows += 1
+                if error is None:
+                    try:
+                        batch.append((line, validate(row)))
+                    except ValueError as e:
+                        error = str(e)
+                if error is not None:
+                    report.fail(line, error)
+                if len(batch) >= self.batch_size:
+                    self._write(kind, batch, report, dry_run, hasher)
+                    batch = []
+            if batch:
+                self._write(kind, batch, report, dry_run, hasher)
+        finally:
+            if hasher is not None:
+                hasher.close()
+        return report
+
+    def _write(self, kind, batch, report, dry_run, hasher):
+        if kind == "users":
+            batch = self._unique_users(batch, report)
+        if dry_run:
+            report.inserted += len(batch)
+            return
+        if not batch:
+            return
+
+        rows = [values for _, values in batch]
+        try:
+            if kind == "users":
+                self._insert_users(rows, hasher)
+            else:
+                now = datetime.utcnow()
+                for values in rows:
+                    values["created_at"] = now
+                self.session.execute(self.tables[kind].insert(), rows)
+            if self.on_batch:
+                self.on_batch(kind, rows)
+            self.session.commit()
+            report.inserted += len(rows)
+        except Exception as e:
+            self.session.rollback()
+            for line, _ in batch:
+                report.fail(line, f"Batch failed: {e}")
+
+    def _unique_users(self, batch, report):
+        """Drop rows whose email or username is already taken (in the database or earlier in the file)"""
+        users = self.tables["users"]
+        emails = [values["email"] for _, values in batch]
+        usernames = [values["username"] for _, values in batch]
+        taken_emails = set(self.session.execute(select(users.c.email).where(users.c.email.in_(emails))).scalars())
+        taken_names = set(self.session.execute(select(users.c.username).where(users.c.username.in_(usernames))).scalars())
+
+        kept = []
+        for line, values in batch:
+            if values["email"] in taken_emails or values["email"] in self._seen["email"]:
+                report.fail(line, f"Email already registered: {values['email']}")
+            elif values["username"] in taken_names or values["username"] in self._seen["username"]:
+                report.fail(line, f"Username already taken: {values['username']}")
+            else:
+                self._seen["email"].add(values["email"])
+                self._seen["username"].add(values["username"])
+                kept.append((line, values))
+        return kept
+
+    def _insert_users(self, rows, hasher):
+        users = self.tables["users"]
+        plain = [values for values in rows if not values["password_hash"]]
+        for values, hashed in zip(plain, hasher.hash_all([values["password"] for values in plain])):
+            values["password_hash"] = hashed
+
+        now = datetime.utcnow()
+        self.session.execute(users.insert(), [{
+            "username": values["username"],
+            "email": values["email"],
+            "password_hash": values["password_hash"],
+            "role": values["role"],
+            "department": values["department"],
+            "batch_year": values["batch_year"],
+            "linkedin_url": values["linkedin_url"],
+            "created_at": now
+        } for values in rows])
+
+        with_skills = [values for values in rows if values["skills"]]
+        if with_skills:
+            ids = dict(self.session.execute(
+                select(users.c.email, users.c.id).where(users.c.email.in_([v["email"] for v in with_skills]))
+            ).all())
+            self.session.execute(self.tables["skills"].insert(), [{
+                "user_id": ids[values["email"]],
+                "department": values["department"],
+                "batch_year": values["batch_year"],
+                "skill_name": skill
+            } for values in with_skills for skill in values["skills"]])
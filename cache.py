@@ -0,0 +1,254 @@
+"""
+Caches shared by the sapp.py routes: a thread-safe in-process LRU and a
+whole-response cache with ETag support for the read-heavy listings.
+"""
+
+import hashlib
+import json
+import os
+import random
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+from urllib.parse import urlencode
+
+from flask import Response, make_response, request
+
+_MISSING = object()
+
+
+class LRUCache:
+    """
+    Least-recently-used cache with an optional per-entry time to live.
+
+    Entries past their TTL are treated as missing and dropped on access;
+    once max_size is reached the least recently used entry is evicted.
+    """
+
+    def __init__(self, max_size=1024, ttl=None):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._data = OrderedDict()      # key -> (value, expires_at)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._data.get(key, _MISSING)
+            if entry is not _MISSING:
+                value, expires_at = entry
+                if expires_at is None or expires_at > time.monotonic():
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._data[key]
+            self.misses += 1
+            return default
+
+    def set(self, key, value, ttl=None):
+        ttl = self.ttl if ttl is None else ttl
+        expires_at = time.monotonic() + ttl if ttl else None
+        with self._lock:
+            self._data[key] = (value, expires_at)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+
+    def pop(self, key):
+        with self._lock:
+            entry = self._data.pop(key, _MISSING)
+        return None if entry is _MISSING else entry[0]
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "size": len(self._data),
+                "max_size": self.max_size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / total, 4) if total else 0.0
+            }
+
+
+# --- RESPONSE CACHE ---
+
+class MemoryBackend:
+    """
+    Per-process storage for ResponseCache. Only right for a single worker:
+    an invalidation never reaches the other processes.
+    """
+
+    def __init__(self, max_size=512, ttl=300):
+        self.entries = LRUCache(max_size=max_size, ttl=ttl)
+        self._versions = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        return self.entries.get(key)
+
+    def set(self, key, entry):
+        self.entries.set(key, entry)
+
+    def versions(self, tags):
+        with self._lock:
+            return [self._versions.get(tag, 0) for tag in tags]
+
+    def bump(self, tags):
+        with self._lock:
+            for tag in tags:
+                self._versions[tag] = self._versions.get(tag, 0) + 1
+
+
+class SQLiteBackend:
+    """
+    Storage in a separate SQLite file that every worker process on the
+    host can share, so an invalidation in one worker is seen by all.
+    Stands in locally for a networked cache such as Redis.
+    """
+
+    def __init__(self, path="response_cache.db", ttl=300):
+        self.path = path
+        self.ttl = ttl
+        self._local = threading.local()
+        conn = self._conn()
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS response_cache (
+                key TEXT PRIMARY KEY,
+                body BLOB NOT NULL,
+                mimetype TEXT NOT NULL,
+                etag TEXT NOT NULL,
+                headers TEXT NOT NULL DEFAULT '{}',
+                expires_at REAL NOT NULL
+            )
+        """)
+        conn.execute("CREATE TABLE IF NOT EXISTS response_cache_versions (tag TEXT PRIMARY KEY, version INTEGER NOT NULL)")
+        conn.commit()
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=OFF")     # losing a cache entry is harmless
+            self._local.conn = conn
+        return conn
+
+    def get(self, key):
+        row = self._conn().execute(
+            "SELECT body, mimetype, etag, headers FROM response_cache WHERE key = ? AND expires_at > ?",
+            (key, time.time())
+        ).fetchone()
+        return (bytes(row[0]), row[1], row[2], json.loads(row[3])) if row else None
+
+    def set(self, key, entry):
+        body, mimetype, etag, headers = entry
+        conn = self._conn()
+        conn.execute(
+            "INSERT OR REPLACE INTO response_cache (key, body, mimetype, etag, headers, expires_at) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            (key, body, mimetype, etag, json.dumps(headers), time.time() + self.ttl)
+        )
+        if random.random() < 0.01:
+            conn.execute("DELETE FROM response_cache WHERE expires_at <= ?", (time.time(),))
+
+    def versions(self, tags):
+        rows = dict(self._conn().execute(
+            f"SELECT tag, version FROM response_cache_versions WHERE tag IN ({','.join('?' * len(tags))})",
+            tags
+        ).fetchall())
+        return [rows.get(tag, 0) for tag in tags]
+
+    def bump(self, tags):
+        conn = self._conn()
+        for tag in tags:
+            conn.execute(
+                "INSERT INTO response_cache_versions (tag, version) VALUES (?, 1) "
+                "ON CONFLICT(tag) DO UPDATE SET version = version + 1",
+                (tag,)
+            )
+
+
+class ResponseCache:
+    """
+    Caches whole GET responses per path + query string.
+
+    Every entry is tagged with the data it was built from ("events",
+    "jobs", ...). Entries are keyed on the current version of each tag,
+    so invalidate(tag) simply bumps the version and every response built
+    from that data is missed from then on and ages out of the backend.
+    """
+
+    # Response headers that are part of the cached content (pagination cursors)
+    KEPT_HEADERS = ("X-Next-Cursor", "Link")
+
+    def __init__(self, backend=None):
+        self.backend = backend or MemoryBackend()
+
+    @classmethod
+    def from_env(cls, default_path="response_cache.db"):
+        """
+        RESPONSE_CACHE=sqlite (default, the file at default_path),
+        sqlite:///path/to/cache.db, or memory for a single worker process
+        """
+        setting = os.environ.get("RESPONSE_CACHE", "sqlite")
+        ttl = int(os.environ.get("RESPONSE_CACHE_TTL", 300))
+        if setting == "memory":
+            return cls(MemoryBackend(ttl=ttl))
+        if setting.startswith("sqlite:///"):
+            return cls(SQLiteBackend(setting[len("sqlite:///"):], ttl=ttl))
+        if setting != "sqlite":
+            raise ValueError(f"RESPONSE_CACHE must be sqlite, sqlite:///path or memory, not {setting!r}")
+        return cls(SQLiteBackend(default_path, ttl=ttl))
+
+    def invalidate(self, *tags):
+        self.backend.bump(tags)
+
+    def cached(self, *tags, vary=None):
+        """
+        Decorator for GET views whose output depends only on `tags` and the
+        query string, plus whatever vary() returns when given (e.g. today's
+        date for views whose defaults are relative to it)
+        """
+        def decorator(view):
+            @wraps(view)
+            def wrapper(*args, **kwargs):
+                if request.method != "GET":
+                    return view(*args, **kwargs)
+
+                # The session token never changes what a listing returns
+                query = urlencode(sorted(
+                    (k, v) for k, v in request.args.items(multi=True) if k != "token"
+                ))
+                versions = ".".join(str(v) for v in self.backend.versions(tags))
+                key = f"{request.path}?{query}|{versions}"
+                if vary is not None:
+                    key = f"{key}|{vary()}"
+
+                entry = self.backend.get(key)
+                if entry is None:
+                    response = make_response(view(*args, **kwargs))
+                    if response.status_code != 200:
+                        return response
+                    body = response.get_data()
+                    headers = {h: response.headers[h] for h in self.KEPT_HEADERS if h in response.headers}
+                    entry = (body, response.mimetype, hashlib.sha1(body).hexdigest(), headers)
+                    self.backend.set(key, entry)
+
+                body, mimetype, etag, headers = entry
+                response = Response(body, mimetype=mimetype, headers=headers)
+                response.set_etag(etag)
+                response.headers["Cache-Control"] = "no-cache"  # always revalidate, 304 if unchanged
+                return response.make_conditional(request)
+            return wrapper
+        return decorator
@@ -2,14 +2,17 @@ from flask import Flask, request, jsonify
 from flask_sqlalchemy import SQLAlchemy
 from flask_bcrypt import Bcrypt
 from flask_cors import CORS
-from datetime import datetime
+import database
+from database import configure_app
+import message_service
+import search_index
+import write_behind
 
 app = Flask(__name__)
 CORS(app)
 
 # Database Configuration
-app.config["SQLALCHEMY_DATABASE_URI"] = "sqlite:///database.db"
-app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
+configure_app(app)
 
 db = SQLAlchemy(app)
 bcrypt = Bcrypt(app)
@@ -26,12 +29,11 @@ class User(db.Model):
     batch_year = db.Column(db.String(50))
 
 class Message(db.Model):
-    __tablename__ = "messages"
-    id = db.Column(db.Integer, primary_key=True)
-    sender_id = db.Column(db.Integer, db.ForeignKey("users.id"), nullable=False)
-    receiver_id = db.Column(db.Integer, db.ForeignKey("users.id"), nullable=False)
-    content = db.Column(db.Text, nullable=False)
-    timestamp = db.Column(db.DateTime, default=datetime.utcnow)
+    # Same table and indexes as sapp.py and alapp.py (see message_service.py)
+    __table__ = message_service.messages_table(db.metadata)
+
+# Kept current by message_service.send_many (sapp.py's chat sidebar)
+conversations = message_service.conversations_table(db.metadata)
 
 # --- ROUTES ---
 
@@ -40,17 +42,17 @@ def get_chat_users(current_user_id):
     search_query = request.args.get('search', '').strip()
     try:
         if search_query:
-            # GLOBAL SEARCH
-            users = User.query.filter(
-                (User.id != current_user_id) & 
-                (User.username.ilike(f"%{search_query}%"))
-            ).all()
+            # GLOBAL SEARCH (ranked full-text index, see search_index.py)
+            ids = search_index.search_user_ids(db.session, search_query, exclude_id=current_user_id)
         else:
             # CHAT HISTORY ONLY
-            sent_ids = db.session.query(Message.receiver_id).filter(Message.sender_id == current_user_id)
-            recv_ids = db.session.query(Message.sender_id).filter(Message.receiver_id == current_user_id)
-            history_ids = [id_tuple[0] for id_tuple in sent_ids.union(recv_ids).all()]
-            users = User.query.filter(User.id.in_(history_ids)).all()
+            ids = message_service.partners(db.session, current_user_id)
+        # Only the columns we return - users.college may not exist on a sapp-created table
+        rows = db.session.query(User.id, User.username, User.role, User.department).filter(
+            User.id.in_(ids)
+        ).all() if ids else []
+        by_id = {u.id: u for u in rows}
+        users = [by_id[i] for i in ids if i in by_id]
         
         return jsonify([{
             "id": u.id,
@@ -63,10 +65,7 @@ def get_chat_users(current_user_id):
 
 @app.route("/get-messages/<int:u1>/<int:u2>", methods=["GET"])
 def get_messages(u1, u2):
-    msgs = Message.query.filter(
-        ((Message.sender_id == u1) & (Message.receiver_id == u2)) |
-        ((Message.sender_id == u2) & (Message.receiver_id == u1))
-    ).order_by(Message.timestamp.asc()).all()
+    msgs = message_service.conversation(db.session, u1, u2)
     
     return jsonify([{
         "sender": m.sender_id,
@@ -74,18 +73,41 @@ def get_messages(u1, u2):
         "time": m.timestamp.strftime("%H:%M")
     } for m in msgs]), 200
 
+def write_messages(items):
+    """Insert a batch of messages in one transaction; returns their ids"""
+    with app.app_context():
+        try:
+            msgs = message_service.send_many(db.session, items)
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+        return [m.id for m in msgs]
+
+# Group commits when MESSAGE_WRITE_MODE is group or queued (see write_behind.py)
+message_writer = write_behind.writer_for(write_messages)
+
 @app.route("/send-message", methods=["POST"])
 def send_message():
     data = request.get_json()
     try:
-        new_msg = Message(
-            sender_id=data['sender'],
-            receiver_id=data['receiver'],
-            content=data['content']
-        )
-        db.session.add(new_msg)
-        db.session.commit()
-        return jsonify({"ok": True}), 201
+        client_id = message_service.client_id(data.get('client_id'))
+        item = {"sender": data['sender'], "receiver": data['receiver'], "content": data['content'],
+                "client_id": client_id}
+        if message_writer is None:
+            write_messages([item])
+        else:
+            message_writer.submit(item)
+            if message_writer.mode == "queued":
+                return jsonify({"ok": True, "queued": True, "client_id": client_id}), 202
+        return jsonify({"ok": True, "client_id": client_id}), 201
+    except write_behind.CommitTimeout:
+        # Not committed yet, but a resend with the same client_id is stored once
+        return jsonify({"ok": True, "queued": True, "client_id": client_id}), 202
+    except write_behind.WriterBusy:
+        return jsonify({"ok": False, "error": "Server busy, please try again shortly"}), 503, {
+            "Retry-After": str(write_behind.RETRY_AFTER_SECONDS)
+        }
     except Exception as e:
         return jsonify({"ok": False, "error": str(e)}), 400
 
@@ -104,7 +126,10 @@ def get_profile(user_id):
         }), 200
     return jsonify({"message": "User not found"}), 404
 
+# Tables, columns and indexes the database lacks, however the app is started
+with app.app_context():
+    if not message_service.prepare_schema(db.engine, db.metadata.sorted_tables, database.ALAPP_LEGACY_PATH):
+        print("⚠️  Schema not updated: messages still need 12_migrate_messages.py")
+
 if __name__ == "__main__":
-    with app.app_context():
-        db.create_all()
     app.run(debug=True, port=5000)
\ No newline at end of file
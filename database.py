@@ -0,0 +1,268 @@
+"""
+Shared SQLite configuration for every app in this project.
+
+sapp.py, chat.py, registration.py and login.py call configure_app()
+before creating their SQLAlchemy extension; alapp.py borrows its raw
+sqlite3 connections from a ConnectionPool. Either way every connection gets
+the same pragma profile, so several gunicorn workers can read while one
+writes instead of failing with "database is locked".
+
+Every app opens the same file: instance/database.db, where sapp.py,
+chat.py, login.py and registration.py have always kept their data.
+DATABASE_PATH is absolute, so it does not depend on each app's instance
+folder or on alapp.py's working directory. alapp.py used to keep its own
+database.db next to the code; 12_migrate_messages.py merges that file
+in. Connections to the shared file also get the message archive
+attached (see message_archive.py).
+
+Environment overrides:
+    DATABASE_PATH  - database file for every app (default:
+                     instance/database.db next to this module)
+    SQLITE_PRAGMAS - comma separated overrides, e.g.
+                     "busy_timeout=10000,cache_size=-64000"
+"""
+
+import os
+import re
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+import message_archive
+
+_HERE = os.path.dirname(os.path.abspath(__file__))
+
+DATABASE_PATH = os.path.abspath(
+    os.environ.get("DATABASE_PATH") or os.path.join(_HERE, "instance", "database.db")
+)
+
+# alapp.py's database before every app shared DATABASE_PATH
+ALAPP_LEGACY_PATH = os.path.join(_HERE, "database.db")
+
+DATABASE_URI = f"sqlite:///{DATABASE_PATH}"
+
+os.makedirs(os.path.dirname(DATABASE_PATH), exist_ok=True)
+
+message_archive.configure(DATABASE_PATH)
+
+DEFAULT_PRAGMAS = {
+    "journal_mode": "WAL",          # readers no longer block on the writer
+    "synchronous": "NORMAL",        # safe with WAL, one fsync per checkpoint
+    "busy_timeout": 5000,           # ms to wait for the write lock before erroring
+    "cache_size": -20000,           # negative = KiB, ~20 MB page cache per connection
+    "mmap_size": 268435456,         # 256 MB memory-mapped reads
+    "temp_store": "MEMORY",         # temp b-trees for sorts stay off disk
+}
+
+_PRAGMA_NAME = re.compile(r"^[a-z_]+$")
+_PRAGMA_VALUE = re.compile(r"^-?[A-Za-z0-9_]+$")
+
+
+def load_pragmas(overrides=None):
+    """DEFAULT_PRAGMAS merged with SQLITE_PRAGMAS (or an explicit override string)"""
+    pragmas = dict(DEFAULT_PRAGMAS)
+    overrides = os.environ.get("SQLITE_PRAGMAS", "") if overrides is None else overrides
+
+    for item in overrides.split(","):
+        if not item.strip():
+            continue
+        name, _, value = item.partition("=")
+        name, value = name.strip().lower(), value.strip()
+        if not _PRAGMA_NAME.match(name) or not _PRAGMA_VALUE.match(value):
+            raise ValueError(f"Invalid SQLITE_PRAGMAS entry: {item!r}")
+        pragmas[name] = value
+    return pragmas
+
+
+PRAGMAS = load_pragmas()
+
+
+def apply_pragmas(conn, pragmas=None):
+    """Run the pragma profile on a raw sqlite3 connection"""
+    cur = conn.cursor()
+    for name, value in (pragmas or PRAGMAS).items():
+        cur.execute(f"PRAGMA {name}={value}")
+    cur.close()
+
+
+def setup_connection(conn):
+    """Pragma profile, plus the message archive when conn is on the shared database"""
+    apply_pragmas(conn)
+    main_file = conn.execute("PRAGMA database_list").fetchone()[2]
+    if main_file and os.path.realpath(main_file) == os.path.realpath(DATABASE_PATH):
+        message_archive.attach(conn)
+
+
+@event.listens_for(Engine, "connect")
+def _on_connect(dbapi_connection, connection_record):
+    # Every SQLAlchemy engine in the process, whichever app created it
+    if isinstance(dbapi_connection, sqlite3.Connection):
+        setup_connection(dbapi_connection)
+
+
+def configure_app(app):
+    """Point a Flask app at the shared database; call before SQLAlchemy(app)"""
+    app.config["SQLALCHEMY_DATABASE_URI"] = DATABASE_URI
+    app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
+    app.config.setdefault("SQLALCHEMY_ENGINE_OPTIONS", {
+        "connect_args": {"timeout": float(PRAGMAS["busy_timeout"]) / 1000},
+    })
+
+
+def connect(path=DATABASE_PATH):
+    """Raw sqlite3 connection with the shared pragma profile (used by alapp.py)"""
+    conn = sqlite3.connect(path, timeout=float(PRAGMAS["busy_timeout"]) / 1000)
+    conn.row_factory = sqlite3.Row
+    setup_connection(conn)
+    return conn
+
+
+class ConnectionPool:
+    """
+    Thread-safe pool of raw sqlite3 connections.
+
+    A thread that asks again while it already holds a connection gets
+    the same one back, so helpers can nest. Idle connections are reused
+    most-recently-used first to keep their page and statement caches
+    warm, and are pinged before reuse if they sat idle for longer than
+    health_check_interval. At most max_size connections exist; extra
+    callers wait up to `timeout` seconds for one to be released.
+    """
+
+    def __init__(self, path=DATABASE_PATH, max_size=8, timeout=10.0,
+                 cached_statements=256, health_check_interval=30.0):
+        self.path = path
+        self.max_size = max_size
+        self.timeout = timeout
+        self.cached_statements = cached_statements
+        self.health_check_interval = health_check_interval
+
+        self._idle = []           # [(conn, released_at)], most recent last
+        self._size = 0
+        self._local = threading.local()
+        self._cond = threading.Condition()
+        self._stats = {"hits": 0, "misses": 0, "waits": 0, "discarded": 0}
+
+    def _create(self):
+        conn = sqlite3.connect(
+            self.path,
+            timeout=float(PRAGMAS["busy_timeout"]) / 1000,
+            check_same_thread=False,    # connections move between request threads
+            cached_statements=self.cached_statements
+        )
+        conn.row_factory = sqlite3.Row
+        setup_connection(conn)
+        return conn
+
+    def _healthy(self, conn, released_at):
+        if time.monotonic() - released_at < self.health_check_interval:
+            return True
+        try:
+            conn.execute("SELECT 1").fetchone()
+            return True
+        except sqlite3.Error:
+            return False
+
+    def _discard(self, conn):
+        try:
+            conn.close()
+        except sqlite3.Error:
+            pass
+        with self._cond:
+            self._size -= 1
+            self._stats["discarded"] += 1
+            self._cond.notify()
+
+    def acquire(self):
+        held = getattr(self._local, "conn", None)
+        if held is not None:
+            self._local.depth += 1
+            with self._cond:
+                self._stats["hits"] += 1
+            return held
+
+        deadline = time.monotonic() + self.timeout
+        conn = None
+        while conn is None:
+            with self._cond:
+                if self._idle:
+                    candidate, released_at = self._idle.pop()
+                    self._stats["hits"] += 1
+                elif self._size < self.max_size:
+                    self._size += 1
+                    self._stats["misses"] += 1
+                    candidate, released_at = None, None
+                else:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        raise TimeoutError("No database connection available")
+                    self._stats["waits"] += 1
+                    self._cond.wait(remaining)
+                    continue
+
+            if candidate is None:
+                try:
+                    conn = self._create()
+                except Exception:
+                    with self._cond:
+                        self._size -= 1
+                        self._cond.notify()
+                    raise
+            elif self._healthy(candidate, released_at):
+                conn = candidate
+            else:
+                self._discard(candidate)
+
+        self._local.conn = conn
+        self._local.depth = 1
+        return conn
+
+    def release(self, conn):
+        if getattr(self._local, "conn", None) is not conn:
+            raise ValueError("Connection was not acquired by this thread")
+        self._local.depth -= 1
+        if self._local.depth > 0:
+            return
+        self._local.conn = None
+
+        try:
+            if conn.in_transaction:
+                conn.rollback()     # never hand out a half-finished transaction
+        except sqlite3.Error:
+            self._discard(conn)
+            return
+
+        with self._cond:
+            self._idle.append((conn, time.monotonic()))
+            self._cond.notify()
+
+    @contextmanager
+    def connection(self):
+        conn = self.acquire()
+        try:
+            yield conn
+        finally:
+            self.release(conn)
+
+    def stats(self):
+        with self._cond:
+            total = self._stats["hits"] + self._stats["misses"]
+            return dict(
+                self._stats,
+                size=self._size,
+                idle=len(self._idle),
+                in_use=self._size - len(self._idle),
+                max_size=self.max_size,
+                hit_rate=round(self._stats["hits"] / total, 4) if total else 0.0
+            )
+
+    def close(self):
+        with self._cond:
+            idle, self._idle = self._idle, []
+            self._size -= len(idle)
+        for conn, _ in idle:
+            conn.close()
@@ -0,0 +1,127 @@
+"""
+Streaming export of users, messages, events and jobs as NDJSON or CSV,
+used by the /export/<kind> route and 9_export_data.py.
+
+Rows come from one SELECT per export - user names joined in, never a
+lookup per row - read with yield_per on a connection of the export's
+own, so only CHUNK_ROWS rows are in memory at a time whatever the table
+size. Output is produced in chunks as the rows arrive and can be gzip
+compressed on the fly. Password hashes are never exported.
+"""
+
+import csv
+import io
+import json
+import zlib
+from datetime import date, datetime, time
+
+from sqlalchemy import func, select, union_all
+from sqlalchemy.orm import aliased
+
+CHUNK_ROWS = 1000
+KINDS = ("users", "messages", "events", "jobs")
+FORMATS = {"ndjson": "application/x-ndjson", "csv": "text/csv"}
+
+
+def build_statement(kind, tables):
+    """
+    The export SELECT for `kind`, ordered by id (archived messages come
+    before the hot ones); tables maps names to Table objects, of which
+    "archived_messages" is optional
+    """
+    users = tables["users"]
+    if kind == "users":
+        skills = tables["skills"]
+        skill_list = (
+            select(func.group_concat(skills.c.skill_name, ";"))
+            .where(skills.c.user_id == users.c.id)
+            .scalar_subquery()
+        )
+        return select(
+            users.c.id, users.c.username, users.c.email, users.c.role, users.c.department,
+            users.c.batch_year, users.c.linkedin_url, users.c.created_at, skill_list.label("skills")
+        ).order_by(users.c.id)
+
+    if kind == "messages":
+        parts = [_messages_select(tables["archived_messages"], users)] if tables.get("archived_messages") is not None else []
+        parts.append(_messages_select(tables["messages"], users))
+        if len(parts) == 1:
+            return parts[0].order_by(tables["messages"].c.id)
+        # Archived history first, then the hot table: a compound SELECT
+        # streams its parts instead of sorting everything into one id order
+        return union_all(*parts)
+
+    if kind == "events":
+        events = tables["events"]
+        return select(
+            events.c.id, events.c.title, events.c.mode, events.c.location, events.c.event_date,
+            events.c.start_time, events.c.end_time, events.c.capacity, events.c.description,
+            events.c.recurrence, events.c.created_by, users.c.username.label("creator_name"),
+            events.c.created_at
+        ).outerjoin(users, users.c.id == events.c.created_by).order_by(events.c.id)
+
+    if kind == "jobs":
+        jobs = tables["jobs"]
+        return select(
+            jobs.c.id, jobs.c.role, jobs.c.company_name, jobs.c.location, jobs.c.paid_status,
+            jobs.c.duration, jobs.c.posted_by, users.c.username.label("poster_name"), jobs.c.created_at
+        ).outerjoin(users, users.c.id == jobs.c.posted_by).order_by(jobs.c.id)
+
+    raise ValueError(f"Unknown export kind: {kind}")
+
+
+def _messages_select(messages, users):
+    sender = aliased(users, name="sender")
+    receiver = aliased(users, name="receiver")
+    return select(
+        messages.c.id,
+        messages.c.sender_id, sender.c.username.label("sender_name"),
+        messages.c.receiver_id, receiver.c.username.label("receiver_name"),
+        messages.c.content, messages.c.timestamp
+    ).outerjoin(sender, sender.c.id == messages.c.sender_id) \
+     .outerjoin(receiver, receiver.c.id == messages.c.receiver_id)
+
+
+def _plain(value):
+    if isinstance(value, (date, datetime, time)):
+        return value.isoformat()
+    return value
+
+
+def iter_chunks(engine, stmt, fmt):
+    """Encoded text chunks (one per CHUNK_ROWS rows) for the whole result"""
+    with engine.connect() as conn:
+        result = conn.execution_options(yield_per=CHUNK_ROWS).execute(stmt)
+        columns = list(result.keys())
+
+        if fmt == "csv":
+            buffer = io.StringIO()
+            writer = csv.writer(buffer)
+            writer.writerow(columns)
+            for rows in result.partitions():
+                writer.writerows([_plain(v) for v in row] for row in rows)
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+            if buffer.tell():
+                yield buffer.getvalue()
+        else:
+            for rows in result.partitions():
+                yield "".join(
+                    json.dumps({c: _plain(v) for c, v in zip(columns, row)}, ensure_ascii=False) + "\n"
+                    for row in rows
+                )
+
+
+def encode(chunks, gzip=False):
+    """Text chunks -> bytes, gzip-compressed as a stream when asked"""
+    if not gzip:
+        for chunk in chunks:
+            yield chunk.encode("utf-8")
+        return
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)   # wbits 31 = gzip container
+    for chunk in chunks:
+        data = compressor.compress(chunk.encode("utf-8"))
+        if data:
+            yield data
+    yield compressor.flush()
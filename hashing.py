@@ -0,0 +1,154 @@
+"""
+Password hashing off the request thread.
+
+bcrypt is deliberately slow (~250 ms at cost 12), so hashing and
+checking run in a small process pool instead of on the gunicorn worker
+that is serving requests. The number of calls waiting on the pool is
+bounded; when it is full HashingBusy is raised and the route answers
+503 with Retry-After instead of letting requests pile up.
+
+Hashes written by Flask-Bcrypt are ordinary "$2b$" bcrypt strings and
+verify here unchanged. Unsalted SHA-256 hex digests left over from
+alapp.py are still accepted at login, and needs_rehash() flags them
+(and bcrypt hashes made with a different cost) so the caller can store
+a fresh hash.
+
+Environment:
+    BCRYPT_LOG_ROUNDS   - bcrypt cost factor (default 12)
+    HASH_WORKERS        - worker processes (default half the CPUs)
+    HASH_MAX_PENDING    - calls allowed in flight before 503 (default 4 per worker)
+    HASH_RETRY_AFTER    - seconds to put in Retry-After (default 2)
+"""
+
+import hashlib
+import hmac
+import os
+import re
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeout
+
+import bcrypt
+
+BCRYPT_ROUNDS = int(os.environ.get("BCRYPT_LOG_ROUNDS", 12))
+HASH_WORKERS = int(os.environ.get("HASH_WORKERS", max(1, (os.cpu_count() or 2) // 2)))
+HASH_MAX_PENDING = int(os.environ.get("HASH_MAX_PENDING", HASH_WORKERS * 4))
+RETRY_AFTER_SECONDS = int(os.environ.get("HASH_RETRY_AFTER", 2))
+HASH_TIMEOUT_SECONDS = 30
+
+_LEGACY_SHA256 = re.compile(r"^[0-9a-f]{64}$")
+_BCRYPT = re.compile(r"^\$2[aby]?\$(\d{2})\$")
+
+
+class HashingBusy(Exception):
+    """The hashing pool is saturated; retry after RETRY_AFTER_SECONDS"""
+
+
+# --- work done inside the pool (module level so it can be pickled) ---
+
+def _bcrypt_hash(password, rounds):
+    return bcrypt.hashpw(password.encode("utf-8"), bcrypt.gensalt(rounds)).decode("utf-8")
+
+def _bcrypt_check(stored_hash, password):
+    return bcrypt.checkpw(password.encode("utf-8"), stored_hash.encode("utf-8"))
+
+
+class HashingPool:
+    def __init__(self, workers=HASH_WORKERS, max_pending=HASH_MAX_PENDING):
+        self.workers = workers
+        self.max_pending = max_pending
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._lock = threading.Lock()
+        self._executor = None
+        self._pid = None
+
+    def _get_executor(self):
+        # Created lazily, and again after a fork, so each gunicorn worker owns its pool
+        with self._lock:
+            if self._executor is None or self._pid != os.getpid():
+                self._executor = ProcessPoolExecutor(max_workers=self.workers)
+                self._pid = os.getpid()
+            return self._executor
+
+    def run(self, fn, *args):
+        if not self._slots.acquire(blocking=False):
+            raise HashingBusy()
+        try:
+            future = self._get_executor().submit(fn, *args)
+        except Exception:
+            self._slots.release()
+            raise
+        # The slot is held until the work really finishes, even if we stop waiting
+        future.add_done_callback(lambda _: self._slots.release())
+        try:
+            return future.result(timeout=HASH_TIMEOUT_SECONDS)
+        except FutureTimeout:
+            raise HashingBusy()
+
+    def shutdown(self):
+        with self._lock:
+            if self._executor is not None and self._pid == os.getpid():
+                self._executor.shutdown(wait=True)
+            self._executor = None
+
+
+pool = HashingPool()
+
+
+class BulkHasher:
+    """
+    Hashes whole batches of passwords on every CPU (bulk imports). It has
+    its own processes, separate from the request pool, and bypasses its
+    backpressure; close() when done.
+    """
+
+    def __init__(self, rounds=None, workers=None):
+        self.rounds = rounds or BCRYPT_ROUNDS
+        self.workers = workers or os.cpu_count() or 1
+        self._executor = None
+
+    def hash_all(self, passwords):
+        if not passwords:
+            return []
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.workers)
+        chunksize = max(1, len(passwords) // (self.workers * 4))
+        return list(self._executor.map(_bcrypt_hash, passwords, [self.rounds] * len(passwords), chunksize=chunksize))
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+
+def hash_password(password, rounds=None):
+    """bcrypt hash (str) at the configured cost, computed in the pool"""
+    return pool.run(_bcrypt_hash, password, rounds or BCRYPT_ROUNDS)
+
+def seconds_per_hash(rounds=None, samples=3):
+    """How long one bcrypt hash at rounds takes on this machine (measured here, not in the pool)"""
+    started = time.perf_counter()
+    for _ in range(samples):
+        _bcrypt_hash("estimate", rounds or BCRYPT_ROUNDS)
+    return (time.perf_counter() - started) / samples
+
+def is_legacy_hash(stored_hash):
+    return bool(stored_hash) and bool(_LEGACY_SHA256.match(stored_hash))
+
+def check_password(stored_hash, password):
+    """True if password matches a bcrypt or legacy SHA-256 hash"""
+    if not stored_hash or password is None:
+        return False
+    if is_legacy_hash(stored_hash):
+        digest = hashlib.sha256(password.encode("utf-8")).hexdigest()
+        return hmac.compare_digest(digest, stored_hash)
+    if not _BCRYPT.match(stored_hash):
+        return False
+    return pool.run(_bcrypt_check, stored_hash, password)
+
+def needs_rehash(stored_hash):
+    """Legacy SHA-256 hashes and bcrypt hashes at a different cost"""
+    if is_legacy_hash(stored_hash):
+        return True
+    match = _BCRYPT.match(stored_hash or "")
+    return bool(match) and int(match.group(1)) != BCRYPT_ROUNDS
@@ -0,0 +1,126 @@
+"""
+Job board search (/search-jobs): full-text matching on role and company
+with bm25 ranking, plus filters on location, paid status and duration.
+
+jobs_fts (rowid = jobs.id) is kept in sync by triggers on jobs, like
+users_fts in search_index.py. The facet counts shown next to the results
+(jobs per location, paid vs. unpaid, per duration) are not computed per
+request: they are counters in stats_counters named "jobs:<facet>:<value>",
+bumped by add_job and bulk imports in the same transaction as the job and
+corrected by the stats reconciler.
+"""
+
+import threading
+
+from sqlalchemy import text
+
+from search_index import to_match_query
+
+JOB_SEARCH_LIMIT = 20
+JOB_SEARCH_LIMIT_MAX = 100
+
+FACETS = ("location", "paid_status", "duration")
+
+# bm25 column weights: role, company_name
+_BM25_WEIGHTS = "3.0, 1.0"
+
+_SCHEMA = [
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS jobs_fts USING fts5(
+        role, company_name,
+        tokenize = 'unicode61',
+        prefix = '2 3'
+    )
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS jobs_fts_insert AFTER INSERT ON jobs BEGIN
+        INSERT INTO jobs_fts (rowid, role, company_name) VALUES (new.id, new.role, new.company_name);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS jobs_fts_update AFTER UPDATE OF role, company_name ON jobs BEGIN
+        UPDATE jobs_fts SET role = new.role, company_name = new.company_name WHERE rowid = new.id;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS jobs_fts_delete AFTER DELETE ON jobs BEGIN
+        DELETE FROM jobs_fts WHERE rowid = old.id;
+    END
+    """,
+]
+
+_TRIGGERS = ("jobs_fts_insert", "jobs_fts_update", "jobs_fts_delete")
+
+_ready = False
+_lock = threading.Lock()
+
+
+def facet_value(value):
+    """How a facet value is stored and counted: trimmed text (None stays None)"""
+    return None if value is None else str(value).strip()
+
+
+def facet_counter(facet, value):
+    """stats_counters name for one facet value"""
+    return f"jobs:{facet}:{facet_value(value) or ''}"
+
+
+def rebuild(session):
+    session.execute(text("DELETE FROM jobs_fts"))
+    session.execute(text("INSERT INTO jobs_fts (rowid, role, company_name) SELECT id, role, company_name FROM jobs"))
+
+
+def ensure_index(session):
+    """Create jobs_fts and its triggers if missing, backfilling when (re)created"""
+    global _ready
+    if _ready:
+        return
+    with _lock:
+        if _ready:
+            return
+        present = {row[0] for row in session.execute(text(
+            "SELECT name FROM sqlite_master WHERE name = 'jobs_fts' OR name LIKE 'jobs_fts_%'"
+        ))}
+        if "jobs_fts" not in present or not all(t in present for t in _TRIGGERS):
+            for statement in _SCHEMA:
+                session.execute(text(statement))
+            rebuild(session)
+            session.commit()
+            print("🔎 Job search index built")
+        _ready = True
+
+
+def search(session, query=None, filters=None, limit=JOB_SEARCH_LIMIT, offset=0):
+    """
+    (rows, total): rows of (id, role, company_name, location, paid_status,
+    duration), best match first when there is a query, newest first otherwise
+    """
+    limit = max(1, min(limit, JOB_SEARCH_LIMIT_MAX))
+    offset = max(0, offset)
+    where, params = [], {}
+    for facet in FACETS:
+        value = (filters or {}).get(facet)
+        if value:
+            where.append(f"j.{facet} = :{facet}")
+            params[facet] = value.strip()
+
+    match = to_match_query(query)
+    if match:
+        ensure_index(session)
+        source = "jobs_fts f JOIN jobs j ON j.id = f.rowid"
+        where.insert(0, "jobs_fts MATCH :match")
+        params["match"] = match
+        order = f"bm25(jobs_fts, {_BM25_WEIGHTS}), j.id DESC"
+    else:
+        source = "jobs j"
+        order = "j.created_at DESC, j.id DESC"
+
+    condition = f"WHERE {' AND '.join(where)}" if where else ""
+    total = session.execute(text(f"SELECT count(*) FROM {source} {condition}"), params).scalar()
+    rows = session.execute(text(f"""
+        SELECT j.id, j.role, j.company_name, j.location, j.paid_status, j.duration
+        FROM {source} {condition}
+        ORDER BY {order}
+        LIMIT :limit OFFSET :offset
+    """), {**params, "limit": limit, "offset": offset}).fetchall()
+    return rows, total
@@ -0,0 +1,157 @@
+"""
+Keyset pagination, filtering and field projection for the listing routes
+(/get-all-users, /get-all-jobs, /get-all-events).
+
+A Listing describes one endpoint: its sort keys, the fields a client may
+ask for and the filters it accepts. run() selects only the columns the
+requested fields need (never whole ORM entities), applies the filters,
+continues after the opaque ?after= cursor and returns at most ?limit=
+rows. The body stays a plain JSON array so existing pages keep working;
+the cursor for the next page travels in the X-Next-Cursor header (and a
+Link rel="next" header).
+"""
+
+import base64
+import json
+from datetime import date, datetime
+from urllib.parse import urlencode
+
+from flask import jsonify, request
+from sqlalchemy import and_, false, or_
+
+LIMIT_MAX = 200
+
+
+class BadListingRequest(ValueError):
+    """Invalid cursor, filter value or field name (the route answers 400)"""
+
+
+def encode_cursor(values):
+    raw = json.dumps([v.isoformat() if isinstance(v, (date, datetime)) else v for v in values])
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(token):
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (ValueError, TypeError):
+        raise BadListingRequest("Invalid cursor")
+    if not isinstance(values, list):
+        raise BadListingRequest("Invalid cursor")
+    return values
+
+
+class Field:
+    """An output field: the columns it needs and how to render them"""
+
+    def __init__(self, *columns, render=None):
+        self.columns = columns
+        self.render = render or (lambda value: value)
+
+
+class Listing:
+    def __init__(self, sort, fields, default_fields, filters=None, default_limit=50,
+                 cursor_types=None):
+        """
+        sort           - [(column or expression, descending)], unique overall
+                         (end with the primary key)
+        fields         - {name: Field}
+        default_fields - fields returned when ?fields= is absent
+        filters        - {query param: fn(raw value) -> SQL condition}
+        cursor_types   - parsers turning cursor values back into sort values
+        """
+        self.sort = sort
+        self.fields = fields
+        self.default_fields = default_fields
+        self.filters = filters or {}
+        self.default_limit = default_limit
+        self.cursor_types = cursor_types or [None] * len(sort)
+
+    def _after(self, values):
+        """(k1, k2, ...) strictly after the cursor in sort order"""
+        if len(values) != len(self.sort):
+            raise BadListingRequest("Invalid cursor")
+        try:
+            parsed = [parse(v) if parse and v is not None else v
+                      for parse, v in zip(self.cursor_types, values)]
+        except (ValueError, TypeError):
+            raise BadListingRequest("Invalid cursor")
+
+        clauses = []
+        for i, (key, descending) in enumerate(self.sort):
+            equal_prefix = [k.is_(None) if v is None else k == v
+                            for (k, _), v in zip(self.sort[:i], parsed[:i])]
+            clauses.append(and_(*equal_prefix, self._step(key, descending, parsed[i])))
+        return or_(*clauses)
+
+    @staticmethod
+    def _step(key, descending, value):
+        """key strictly after value; SQLite sorts NULL first ascending, last descending"""
+        if value is None:
+            return false() if descending else key.is_not(None)
+        if descending:
+            return or_(key < value, key.is_(None))
+        return key > value
+
+    def run(self, session):
+        names = [f.strip() for f in request.args.get("fields", "").split(",") if f.strip()]
+        names = names or list(self.default_fields)
+        unknown = [n for n in names if n not in self.fields]
+        if unknown:
+            raise BadListingRequest(f"Unknown field(s): {', '.join(unknown)}")
+
+        limit = request.args.get("limit", self.default_limit, type=int)
+        limit = max(1, min(limit, LIMIT_MAX))
+
+        # Only the columns needed for the requested fields, plus the sort keys
+        columns = []
+        position = {}   # by identity - SQL expressions overload ==
+        for name in names:
+            for col in self.fields[name].columns:
+                if id(col) not in position:
+                    position[id(col)] = len(columns)
+                    columns.append(col)
+        sort_start = len(columns)
+        columns.extend(key for key, _ in self.sort)
+
+        query = session.query(*columns)
+        for param, condition in self.filters.items():
+            value = request.args.get(param)
+            if value not in (None, ""):
+                try:
+                    query = query.filter(condition(value))
+                except (ValueError, TypeError):
+                    raise BadListingRequest(f"Invalid value for {param}")
+
+        after = request.args.get("after")
+        if after:
+            query = query.filter(self._after(decode_cursor(after)))
+
+        query = query.order_by(*[key.desc() if descending else key.asc() for key, descending in self.sort])
+        rows = query.limit(limit + 1).all()
+
+        items = []
+        for row in rows[:limit]:
+            item = {}
+            for name in names:
+                field = self.fields[name]
+                values = [row[position[id(c)]] for c in field.columns]
+                item[name] = field.render(*values)
+            items.append(item)
+
+        next_cursor = None
+        if len(rows) > limit:
+            next_cursor = encode_cursor(list(rows[limit - 1][sort_start:]))
+        return items, next_cursor
+
+    def respond(self, session):
+        """JSON array response with the next-page cursor in headers"""
+        items, next_cursor = self.run(session)
+        response = jsonify(items)
+        if next_cursor:
+            args = request.args.to_dict()
+            args["after"] = next_cursor
+            response.headers["X-Next-Cursor"] = next_cursor
+            response.headers["Link"] = f'<{request.path}?{urlencode(args)}>; rel="next"'
+        return response, 200
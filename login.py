@@ -2,13 +2,13 @@ from flask import Flask, request, jsonify
 from flask_bcrypt import Bcrypt
 from flask_cors import CORS
 from registration import db, User  # Ensure registration.py is in the same folder
+from database import configure_app
 
 app = Flask(__name__)
 CORS(app)
 
 # Use the same database as your registration app
-app.config["SQLALCHEMY_DATABASE_URI"] = "sqlite:///database.db"
-app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
+configure_app(app)
 
 # Initialize the db with this app
 db.init_app(app)
@@ -0,0 +1,198 @@
+"""
+Cold chat history, moved out of database.db into a separate SQLite file.
+
+Archiving is opt-in: set MESSAGE_ARCHIVE=1 for every app. The archive
+file (MESSAGE_ARCHIVE_PATH, default messages_archive.db next to the main
+database) is then ATTACHed as schema "archive" to every connection
+database.py opens on the shared database - sapp.py's, chat.py's and
+alapp.py's alike - and holds a messages table with the same columns and
+ids. Once the file exists it is attached whatever MESSAGE_ARCHIVE says,
+so turning archiving off never hides history; without either, no file
+is created and nothing is attached. A conversation is archived as a whole once its last message is
+older than MESSAGE_ARCHIVE_AFTER_DAYS, so the hot file - and its
+indexes, page cache, VACUUM and backups - only carries chats that are
+still active.
+
+Reads go through message_service.py, which queries both tables, so every
+app keeps showing archived history. Because a conversation moves in one
+piece and later messages get higher ids, archived ids of a pair are
+always below its hot ids.
+
+messages.id has no AUTOINCREMENT: SQLite gives a new row max(id) + 1 of
+the hot table. The conversation holding that newest id is therefore never
+archived, or new messages could reuse archived ids.
+
+Moving is two transactions (copy, then delete the copied rows): SQLite
+only commits atomically per file in WAL mode, and this way a crash in
+between leaves a duplicate - which readers skip and the next run
+removes - instead of a lost message.
+"""
+
+import os
+from datetime import datetime, timedelta
+
+from sqlalchemy import Column, DateTime, Integer, MetaData, String, Table, Text, func, select, text
+
+ARCHIVING = os.environ.get("MESSAGE_ARCHIVE", "").lower() in ("1", "true", "yes", "on")
+ARCHIVE_AFTER_DAYS = int(os.environ.get("MESSAGE_ARCHIVE_AFTER_DAYS", 180))
+ARCHIVE_BATCH_PAIRS = 200
+
+table = Table(
+    "messages", MetaData(schema="archive"),
+    Column("id", Integer, primary_key=True),
+    Column("sender_id", Integer, nullable=False),
+    Column("receiver_id", Integer, nullable=False),
+    Column("content", Text, nullable=False),
+    Column("timestamp", DateTime),
+    # Kept for the record: retries are only deduplicated against the hot
+    # table, and an archived conversation has been idle far longer than any retry
+    Column("client_id", String(64)),
+)
+
+_SCHEMA = [
+    """
+    CREATE TABLE IF NOT EXISTS archive.messages (
+        id INTEGER PRIMARY KEY,
+        sender_id INTEGER NOT NULL,
+        receiver_id INTEGER NOT NULL,
+        content TEXT NOT NULL,
+        timestamp DATETIME,
+        client_id VARCHAR(64)
+    )
+    """,
+    """
+    CREATE INDEX IF NOT EXISTS archive.ix_archive_messages_pair
+    ON messages (min(sender_id, receiver_id), max(sender_id, receiver_id), id)
+    """,
+    # "Who have I talked to" (message_service.partners) in either direction
+    "CREATE INDEX IF NOT EXISTS archive.ix_archive_messages_sender_receiver ON messages (sender_id, receiver_id)",
+    "CREATE INDEX IF NOT EXISTS archive.ix_archive_messages_receiver_sender ON messages (receiver_id, sender_id)",
+]
+
+# "(low, high)" pair expression shared by every statement below
+_PAIR = "min(sender_id, receiver_id) = :low AND max(sender_id, receiver_id) = :high"
+
+path = None
+_attached = False
+
+
+def configure(main_path):
+    """
+    Use the archive file that belongs to main_path (database.py calls
+    this once): attached if archiving is on or the file already exists
+    """
+    global path, _attached
+    path = os.path.abspath(os.environ.get("MESSAGE_ARCHIVE_PATH") or
+                           os.path.join(os.path.dirname(os.path.abspath(main_path)), "messages_archive.db"))
+    _attached = ARCHIVING or os.path.exists(path)
+
+
+def attach(dbapi_connection):
+    """ATTACH the archive to a new sqlite3 connection on the main database (if enabled)"""
+    if not _attached:
+        return
+    cur = dbapi_connection.cursor()
+    cur.execute("ATTACH DATABASE ? AS archive", (path,))
+    cur.execute("PRAGMA archive.journal_mode=WAL")
+    cur.execute("PRAGMA archive.synchronous=NORMAL")
+    for statement in _SCHEMA:
+        cur.execute(statement)
+    # Archive files from before client_id
+    if "client_id" not in {row[1] for row in cur.execute("PRAGMA archive.table_info(messages)")}:
+        cur.execute("ALTER TABLE archive.messages ADD COLUMN client_id VARCHAR(64)")
+    cur.close()
+
+
+def enabled():
+    """True if connections to the main database have the archive attached"""
+    return _attached
+
+
+def archiving():
+    """True if conversations should be moved to the archive (MESSAGE_ARCHIVE=1)"""
+    return ARCHIVING and _attached
+
+
+def watermark(session):
+    """Newest archived id (0 if none): no archived message has a higher id"""
+    if not enabled():
+        return 0
+    return session.execute(select(func.max(table.c.id))).scalar() or 0
+
+
+def count_after(session, sender_id, receiver_id, after):
+    """Archived messages from sender to receiver with an id above after"""
+    if not enabled() or after >= watermark(session):
+        return 0
+    return session.execute(select(func.count()).select_from(table).where(
+        table.c.sender_id == sender_id, table.c.receiver_id == receiver_id, table.c.id > after
+    )).scalar()
+
+
+def all_messages_sql():
+    """Subquery text for hot and archived messages together (duplicates removed)"""
+    columns = "id, sender_id, receiver_id, content, timestamp"
+    if not enabled():
+        return f"(SELECT {columns} FROM main.messages)"
+    return f"(SELECT {columns} FROM main.messages UNION SELECT {columns} FROM archive.messages)"
+
+
+def cold_pairs(session, cutoff, limit=None):
+    """
+    (low, high) of conversations whose newest hot message is older than
+    cutoff, except the one holding the newest id. Judged from the
+    messages themselves, so it holds whichever app sent them.
+    """
+    rows = session.execute(text(f"""
+        SELECT p.low, p.high FROM (
+            -- One pass over ix_messages_pair: newest id per conversation
+            SELECT min(sender_id, receiver_id) AS low, max(sender_id, receiver_id) AS high,
+                   max(id) AS last_id
+            FROM main.messages GROUP BY low, high
+        ) AS p
+        JOIN main.messages m ON m.id = p.last_id
+        WHERE m.timestamp < :cutoff
+          AND p.last_id != (SELECT max(id) FROM main.messages)
+        ORDER BY m.timestamp
+        {"LIMIT :limit" if limit else ""}
+    """), {"cutoff": cutoff, "limit": limit})
+    return [tuple(row) for row in rows]
+
+
+def archive_pairs(session, pairs):
+    """Move every hot message of the given (low, high) pairs to the archive; returns messages moved"""
+    for low, high in pairs:
+        session.execute(text(f"""
+            INSERT OR IGNORE INTO archive.messages (id, sender_id, receiver_id, content, timestamp, client_id)
+            SELECT id, sender_id, receiver_id, content, timestamp, client_id FROM main.messages WHERE {_PAIR}
+        """), {"low": low, "high": high})
+    session.commit()
+
+    moved = 0
+    for low, high in pairs:
+        # Only rows that made it into the archive; anything sent meanwhile stays hot
+        moved += session.execute(text(f"""
+            DELETE FROM main.messages WHERE {_PAIR}
+              AND id IN (SELECT id FROM archive.messages WHERE {_PAIR})
+        """), {"low": low, "high": high}).rowcount
+    session.commit()
+    return moved
+
+
+def archive_cold(session, after_days=ARCHIVE_AFTER_DAYS, batch_pairs=ARCHIVE_BATCH_PAIRS, max_pairs=None):
+    """Archive conversations idle for after_days, batch_pairs at a time; returns (pairs, messages)"""
+    if not archiving():
+        return 0, 0
+    cutoff = datetime.utcnow() - timedelta(days=after_days)
+    pairs = cold_pairs(session, cutoff, max_pairs)
+    moved = 0
+    for start in range(0, len(pairs), batch_pairs):
+        moved += archive_pairs(session, pairs[start:start + batch_pairs])
+    return len(pairs), moved
+
+
+def clear(session):
+    """Delete every archived message (when the main database is recreated)"""
+    if enabled():
+        session.execute(text("DELETE FROM archive.messages"))
+        session.commit()
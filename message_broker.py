@@ -0,0 +1,71 @@
+"""
+In-process fan-out broker for chat push delivery.
+
+Every open /stream/<user_id> connection subscribes here and receives
+what is published for that user. The broker itself only fans out inside
+one process; what it publishes comes from sapp.py's message tail, which
+reads new rows from the messages table every MESSAGE_STREAM_POLL_MS. So
+each worker's streams see every message, whichever worker (or chat.py /
+alapp.py) committed it. The front-end keeps a slow ?after= poll as a
+safety net for dropped connections.
+"""
+
+import queue
+import threading
+
+# Messages buffered per connection; a subscriber that falls further
+# behind is marked overflowed and its stream closes, so the browser
+# reconnects with Last-Event-ID and the gap is replayed from the database
+SUBSCRIBER_QUEUE_SIZE = 100
+
+
+class Subscription(queue.Queue):
+    overflowed = False
+
+
+class MessageBroker:
+    def __init__(self, queue_size=SUBSCRIBER_QUEUE_SIZE):
+        self.queue_size = queue_size
+        self._subscribers = {}
+        self._lock = threading.Lock()
+
+    def subscribe(self, user_id):
+        """Register a new listener for user_id and return its queue"""
+        q = Subscription(maxsize=self.queue_size)
+        with self._lock:
+            self._subscribers.setdefault(user_id, set()).add(q)
+        return q
+
+    def unsubscribe(self, user_id, q):
+        with self._lock:
+            listeners = self._subscribers.get(user_id)
+            if listeners is None:
+                return
+            listeners.discard(q)
+            if not listeners:
+                del self._subscribers[user_id]
+
+    def publish(self, user_id, payload):
+        """Deliver payload to every listener of user_id, returns how many got it"""
+        with self._lock:
+            listeners = list(self._subscribers.get(user_id, ()))
+
+        delivered = 0
+        for q in listeners:
+            try:
+                q.put_nowait(payload)
+                delivered += 1
+            except queue.Full:
+                # Slow consumer - never block the sender; the stream
+                # reconnects and replays instead
+                q.overflowed = True
+        return delivered
+
+    def subscriber_count(self, user_id=None):
+        with self._lock:
+            if user_id is not None:
+                return len(self._subscribers.get(user_id, ()))
+            return sum(len(listeners) for listeners in self._subscribers.values())
+
+
+broker = MessageBroker()
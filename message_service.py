@@ -0,0 +1,413 @@
+"""
+The one chat message store shared by sapp.py, chat.py and alapp.py.
+
+Every app keeps its messages in the same database.db table:
+
+    messages(id, sender_id INT, receiver_id INT, content, timestamp, client_id)
+
+with ix_messages_pair (one index range per conversation, both
+directions, in id order) and the two sender/receiver covering indexes
+for "who have I talked to". client_id is an optional key the sender
+picks (or the app generates) per message: a retried send with the same
+key returns the stored message instead of inserting it again (checked
+against the hot table only; see message_archive.py). Next to it, conversations holds one
+summary row per user and chat partner (last message, read marker,
+unread count) for sapp.py's sidebar; send_many() keeps it current in
+the same transaction, whichever app sends. The Tables below are the only
+definitions: the Flask-SQLAlchemy apps map their models onto them and
+alapp.py creates them from the same DDL.
+
+The helpers take either a SQLAlchemy Session/Connection or a raw
+sqlite3 connection (alapp.py's pool), so every app sends and reads
+through the same SQL and the same indexes. They do not commit. Reads
+include the attached message archive (see message_archive.py).
+
+prepare_schema() (run when sapp.py and chat.py are built), ensure_schema()
+(alapp.py) or 4_migrate_indexes.py add columns that older databases lack. Databases from before this module may still have alapp.py's
+messages(sender TEXT, receiver TEXT) layout or chatdb.py's
+chat_messages table; 12_migrate_messages.py merges both into this one.
+"""
+
+import os
+import sqlite3
+import uuid
+from collections import namedtuple
+from datetime import datetime
+
+from sqlalchemy import Column, DateTime, ForeignKey, Index, Integer, MetaData, String, Table, Text, func, text
+from sqlalchemy.dialects import sqlite as sqlite_dialect
+from sqlalchemy.schema import CreateIndex, CreateTable
+
+import message_archive
+
+TABLE_NAME = "messages"
+# Database files 12_migrate_messages.py has merged into the shared one
+LEGACY_IMPORTS = "legacy_imports"
+SNIPPET_LENGTH = 100
+CLIENT_ID_MAX = 64
+# How SQLAlchemy's DateTime stores values in SQLite
+TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M:%S.%f"
+
+# id, sender_id, receiver_id, content, timestamp (a datetime)
+ChatMessage = namedtuple("ChatMessage", "id sender_id receiver_id content timestamp")
+
+_COLUMNS = "id, sender_id, receiver_id, content, timestamp"
+_PAIR = "min(sender_id, receiver_id) = :low AND max(sender_id, receiver_id) = :high"
+
+
+class LegacySchemaError(RuntimeError):
+    """database.db still has a pre-unification messages table"""
+
+
+def _user_ref(metadata):
+    # Foreign keys only where the users table is part of the same metadata
+    has_users = "users" in metadata.tables
+    def user_ref():
+        return (ForeignKey("users.id"),) if has_users else ()
+    return user_ref
+
+
+def messages_table(metadata):
+    """Define the messages table (and its indexes) on metadata"""
+    user_ref = _user_ref(metadata)
+    table = Table(
+        TABLE_NAME, metadata,
+        Column("id", Integer, primary_key=True),
+        Column("sender_id", Integer, *user_ref(), nullable=False),
+        Column("receiver_id", Integer, *user_ref(), nullable=False),
+        Column("content", Text, nullable=False),
+        Column("timestamp", DateTime, default=datetime.utcnow),
+        Column("client_id", String(CLIENT_ID_MAX)),
+    )
+    # Retried sends: one message per sender and client_id
+    Index(
+        "ux_messages_sender_client", table.c.sender_id, table.c.client_id,
+        unique=True, sqlite_where=table.c.client_id.isnot(None)
+    )
+    # Sidebar lookups ("who have I talked to") in either direction
+    Index("ix_messages_sender_receiver", table.c.sender_id, table.c.receiver_id)
+    Index("ix_messages_receiver_sender", table.c.receiver_id, table.c.sender_id)
+    # A conversation is keyed by its canonical (low id, high id) pair so both
+    # directions share one index range; id is in send order, so it doubles as
+    # the timestamp ordering used by the message cursors.
+    Index(
+        "ix_messages_pair",
+        func.min(table.c.sender_id, table.c.receiver_id),
+        func.max(table.c.sender_id, table.c.receiver_id),
+        table.c.id
+    )
+    return table
+
+
+def conversations_table(metadata):
+    """Define the per-user conversation summary table on metadata"""
+    user_ref = _user_ref(metadata)
+    table = Table(
+        "conversations", metadata,
+        Column("user_id", Integer, *user_ref(), primary_key=True),
+        Column("partner_id", Integer, *user_ref(), primary_key=True),
+        Column("last_message_id", Integer, nullable=False),
+        Column("last_sender_id", Integer, nullable=False),
+        Column("last_snippet", String(200), nullable=False, default=""),
+        Column("last_message_at", DateTime),
+        Column("last_read_message_id", Integer, nullable=False, default=0),
+        Column("unread_count", Integer, nullable=False, default=0),
+    )
+    Index("ix_conversations_user_recent", table.c.user_id, table.c.last_message_id)
+    return table
+
+
+def _tables():
+    metadata = MetaData()
+    return (messages_table(metadata), conversations_table(metadata))
+
+
+def schema_statements(conn=None, tables=None):
+    """
+    CREATE TABLE / CREATE INDEX IF NOT EXISTS text for connections without
+    SQLAlchemy; given conn, also ALTER TABLE ... ADD COLUMN for the
+    nullable columns its existing tables lack. tables defaults to
+    messages and conversations.
+    """
+    dialect = sqlite_dialect.dialect()
+    statements = []
+    for table in tables if tables is not None else _tables():
+        statements.append(str(CreateTable(table, if_not_exists=True).compile(dialect=dialect)))
+        present = set(columns(conn, table.name)) if conn is not None else set()
+        for column in table.columns:
+            if present and column.name not in present and column.nullable:
+                statements.append(
+                    f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column.type.compile(dialect=dialect)}"
+                )
+        for index in sorted(table.indexes, key=lambda i: i.name):
+            statements.append(str(CreateIndex(index, if_not_exists=True).compile(dialect=dialect)))
+    return statements
+
+
+def execute(conn, sql, params=None):
+    """
+    Run SQL with :named parameters on a sqlite3 connection or a SQLAlchemy
+    Session/Connection; a list of parameter dicts runs it once per dict
+    """
+    if isinstance(conn, sqlite3.Connection):
+        if isinstance(params, list):
+            return conn.executemany(sql, params)
+        return conn.execute(sql, params or {})
+    return conn.execute(text(sql), params or {})
+
+
+def columns(conn, table=TABLE_NAME):
+    return [row[1] for row in execute(conn, f"PRAGMA main.table_info({table})")]
+
+
+def is_legacy(conn):
+    """True if messages still has alapp.py's sender/receiver TEXT layout"""
+    present = columns(conn)
+    return "sender" in present and "sender_id" not in present
+
+
+def legacy_file_pending(conn, path):
+    """
+    True if path, a database file from before the shared one (alapp.py's
+    old database.db), still has users or messages that
+    12_migrate_messages.py has not merged into conn's database
+    """
+    if not os.path.exists(path):
+        return False
+    main_file = next(row[2] for row in execute(conn, "PRAGMA database_list") if row[1] == "main")
+    if main_file and os.path.realpath(main_file) == os.path.realpath(path):
+        return False
+    if execute(conn, "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :t",
+               {"t": LEGACY_IMPORTS}).fetchone():
+        if execute(conn, f"SELECT 1 FROM {LEGACY_IMPORTS} WHERE source = :p",
+                   {"p": os.path.realpath(path)}).fetchone():
+            return False
+    source = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+    try:
+        for (table,) in source.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'table' AND name IN ('users', 'messages')"
+        ).fetchall():
+            if source.execute(f"SELECT 1 FROM {table} LIMIT 1").fetchone():
+                return True
+        return False
+    finally:
+        source.close()
+
+
+def ensure_schema(conn):
+    """Create the messages and conversations tables if missing (refuses a legacy layout)"""
+    if is_legacy(conn):
+        raise LegacySchemaError(
+            "messages still uses the old sender/receiver text layout - run 12_migrate_messages.py"
+        )
+    for statement in schema_statements(conn):
+        execute(conn, statement)
+
+
+def prepare_schema(engine, tables, legacy_path=None):
+    """
+    Bring the database up to an app's models when the app is built (so
+    gunicorn workers get new columns and indexes too): missing tables,
+    nullable columns and indexes, all in one BEGIN IMMEDIATE so workers
+    starting together take turns. Returns False, changing nothing, while
+    the messages still need 12_migrate_messages.py.
+    """
+    with engine.connect() as conn:
+        conn.exec_driver_sql("BEGIN IMMEDIATE")
+        if is_legacy(conn) or (legacy_path and legacy_file_pending(conn, legacy_path)):
+            conn.rollback()
+            return False
+        for statement in schema_statements(conn, tables):
+            execute(conn, statement)
+        conn.commit()
+    return True
+
+
+def _timestamp(value):
+    if value is None or isinstance(value, datetime):
+        return value
+    return datetime.fromisoformat(str(value))
+
+
+def client_id(value=None):
+    """A message's client id: value checked (ValueError if unusable), or a new one"""
+    if value is None:
+        return uuid.uuid4().hex
+    if not isinstance(value, str) or not value.strip() or len(value) > CLIENT_ID_MAX:
+        raise ValueError(f"client_id must be a non-empty string of at most {CLIENT_ID_MAX} characters")
+    return value
+
+
+def _message(row):
+    return ChatMessage(row[0], row[1], row[2], row[3], _timestamp(row[4]))
+
+
+def record_conversations(conn, msgs):
+    """
+    Upsert both sides' conversations rows for inserted ChatMessages (in
+    id order), one row per conversation side however many of its
+    messages the batch holds
+    """
+    sides = {}
+    for msg in msgs:
+        if msg.sender_id == msg.receiver_id:
+            continue  # notes to self never show up in the sidebar
+        for owner, partner, own in ((msg.sender_id, msg.receiver_id, True),
+                                    (msg.receiver_id, msg.sender_id, False)):
+            side = sides.setdefault((owner, partner), {"last": None, "read_up_to": None, "unread": 0})
+            side["last"] = msg
+            if own:
+                # Your own message means you have read the conversation up to it
+                side["read_up_to"] = msg.id
+                side["unread"] = 0
+            else:
+                side["unread"] += 1
+
+    if not sides:
+        return
+    rows = [{
+        "owner": owner,
+        "partner": partner,
+        "last_id": side["last"].id,
+        "last_sender": side["last"].sender_id,
+        "snippet": side["last"].content[:SNIPPET_LENGTH],
+        "last_at": (side["last"].timestamp or datetime.utcnow()).strftime(TIMESTAMP_FORMAT),
+        "read_up_to": side["read_up_to"] or 0,
+        "unread": side["unread"],
+        # 1 when this side sent in the batch: read marker moves, unread restarts
+        "reset": int(side["read_up_to"] is not None),
+    } for (owner, partner), side in sides.items()]
+    execute(conn, """
+        INSERT INTO conversations (user_id, partner_id, last_message_id, last_sender_id, last_snippet,
+                                   last_message_at, last_read_message_id, unread_count)
+        VALUES (:owner, :partner, :last_id, :last_sender, :snippet, :last_at, :read_up_to, :unread)
+        ON CONFLICT (user_id, partner_id) DO UPDATE SET
+            last_message_id = excluded.last_message_id,
+            last_sender_id = excluded.last_sender_id,
+            last_snippet = excluded.last_snippet,
+            last_message_at = excluded.last_message_at,
+            last_read_message_id = CASE WHEN :reset THEN excluded.last_read_message_id
+                                        ELSE conversations.last_read_message_id END,
+            unread_count = CASE WHEN :reset THEN excluded.unread_count
+                                ELSE conversations.unread_count + excluded.unread_count END
+    """, rows)
+
+
+def send_many(conn, items):
+    """
+    Insert {"sender", "receiver", "content"[, "client_id"]} items with one
+    multi-row INSERT and update their conversations rows; returns their
+    ChatMessages in the order given. An item whose (sender, client_id) is
+    already stored is not inserted again: the stored message is returned.
+    """
+    if not items:
+        return []
+    now = datetime.utcnow()
+    values, params = [], {}
+    for i, item in enumerate(items):
+        values.append(f"(:s{i}, :r{i}, :c{i}, :t{i}, :k{i})")
+        params.update({
+            f"s{i}": int(item["sender"]),
+            f"r{i}": int(item["receiver"]),
+            f"c{i}": item["content"],
+            f"t{i}": now.strftime(TIMESTAMP_FORMAT),
+            f"k{i}": item.get("client_id")
+        })
+    rows = execute(conn, f"""
+        INSERT INTO messages (sender_id, receiver_id, content, timestamp, client_id)
+        VALUES {", ".join(values)}
+        ON CONFLICT DO NOTHING
+        RETURNING {_COLUMNS}, client_id
+    """, params).fetchall()
+    # Inserted rows get increasing ids in VALUES order; the items that
+    # were skipped as duplicates are the ones with no row of their own
+    inserted = iter(sorted(rows, key=lambda row: row[0]))
+    row = next(inserted, None)
+    msgs, new_msgs, claimed = [], [], set()
+    for i, item in enumerate(items):
+        key = (params[f"s{i}"], params[f"k{i}"])
+        if row is not None and (row[1], row[5]) == key and key not in claimed:
+            msg = _message(row)
+            new_msgs.append(msg)
+            if key[1] is not None:
+                claimed.add(key)
+            row = next(inserted, None)
+        else:
+            msg = _message(execute(conn, f"""
+                SELECT {_COLUMNS} FROM messages WHERE sender_id = :s AND client_id = :k
+            """, {"s": key[0], "k": key[1]}).fetchone())
+        msgs.append(msg)
+    record_conversations(conn, new_msgs)
+    return msgs
+
+
+def send(conn, sender_id, receiver_id, content, client_id=None):
+    item = {"sender": sender_id, "receiver": receiver_id, "content": content, "client_id": client_id}
+    return send_many(conn, [item])[0]
+
+
+def _sources():
+    if message_archive.enabled():
+        return ("main.messages", "archive.messages")
+    return ("messages",)
+
+
+def page(conn, u1, u2, before=None, after=None, limit=None):
+    """
+    Messages between two users from ix_messages_pair (hot and archived):
+    newer than after (oldest first), or else older than before / the
+    latest (newest first). limit=None returns the whole range.
+    """
+    low, high = min(u1, u2), max(u1, u2)
+    where, params = [_PAIR], {"low": low, "high": high}
+    if after is not None:
+        where.append("id > :after")
+        params["after"] = after
+        order = "ASC"
+    else:
+        if before is not None:
+            where.append("id < :before")
+            params["before"] = before
+        order = "DESC"
+    limit_sql = ""
+    if limit is not None:
+        limit_sql = " LIMIT :limit"
+        params["limit"] = limit
+    branches = [
+        f"SELECT {_COLUMNS} FROM {source} WHERE {' AND '.join(where)} ORDER BY id {order}{limit_sql}"
+        for source in _sources()
+    ]
+    if len(branches) == 1:
+        sql = branches[0]
+    else:
+        # Each side stops at its own limit on its pair index; UNION also drops
+        # the copy an interrupted archive run can leave in both files
+        sql = " UNION ".join(f"SELECT * FROM ({branch})" for branch in branches)
+        sql += f" ORDER BY id {order}{limit_sql}"
+    return [_message(row) for row in execute(conn, sql, params)]
+
+
+def conversation(conn, u1, u2):
+    """Every message between two users, oldest first"""
+    return page(conn, u1, u2, after=0)
+
+
+def partners(conn, user_id):
+    """Ids of everyone user_id has sent to or received from (both covering indexes, hot and archived)"""
+    sql = " UNION ".join(
+        f"SELECT receiver_id FROM {source} WHERE sender_id = :uid "
+        f"UNION SELECT sender_id FROM {source} WHERE receiver_id = :uid"
+        for source in _sources()
+    )
+    return [row[0] for row in execute(conn, sql, {"uid": user_id})]
+
+
+def resolve_user(conn, value):
+    """User id for an id or a username (alapp.py's clients send either); None if unknown"""
+    value = str(value).strip()
+    if value.isdigit():
+        row = execute(conn, "SELECT id FROM users WHERE id = :v", {"v": int(value)}).fetchone()
+        if row:
+            return row[0]
+    row = execute(conn, "SELECT id FROM users WHERE username = :v ORDER BY id LIMIT 1", {"v": value}).fetchone()
+    return row[0] if row else None
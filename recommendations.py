@@ -0,0 +1,163 @@
+"""
+Mentor recommendations: which alumni should a student talk to?
+
+Each alumnus is scored against the student on
+    - skill overlap: cosine similarity of sparse TF-IDF vectors over the
+      normalized skill names (rare skills count for more than "python"),
+    - same department,
+    - batch proximity (recent alumni are easier to relate to).
+
+Scoring reads the posting lists of skill_index, so candidates are found
+through the inverted index instead of comparing against every alumnus.
+compute_all() is the batch job (see 7_compute_recommendations.py); it
+stores the top results per student in mentor_recommendations, which the
+/recommend-mentors route only reads, with one indexed lookup.
+mentor_recommendation_state marks each student as computed, an empty
+result included, so nothing is scored twice. New students, and students
+whose profile changed (forget()), have no state row: compute_pending()
+scores them from sapp.py's background thread within seconds. Alumni
+changes are picked up by the next batch run.
+"""
+
+import heapq
+import math
+
+from sqlalchemy import text
+
+from skill_index import normalize, parse_year
+
+TOP_K = 10
+PENDING_BATCH = 200
+
+WEIGHT_SKILLS = 0.6
+WEIGHT_DEPARTMENT = 0.25
+WEIGHT_BATCH = 0.15
+
+
+def _idf(index, skill, total_users):
+    return math.log((total_users + 1) / (len(index.by_skill.get(skill, ())) + 1)) + 1
+
+
+def _vector(index, skills, total_users):
+    """L2-normalized TF-IDF vector (binary term frequency) for a list of skills"""
+    vec = {}
+    for skill in skills:
+        key = normalize(skill)
+        if key:
+            vec[key] = _idf(index, key, total_users)
+    norm = math.sqrt(sum(w * w for w in vec.values())) or 1.0
+    return {k: w / norm for k, w in vec.items()}
+
+
+def _batch_proximity(student_year, alumni_year):
+    if student_year is None or alumni_year is None:
+        return 0.0
+    return 1.0 / (1.0 + abs(student_year - alumni_year) / 5.0)
+
+
+def recommend(index, student_id, k=TOP_K):
+    """[(alumni_id, score, shared skills)] best first, from the in-memory index"""
+    with index.lock:
+        student = index.users.get(student_id)
+        if student is None:
+            return []
+
+        alumni = set(index.by_role.get("alumni", ()))
+        alumni.discard(student_id)
+        if not alumni:
+            return []
+
+        total_users = len(index.users)
+        student_vec = _vector(index, student["skills"], total_users)
+        student_dept = normalize(student["department"])
+        student_year = parse_year(student["batch_year"])
+
+        # Sparse dot products, accumulated only over alumni who share a skill
+        dots = {}
+        shared = {}
+        for skill, weight in student_vec.items():
+            for uid in index.by_skill.get(skill, ()):
+                if uid in alumni:
+                    dots[uid] = dots.get(uid, 0.0) + weight * _idf(index, skill, total_users)
+                    shared.setdefault(uid, []).append(skill)
+
+        candidates = set(dots)
+        if student_dept:
+            candidates.update(uid for uid in index.by_department.get(student_dept, ()) if uid in alumni)
+        if len(candidates) < k:
+            candidates = alumni    # not enough overlap - rank everyone by department and batch
+
+        def score(uid):
+            mentor = index.users[uid]
+            skill_score = 0.0
+            if uid in dots:
+                mentor_norm = math.sqrt(sum(
+                    _idf(index, normalize(s), total_users) ** 2 for s in mentor["skills"]
+                )) or 1.0
+                skill_score = dots[uid] / mentor_norm
+            dept_score = 1.0 if student_dept and normalize(mentor["department"]) == student_dept else 0.0
+            batch_score = _batch_proximity(student_year, parse_year(mentor["batch_year"]))
+            return WEIGHT_SKILLS * skill_score + WEIGHT_DEPARTMENT * dept_score + WEIGHT_BATCH * batch_score
+
+        best = heapq.nlargest(k, ((score(uid), -uid) for uid in candidates))
+        return [(-neg_uid, round(s, 4), shared.get(-neg_uid, [])) for s, neg_uid in best]
+
+
+def store(session, student_id, recs):
+    """Replace a student's stored list (an empty one too) and mark them computed"""
+    session.execute(text("DELETE FROM mentor_recommendations WHERE student_id = :sid"), {"sid": student_id})
+    session.execute(text("""
+        INSERT INTO mentor_recommendation_state (student_id, computed_at) VALUES (:sid, CURRENT_TIMESTAMP)
+        ON CONFLICT (student_id) DO UPDATE SET computed_at = excluded.computed_at
+    """), {"sid": student_id})
+    if recs:
+        session.execute(text("""
+            INSERT INTO mentor_recommendations (student_id, rank, alumni_id, score, shared_skills)
+            VALUES (:student_id, :rank, :alumni_id, :score, :shared_skills)
+        """), [{
+            "student_id": student_id,
+            "rank": rank,
+            "alumni_id": alumni_id,
+            "score": score,
+            "shared_skills": ", ".join(shared)
+        } for rank, (alumni_id, score, shared) in enumerate(recs, start=1)])
+
+
+def forget(session, student_id):
+    """Drop a student's stored list so compute_pending() scores them again"""
+    session.execute(text("DELETE FROM mentor_recommendations WHERE student_id = :sid"), {"sid": student_id})
+    session.execute(text("DELETE FROM mentor_recommendation_state WHERE student_id = :sid"), {"sid": student_id})
+
+
+def compute_pending(session, index, limit=PENDING_BATCH):
+    """Score up to limit students with no stored result yet; returns how many"""
+    students = [row[0] for row in session.execute(text("""
+        SELECT u.id FROM users u
+        LEFT JOIN mentor_recommendation_state s ON s.student_id = u.id
+        WHERE s.student_id IS NULL AND lower(trim(u.role)) = 'student'
+        ORDER BY u.id
+        LIMIT :limit
+    """), {"limit": limit})]
+    if not students:
+        return 0
+    index.ensure_fresh(session)
+    for student_id in students:
+        store(session, student_id, recommend(index, student_id))
+    session.commit()
+    return len(students)
+
+
+def compute_all(session, index, k=TOP_K, batch_size=500):
+    """Batch job: rebuild the index and store fresh top-k lists for every student"""
+    index.rebuild(session)
+    with index.lock:
+        students = list(index.by_role.get("student", ()))
+
+    session.execute(text("DELETE FROM mentor_recommendations"))
+    session.execute(text("DELETE FROM mentor_recommendation_state"))
+    for i, student_id in enumerate(students, start=1):
+        store(session, student_id, recommend(index, student_id, k))
+        if i % batch_size == 0:
+            session.commit()
+    session.commit()
+    return len(students)
@@ -0,0 +1,161 @@
+"""
+Recurring events: a small subset of RFC 5545 RRULEs stored on
+Event.recurrence, e.g.
+
+    FREQ=WEEKLY;BYDAY=MO,WE;COUNT=10
+    FREQ=MONTHLY;INTERVAL=2;UNTIL=20261231
+    FREQ=YEARLY
+
+Supported parts: FREQ (DAILY, WEEKLY, MONTHLY, YEARLY), INTERVAL, COUNT,
+UNTIL and BYDAY (WEEKLY only). The event's own date is the first
+occurrence; a monthly series on the 31st skips shorter months.
+
+A series is never materialized. occurrences() expands it only inside the
+requested window and, unless COUNT is set, jumps straight to the first
+period that can overlap the window instead of walking from the start.
+"""
+
+from datetime import date, datetime, timedelta
+from itertools import count as periods
+
+FREQUENCIES = ("DAILY", "WEEKLY", "MONTHLY", "YEARLY")
+WEEKDAYS = {"MO": 0, "TU": 1, "WE": 2, "TH": 3, "FR": 4, "SA": 5, "SU": 6}
+MAX_COUNT = 1000
+
+# series_end for a rule with neither COUNT nor UNTIL
+FOREVER = date(9999, 12, 31)
+
+
+class Rule:
+    def __init__(self, freq, interval=1, count=None, until=None, byday=()):
+        self.freq = freq
+        self.interval = interval
+        self.count = count
+        self.until = until
+        self.byday = byday
+
+
+def parse_rule(text):
+    """'RRULE:FREQ=WEEKLY;BYDAY=MO' -> Rule; ValueError if invalid or unsupported"""
+    text = (text or "").strip()
+    if text.upper().startswith("RRULE:"):
+        text = text[len("RRULE:"):]
+    parts = {}
+    for part in filter(None, text.upper().split(";")):
+        key, sep, value = part.partition("=")
+        if not sep or not value:
+            raise ValueError(f"Invalid recurrence part: {part}")
+        parts[key.strip()] = value.strip()
+
+    freq = parts.pop("FREQ", None)
+    if freq not in FREQUENCIES:
+        raise ValueError("Recurrence needs FREQ=DAILY, WEEKLY, MONTHLY or YEARLY")
+    interval = int(parts.pop("INTERVAL", 1))
+    if interval < 1:
+        raise ValueError("INTERVAL must be at least 1")
+
+    count = parts.pop("COUNT", None)
+    if count is not None:
+        count = int(count)
+        if not 1 <= count <= MAX_COUNT:
+            raise ValueError(f"COUNT must be between 1 and {MAX_COUNT}")
+
+    until = parts.pop("UNTIL", None)
+    if until is not None:
+        until = datetime.strptime(until[:8], "%Y%m%d").date()
+    if count is not None and until is not None:
+        raise ValueError("Use either COUNT or UNTIL, not both")
+
+    byday = ()
+    if "BYDAY" in parts:
+        if freq != "WEEKLY":
+            raise ValueError("BYDAY is only supported with FREQ=WEEKLY")
+        try:
+            byday = tuple(sorted({WEEKDAYS[d.strip()] for d in parts.pop("BYDAY").split(",")}))
+        except KeyError:
+            raise ValueError("BYDAY takes MO, TU, WE, TH, FR, SA, SU")
+
+    if parts:
+        raise ValueError(f"Unsupported recurrence part(s): {', '.join(sorted(parts))}")
+    return Rule(freq, interval, count, until, byday)
+
+
+def _add_months(day, months):
+    """Same day of month `months` later, or None when that month is too short"""
+    month_index = day.year * 12 + day.month - 1 + months
+    try:
+        return day.replace(year=month_index // 12, month=month_index % 12 + 1)
+    except ValueError:
+        return None
+
+
+def _first_period(rule, dtstart, start):
+    """Index of the last period starting on or before `start` (0 if start <= dtstart)"""
+    if start <= dtstart:
+        return 0
+    if rule.freq == "DAILY":
+        elapsed = (start - dtstart).days
+    elif rule.freq == "WEEKLY":
+        elapsed = ((start - timedelta(days=start.weekday())) - (dtstart - timedelta(days=dtstart.weekday()))).days // 7
+    elif rule.freq == "MONTHLY":
+        elapsed = (start.year - dtstart.year) * 12 + start.month - dtstart.month
+    else:
+        elapsed = start.year - dtstart.year
+    return elapsed // rule.interval
+
+
+def _walk(rule, dtstart, first, end):
+    """Candidate dates in order, period by period, until periods start after `end`"""
+    week_start = dtstart - timedelta(days=dtstart.weekday())
+    for k in periods(first):
+        step = k * rule.interval
+        if rule.freq == "DAILY":
+            period_start = dtstart + timedelta(days=step)
+            candidates = [period_start]
+        elif rule.freq == "WEEKLY":
+            period_start = week_start + timedelta(weeks=step)
+            days = rule.byday or (dtstart.weekday(),)
+            candidates = [period_start + timedelta(days=d) for d in days]
+            if step == 0 and dtstart.weekday() not in days:
+                # DTSTART is always the first instance, even off the BYDAY days
+                candidates = sorted(candidates + [dtstart])
+        else:
+            months = step if rule.freq == "MONTHLY" else step * 12
+            period_start = _add_months(dtstart.replace(day=1), months)
+            candidates = [_add_months(dtstart, months)]
+
+        if period_start is None or period_start > end:
+            return
+        for day in candidates:
+            if day is not None and day >= dtstart:
+                yield day
+
+
+def occurrences(text, dtstart, start, end):
+    """Occurrence dates of the series within [start, end], in order"""
+    rule = parse_rule(text)
+    first = 0 if rule.count else _first_period(rule, dtstart, start)
+    seen = 0
+    for day in _walk(rule, dtstart, first, end):
+        if day > end or (rule.until and day > rule.until):
+            return
+        seen += 1
+        if rule.count and seen > rule.count:
+            return
+        if day >= start:
+            yield day
+
+
+def series_end(text, dtstart):
+    """Last date the series can occur on (FOREVER when unbounded); ValueError if UNTIL is before dtstart"""
+    rule = parse_rule(text)
+    if rule.until:
+        if rule.until < dtstart:
+            raise ValueError(f"UNTIL ({rule.until}) is before the event date ({dtstart})")
+        return rule.until
+    if rule.count:
+        last = dtstart
+        for last in occurrences(text, dtstart, dtstart, FOREVER):
+            pass
+        return last
+    return FOREVER
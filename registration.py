@@ -3,12 +3,12 @@ from flask_sqlalchemy import SQLAlchemy
 from flask_bcrypt import Bcrypt
 from flask_cors import CORS
 from datetime import datetime   
+from database import configure_app
 
 register = Flask(__name__)
 CORS(register)
 
-register.config["SQLALCHEMY_DATABASE_URI"] = "sqlite:///database.db"
-register.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
+configure_app(register)
 
 db = SQLAlchemy(register)
 bcrypt = Bcrypt(register)
@@ -1,20 +1,93 @@
-from flask import Flask, request, jsonify
+from flask import Flask, request, jsonify, Response, g, abort, make_response
 from flask_sqlalchemy import SQLAlchemy
 from flask_bcrypt import Bcrypt
 from flask_cors import CORS
-from datetime import datetime
+from datetime import date, datetime, timedelta
+from itsdangerous import URLSafeTimedSerializer, BadSignature
+import hmac
+import io
+import json
+import os
+import queue
+import secrets
+import threading
+import time
+
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.exc import IntegrityError
+
+import bulk_import
+import database
+import export
+import hashing
+import job_search
+import message_archive
+import message_service
+import recommendations
+import recurrence
+import search_index
+import write_behind
+from cache import LRUCache, ResponseCache
+from listing import Listing, Field, BadListingRequest
+from skill_index import skill_index, DISCOVER_LIMIT
+from database import configure_app
+from message_broker import broker
 
 # Initialize app and Extensions
 app = Flask(__name__)
-CORS(app)
+CORS(app, expose_headers=["X-Next-Cursor", "Link"])
+
+# Database configuration (shared pragma profile, see database.py)
+configure_app(app)
 
-# Database configuration
-app.config["SQLALCHEMY_DATABASE_URI"] = "sqlite:///database.db"
-app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
+def load_secret_key():
+    """
+    SECRET_KEY from the environment, else a key generated once into
+    instance/secret_key - so tokens survive restarts and every worker on
+    this machine signs with the same key
+    """
+    key = os.environ.get("SECRET_KEY")
+    if key:
+        return key
+    path = os.path.join(app.instance_path, "secret_key")
+    if not os.path.exists(path):
+        os.makedirs(app.instance_path, exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}"
+        with open(tmp_path, "w") as f:
+            f.write(secrets.token_hex(32))
+        os.chmod(tmp_path, 0o600)
+        try:
+            # Atomic: when workers race, the first link wins and the rest read it
+            os.link(tmp_path, path)
+        except FileExistsError:
+            pass
+        finally:
+            os.remove(tmp_path)
+    with open(path) as f:
+        return f.read().strip()
+
+# Signs session tokens
+app.config["SECRET_KEY"] = load_secret_key()
+
+# Keep Flask-Bcrypt (test setup scripts) at the same cost as the hashing pool
+app.config["BCRYPT_LOG_ROUNDS"] = hashing.BCRYPT_ROUNDS
 
 db = SQLAlchemy(app)
 bcrypt = Bcrypt(app)
 
+# Whole-response cache for the read-heavy listings; the write routes
+# invalidate the tags they touch ("users", "events", "jobs"). Stored in a
+# file by default so every gunicorn worker sees the same invalidations.
+response_cache = ResponseCache.from_env(
+    default_path=os.path.join(os.path.dirname(database.DATABASE_PATH), "response_cache.db")
+)
+
+def busy_response():
+    """503 for when the password hashing pool is saturated"""
+    return jsonify({"message": "Server busy, please try again shortly"}), 503, {
+        "Retry-After": str(hashing.RETRY_AFTER_SECONDS)
+    }
+
 # --- MODELS ---
 
 class User(db.Model):
@@ -32,12 +105,19 @@ class User(db.Model):
     events = db.relationship("Event", backref="creator", lazy=True)
     jobs = db.relationship("Job", backref="poster", lazy=True)
     skills = db.relationship("Skill", backref="owner", lazy=True, cascade="all, delete-orphan")
+    profile = db.relationship("Profile", uselist=False, lazy=True, cascade="all, delete-orphan")
+
+class Profile(db.Model):
+    """Profile fields stored once per user (college used to be copied into every skill row)"""
+    __tablename__ = "profiles"
+    user_id = db.Column(db.Integer, db.ForeignKey("users.id"), primary_key=True)
+    college = db.Column(db.String(200))
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
 class Skill(db.Model):
     __tablename__ = "skills"
     id = db.Column(db.Integer, primary_key=True)
-    user_id = db.Column(db.Integer, db.ForeignKey("users.id"), nullable=False)
-    college = db.Column(db.String(200))
+    user_id = db.Column(db.Integer, db.ForeignKey("users.id"), nullable=False, index=True)
     department = db.Column(db.String(100))
     batch_year = db.Column(db.Integer)
     skill_name = db.Column(db.String(100), nullable=False)
@@ -49,12 +129,36 @@ class Event(db.Model):
     title = db.Column(db.String(200), nullable=False)
     mode = db.Column(db.String(20), nullable=False)
     location = db.Column(db.String(300), nullable=False)
-    event_date = db.Column(db.Date, nullable=False)
+    event_date = db.Column(db.Date, nullable=False, index=True)
     start_time = db.Column(db.Time, nullable=False)
     end_time = db.Column(db.Time, nullable=False)
     capacity = db.Column(db.Integer, nullable=False)
     description = db.Column(db.Text, nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    # Recurring events (see recurrence.py): the RRULE and the last date it can
+    # occur on; both NULL for one-off events
+    recurrence = db.Column(db.String(200))
+    series_end = db.Column(db.Date, index=True)
+
+class EventRSVP(db.Model):
+    __tablename__ = "event_rsvps"
+    id = db.Column(db.Integer, primary_key=True)
+    event_id = db.Column(db.Integer, db.ForeignKey("events.id"), nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey("users.id"), nullable=False)
+    status = db.Column(db.String(20), nullable=False)   # "confirmed" or "waitlisted"
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        db.UniqueConstraint("event_id", "user_id", name="uq_event_rsvps_event_user"),
+        # Waitlist promotion takes the oldest waitlisted id per event
+        db.Index("ix_event_rsvps_event_status", "event_id", "status", "id"),
+    )
+
+class EventSeats(db.Model):
+    """Confirmed seats per event: the counter a reservation conditionally increments"""
+    __tablename__ = "event_seats"
+    event_id = db.Column(db.Integer, db.ForeignKey("events.id"), primary_key=True)
+    taken = db.Column(db.Integer, nullable=False, default=0)
 
 class Job(db.Model):
     __tablename__ = "jobs"
@@ -64,16 +168,358 @@ class Job(db.Model):
     location = db.Column(db.String(200), nullable=False)
     paid_status = db.Column(db.String(50), nullable=False)
     duration = db.Column(db.String(100), nullable=False)
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
     posted_by = db.Column(db.Integer, db.ForeignKey("users.id"), nullable=True)
 
 class Message(db.Model):
-    __tablename__ = "messages"
-    id = db.Column(db.Integer, primary_key=True)
-    sender_id = db.Column(db.Integer, db.ForeignKey("users.id"), nullable=False)
-    receiver_id = db.Column(db.Integer, db.ForeignKey("users.id"), nullable=False)
-    content = db.Column(db.Text, nullable=False)
-    timestamp = db.Column(db.DateTime, default=datetime.utcnow)
+    # Shared with chat.py and alapp.py: schema and indexes live in message_service.py
+    __table__ = message_service.messages_table(db.metadata)
+
+    @staticmethod
+    def pair_filter(u1, u2):
+        """Filter for one conversation that matches ix_messages_pair"""
+        low, high = min(u1, u2), max(u1, u2)
+        return (db.func.min(Message.sender_id, Message.receiver_id) == low) & \
+               (db.func.max(Message.sender_id, Message.receiver_id) == high)
+
+class Conversation(db.Model):
+    """
+    Per-user summary of one chat, maintained by message_service.send_many()
+    in the same transaction as the message - whichever app sends it. The
+    sidebar reads only this table, and the read marker
+    (last_read_message_id / unread_count) lives here.
+    """
+    __table__ = message_service.conversations_table(db.metadata)
+
+def rebuild_conversations():
+    """Recompute every Conversation row from messages, archived ones included (treats history as read)"""
+    db.session.execute(db.delete(Conversation))
+    db.session.execute(db.text(f"""
+        WITH all_messages AS {message_archive.all_messages_sql()}
+        INSERT INTO conversations (user_id, partner_id, last_message_id, last_sender_id,
+                                   last_snippet, last_message_at, last_read_message_id, unread_count)
+        SELECT c.user_id, c.partner_id, m.id, m.sender_id, substr(m.content, 1, :snippet),
+               m.timestamp, m.id, 0
+        FROM (
+            SELECT user_id, partner_id, MAX(id) AS last_id FROM (
+                SELECT sender_id AS user_id, receiver_id AS partner_id, id FROM all_messages
+                UNION ALL
+                SELECT receiver_id AS user_id, sender_id AS partner_id, id FROM all_messages
+            )
+            WHERE user_id != partner_id
+            GROUP BY user_id, partner_id
+        ) AS c
+        JOIN all_messages m ON m.id = c.last_id
+    """), {"snippet": message_service.SNIPPET_LENGTH})
+    db.session.commit()
+
+class UserSession(db.Model):
+    __tablename__ = "sessions"
+    id = db.Column(db.String(64), primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey("users.id"), nullable=False, index=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    expires_at = db.Column(db.DateTime, nullable=False)
+    revoked_at = db.Column(db.DateTime)
+
+class StatCounter(db.Model):
+    """Row counts for /dashboard-stats, kept current by the write routes"""
+    __tablename__ = "stats_counters"
+    name = db.Column(db.String(50), primary_key=True)
+    value = db.Column(db.Integer, nullable=False, default=0)
+
+class MentorRecommendation(db.Model):
+    """Precomputed top alumni per student, see recommendations.py"""
+    __tablename__ = "mentor_recommendations"
+    student_id = db.Column(db.Integer, db.ForeignKey("users.id"), primary_key=True)
+    rank = db.Column(db.Integer, primary_key=True)
+    alumni_id = db.Column(db.Integer, db.ForeignKey("users.id"), nullable=False)
+    score = db.Column(db.Float, nullable=False)
+    shared_skills = db.Column(db.String(500), default="")
+
+class MentorRecommendationState(db.Model):
+    """Students whose recommendations are computed (an empty list too)"""
+    __tablename__ = "mentor_recommendation_state"
+    student_id = db.Column(db.Integer, db.ForeignKey("users.id"), primary_key=True)
+    computed_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+# --- SESSIONS ---
+
+SESSION_TTL_SECONDS = int(os.environ.get("SESSION_TTL", 7 * 24 * 3600))
+# With AUTH_REQUIRED=1 user-scoped routes reject requests without a session token
+AUTH_REQUIRED = os.environ.get("AUTH_REQUIRED", "0") == "1"
+
+session_serializer = URLSafeTimedSerializer(app.config["SECRET_KEY"], salt="alumni-session")
+
+# Resolved sessions and user rows, so authenticated requests skip the database.
+# A revocation or profile change in another worker is seen once the TTL expires.
+session_cache = LRUCache(max_size=10000, ttl=60)   # session id -> (user_id, expires_at)
+user_cache = LRUCache(max_size=10000, ttl=60)      # user id -> serialize_user(user)
+# user id -> /get-profile body; dropped by update_profile in this process,
+# other workers catch up within the TTL
+profile_cache = LRUCache(max_size=10000, ttl=int(os.environ.get("PROFILE_CACHE_TTL", 300)))
+PROFILES_BATCH_MAX = 100
+
+def serialize_user(user):
+    return {
+        "id": user.id,
+        "username": user.username,
+        "role": user.role,
+        "department": user.department,
+        "batch_year": user.batch_year
+    }
+
+def create_session(user):
+    """Store a new session for user and return its signed token"""
+    sid = secrets.token_urlsafe(32)
+    expires_at = datetime.utcnow() + timedelta(seconds=SESSION_TTL_SECONDS)
+    db.session.add(UserSession(id=sid, user_id=user.id, expires_at=expires_at))
+    db.session.commit()
+
+    session_cache.set(sid, (user.id, expires_at))
+    user_cache.set(user.id, serialize_user(user))
+    return session_serializer.dumps(sid)
+
+def resolve_session(token):
+    """(session id, user dict) for a valid token, otherwise None"""
+    try:
+        sid = session_serializer.loads(token, max_age=SESSION_TTL_SECONDS)
+    except BadSignature:
+        return None
+
+    entry = session_cache.get(sid)
+    if entry is None:
+        row = db.session.query(UserSession, User).join(User, User.id == UserSession.user_id).filter(
+            UserSession.id == sid,
+            UserSession.revoked_at.is_(None)
+        ).first()
+        if row is None:
+            return None
+        session_row, user = row
+        entry = (user.id, session_row.expires_at)
+        session_cache.set(sid, entry)
+        user_cache.set(user.id, serialize_user(user))
+
+    user_id, expires_at = entry
+    if expires_at <= datetime.utcnow():
+        session_cache.pop(sid)
+        return None
+
+    user_data = user_cache.get(user_id)
+    if user_data is None:
+        user = User.query.get(user_id)
+        if user is None:
+            return None
+        user_data = serialize_user(user)
+        user_cache.set(user_id, user_data)
+    return sid, user_data
+
+def revoke_session(sid):
+    UserSession.query.filter_by(id=sid).update({"revoked_at": datetime.utcnow()})
+    db.session.commit()
+    session_cache.pop(sid)
+
+def after_commit(description, hook, *args):
+    """
+    Run a cache/index hook for a write that is already committed. A
+    failure is logged, not raised: the client's answer has to match the
+    database, or a retried signup would find its own account.
+    """
+    try:
+        hook(*args)
+    except Exception as e:
+        db.session.rollback()
+        print(f"⚠️  {description} failed after commit: {str(e)}")
+
+def invalidate_user(user_id):
+    """Drop everything derived from a user after signup or a profile change"""
+    user_cache.pop(user_id)
+    profile_cache.pop(user_id)
+    skill_index.refresh_user(db.session, user_id)
+    recommendations.forget(db.session, user_id)
+    db.session.commit()
+
+@app.before_request
+def load_session_user():
+    """Resolve the Bearer token (or ?token= for EventSource) into g.user"""
+    g.user = None
+    g.session_id = None
+
+    token = None
+    auth_header = request.headers.get("Authorization", "")
+    if auth_header.startswith("Bearer "):
+        token = auth_header[len("Bearer "):].strip()
+    elif request.args.get("token"):
+        token = request.args.get("token")
+    if not token:
+        return None
+
+    resolved = resolve_session(token)
+    if resolved is None:
+        if not AUTH_REQUIRED:
+            # A stale token (expired, revoked, or signed with an old key)
+            # must not lock an anonymous-capable browser out of every route
+            return None
+        return jsonify({"message": "Invalid or expired session"}), 401
+    g.session_id, g.user = resolved
+    return None
+
+# --- STATS COUNTERS ---
+
+STATS_RECONCILE_INTERVAL = int(os.environ.get("STATS_RECONCILE_INTERVAL", 3600))
+
+def bump_counter(name, delta=1):
+    """Adjust a counter inside the caller's transaction (commit with the row it counts)"""
+    stmt = sqlite_insert(StatCounter).values(name=name, value=delta)
+    db.session.execute(stmt.on_conflict_do_update(
+        index_elements=["name"],
+        set_={"value": StatCounter.value + delta}
+    ))
+
+def count_new_user(role):
+    bump_counter("users")
+    bump_counter(f"users:{role}")
+
+def count_job_facets(job, delta=1):
+    """Job board facet counters (location, paid_status, duration) for one job dict"""
+    for facet in job_search.FACETS:
+        bump_counter(job_search.facet_counter(facet, job.get(facet)), delta)
+
+def job_facets():
+    """{facet: {value: count}} straight from the counters (no scan of jobs)"""
+    facets = {facet: {} for facet in job_search.FACETS}
+    rows = StatCounter.query.filter(StatCounter.name >= "jobs:", StatCounter.name < "jobs;")
+    for counter in rows:
+        _, facet, value = counter.name.split(":", 2)
+        if facet in facets and counter.value > 0:
+            facets[facet][value] = counter.value
+    return facets
+
+def actual_counts():
+    """The real values of every counter, one aggregate pass per table"""
+    counts = {
+        "users": User.query.count(),
+        "events": Event.query.count(),
+        "jobs": Job.query.count(),
+    }
+    for role, n in db.session.query(User.role, db.func.count()).group_by(User.role):
+        counts[f"users:{role}"] = n
+    for facet in job_search.FACETS:
+        column = getattr(Job, facet)
+        for value, n in db.session.query(db.func.trim(column), db.func.count()).group_by(db.func.trim(column)):
+            counts[job_search.facet_counter(facet, value)] = n
+    return counts
+
+def reconcile_counters():
+    """Rewrite any counter that drifted from the real counts; returns {name: (was, now)}"""
+    # Take the write lock before reading: the counts and the stored values
+    # come from one snapshot, and no signup can commit in between
+    db.session.execute(db.text("BEGIN IMMEDIATE"))
+    actual = actual_counts()
+    stored = {c.name: c.value for c in StatCounter.query.all()}
+
+    drift = {}
+    for name in set(actual) | set(stored):
+        real = actual.get(name, 0)
+        if stored.get(name) != real:
+            drift[name] = (stored.get(name), real)
+            db.session.merge(StatCounter(name=name, value=real))
+    db.session.commit()
+
+    if drift:
+        response_cache.invalidate("users", "events", "jobs")
+        print(f"📊 Stats counters corrected: {drift}")
+    return drift
+
+def _reconcile_forever():
+    while True:
+        time.sleep(STATS_RECONCILE_INTERVAL)
+        with app.app_context():
+            try:
+                reconcile_counters()
+            except Exception as e:
+                db.session.rollback()
+                print(f"❌ Stats reconciliation error: {str(e)}")
+
+# --- MENTOR RECOMMENDATIONS ---
+
+RECOMMEND_INTERVAL = int(os.environ.get("RECOMMEND_INTERVAL", 5))
+
+def _recommend_forever():
+    # Keeps the skill index fresh and scores new or changed students, so
+    # /recommend-mentors and /discover never rebuild inside a request
+    while True:
+        time.sleep(RECOMMEND_INTERVAL)
+        with app.app_context():
+            try:
+                # Well before max_age, so requests never find it stale
+                skill_index.ensure_fresh(db.session, skill_index.max_age / 2)
+                while recommendations.compute_pending(db.session, skill_index):
+                    pass
+            except Exception as e:
+                db.session.rollback()
+                print(f"❌ Recommendation refresh error: {str(e)}")
+            finally:
+                db.session.remove()
+
+# --- MESSAGE ARCHIVE ---
+
+MESSAGE_ARCHIVE_INTERVAL = int(os.environ.get("MESSAGE_ARCHIVE_INTERVAL", 86400))
+
+def archive_cold_messages(after_days=message_archive.ARCHIVE_AFTER_DAYS, max_pairs=None):
+    """Move conversations idle for after_days to the archive file; returns (pairs, messages)"""
+    pairs, moved = message_archive.archive_cold(db.session, after_days, max_pairs=max_pairs)
+    if moved:
+        print(f"🗄️  Archived {moved} messages from {pairs} idle conversations")
+    return pairs, moved
+
+def _archive_forever():
+    while True:
+        time.sleep(MESSAGE_ARCHIVE_INTERVAL)
+        with app.app_context():
+            try:
+                archive_cold_messages()
+            except Exception as e:
+                db.session.rollback()
+                print(f"❌ Message archive error: {str(e)}")
+
+_background_lock = threading.Lock()
+_background_pid = None
+
+@app.before_request
+def start_background_jobs():
+    """Launch the periodic reconciliation, archive, message tail and recommendation threads once per worker process"""
+    global _background_pid
+    if _background_pid == os.getpid():
+        return
+    with _background_lock:
+        if _background_pid != os.getpid():
+            _background_pid = os.getpid()
+            if STATS_RECONCILE_INTERVAL > 0:
+                threading.Thread(target=_reconcile_forever, daemon=True).start()
+            if MESSAGE_ARCHIVE_INTERVAL > 0 and message_archive.archiving():
+                threading.Thread(target=_archive_forever, daemon=True).start()
+            if STREAM_POLL_MS > 0:
+                threading.Thread(target=_tail_messages_forever, daemon=True).start()
+            if RECOMMEND_INTERVAL > 0:
+                threading.Thread(target=_recommend_forever, daemon=True).start()
+
+def acting_user_id(claimed_id=None):
+    """
+    The user making this request. With a session the client-supplied id
+    must match it; without one the claimed id is only accepted while
+    AUTH_REQUIRED is off.
+    """
+    if g.user is not None:
+        try:
+            mismatch = claimed_id is not None and int(claimed_id) != g.user["id"]
+        except (TypeError, ValueError):
+            mismatch = True
+        if mismatch:
+            abort(make_response(jsonify({"message": "Not allowed for this session"}), 403))
+        return g.user["id"]
+    if AUTH_REQUIRED:
+        abort(make_response(jsonify({"message": "Login required"}), 401))
+    return claimed_id
 
 # --- ROUTES ---
 
@@ -111,8 +557,8 @@ def signup():
         if User.query.filter_by(username=username).first():
             return jsonify({"message": "Username already taken"}), 400
 
-        # Hash password
-        hashed_password = bcrypt.generate_password_hash(password).decode('utf-8')
+        # Hash password (in the hashing pool, off the request thread)
+        hashed_password = hashing.hash_password(password)
         
         # Create new user
         new_user = User(
@@ -125,11 +571,17 @@ def signup():
         )
 
         db.session.add(new_user)
+        count_new_user(role)
         db.session.commit()
+        after_commit("Listing cache invalidation", response_cache.invalidate, "users")
+        after_commit("User cache/index refresh", invalidate_user, new_user.id)
         
         print(f"✅ New user created: {username} ({role})")
         return jsonify({"message": "Signup Successful"}), 201
         
+    except hashing.HashingBusy:
+        db.session.rollback()
+        return busy_response()
     except Exception as e:
         db.session.rollback()
         print(f"❌ Signup error: {str(e)}")
@@ -154,82 +606,200 @@ def login():
             return jsonify({"message": "Invalid credentials"}), 401
         
         # Check password
-        if not bcrypt.check_password_hash(user.password_hash, password):
+        if not hashing.check_password(user.password_hash, password):
             print(f"⚠️  Login failed: Wrong password for '{username}'")
             return jsonify({"message": "Invalid credentials"}), 401
         
+        # Upgrade legacy SHA-256 hashes and hashes made at an old cost factor
+        if hashing.needs_rehash(user.password_hash):
+            try:
+                user.password_hash = hashing.hash_password(password)
+                db.session.commit()
+                print(f"🔐 Password hash upgraded for '{username}'")
+            except hashing.HashingBusy:
+                pass  # try again on a later login
+            except Exception as e:
+                db.session.rollback()
+                print(f"⚠️  Rehash failed for '{username}': {str(e)}")
+        
         # Success
+        token = create_session(user)
         print(f"✅ Login successful: {username} ({user.role})")
         
         return jsonify({
             "message": "Login successful",
-            "user": {
-                "id": user.id,
-                "username": user.username,
-                "role": user.role,
-                "department": user.department,
-                "batch_year": user.batch_year
-            }
+            "token": token,
+            "expires_in": SESSION_TTL_SECONDS,
+            "user": serialize_user(user)
         }), 200
         
+    except hashing.HashingBusy:
+        return busy_response()
     except Exception as e:
         print(f"❌ Login error: {str(e)}")
         return jsonify({"message": f"Server error: {str(e)}"}), 500
 
+@app.route("/logout", methods=["POST"])
+def logout():
+    try:
+        if g.session_id:
+            revoke_session(g.session_id)
+        return jsonify({"message": "Logged out"}), 200
+    except Exception as e:
+        db.session.rollback()
+        print(f"❌ Logout error: {str(e)}")
+        return jsonify({"message": str(e)}), 500
+
+def profile_query(user_ids):
+    """User, college and skills of every user in one joined query, one row per skill"""
+    return db.select(
+        User.id, User.username, User.role, User.department, User.batch_year,
+        Profile.college, Skill.skill_name
+    ).outerjoin(Profile, Profile.user_id == User.id) \
+     .outerjoin(Skill, db.and_(Skill.user_id == User.id, Skill.skill_name != "")) \
+     .where(User.id.in_(user_ids)) \
+     .order_by(User.id, Skill.id)
+
+def load_profiles(user_ids):
+    """{user_id: profile} for the given users, one query for the uncached ones; unknown ids are left out"""
+    profiles = {}
+    missing = []
+    for user_id in user_ids:
+        cached = profile_cache.get(user_id)
+        if cached is None:
+            missing.append(user_id)
+        else:
+            profiles[user_id] = cached
+    if missing:
+        loaded = {}
+        for user_id, username, role, department, batch_year, college, skill in db.session.execute(profile_query(missing)):
+            profile = loaded.setdefault(user_id, {
+                "username": username,
+                "role": role,
+                "department": department,
+                "batch_year": batch_year,
+                "college": college or "Not Set",
+                "skills": []
+            })
+            if skill:
+                profile["skills"].append(skill)
+        for user_id, profile in loaded.items():
+            profile_cache.set(user_id, profile)
+        profiles.update(loaded)
+    return profiles
+
 @app.route("/get-profile/<int:user_id>", methods=["GET"])
 def get_profile(user_id):
     try:
-        user = User.query.get(user_id)
-        if not user:
+        profile = load_profiles([user_id]).get(user_id)
+        if profile is None:
             return jsonify({"message": "User not found"}), 404
+        return jsonify(profile), 200
         
-        # Get college from Skills table
-        first_entry = Skill.query.filter_by(user_id=user_id).first()
-        college_name = first_entry.college if (first_entry and first_entry.college) else "Not Set"
-        
-        # Get all skills
-        skills = [s.skill_name for s in user.skills if s.skill_name]
-        
+    except Exception as e:
+        print(f"❌ Get profile error: {str(e)}")
+        return jsonify({"message": str(e)}), 500
+
+@app.route("/get-profiles", methods=["GET"])
+def get_profiles():
+    """
+    Many profiles in one call, e.g. /get-profiles?ids=4,8,15 (at most
+    PROFILES_BATCH_MAX). Profiles come back in the order asked for; ids
+    that do not exist are listed under "missing".
+    """
+    try:
+        try:
+            ids = list(dict.fromkeys(int(i) for i in request.args.get("ids", "").split(",") if i.strip()))
+        except ValueError:
+            return jsonify({"message": "ids must be a comma separated list of user ids"}), 400
+        if not ids:
+            return jsonify({"message": "ids is required"}), 400
+        if len(ids) > PROFILES_BATCH_MAX:
+            return jsonify({"message": f"At most {PROFILES_BATCH_MAX} ids per request"}), 400
+
+        profiles = load_profiles(ids)
         return jsonify({
-            "username": user.username,
-            "role": user.role,
-            "department": user.department,
-            "batch_year": user.batch_year,
-            "college": college_name,
-            "skills": skills
+            "profiles": [{"id": i, **profiles[i]} for i in ids if i in profiles],
+            "missing": [i for i in ids if i not in profiles]
         }), 200
-        
+
     except Exception as e:
-        print(f"❌ Get profile error: {str(e)}")
+        print(f"❌ Get profiles error: {str(e)}")
         return jsonify({"message": str(e)}), 500
 
+def set_college(user_id, college):
+    """Store college on the user's profile row; True if it changed"""
+    college = (college or "").strip()
+    college = None if college in ("", "Not Set") else college[:200]
+    profile = db.session.get(Profile, user_id)
+    if profile is None:
+        if college is None:
+            return False
+        db.session.add(Profile(user_id=user_id, college=college))
+        return True
+    if profile.college == college:
+        return False
+    profile.college = college
+    return True
+
+def set_skills(user, names):
+    """
+    Bring the user's skill rows in line with names, writing only the
+    difference: one DELETE for removed skills, one INSERT for new ones.
+    Returns (added, removed) counts.
+    """
+    wanted = list(dict.fromkeys(str(name).strip()[:100] for name in names if str(name or "").strip()))
+    kept = set()
+    stale = []
+    for skill_id, name in db.session.execute(
+        db.select(Skill.id, Skill.skill_name).where(Skill.user_id == user.id).order_by(Skill.id)
+    ):
+        if name in wanted and name not in kept:
+            kept.add(name)
+        else:
+            stale.append(skill_id)   # removed, a duplicate or an old empty placeholder
+
+    added = [name for name in wanted if name not in kept]
+    if stale:
+        db.session.execute(db.delete(Skill).where(Skill.id.in_(stale)))
+    if added:
+        db.session.execute(db.insert(Skill), [{
+            "user_id": user.id,
+            "department": user.department,
+            "batch_year": user.batch_year,
+            "skill_name": name
+        } for name in added])
+    return len(added), len(stale)
+
 @app.route("/update-profile/<int:user_id>", methods=["PUT"])
 def update_profile(user_id):
+    """Writes only what changed; fields missing from the body are left alone"""
+    user_id = acting_user_id(user_id)
     try:
-        data = request.get_json()
-        
-        # Clear existing skills
-        Skill.query.filter_by(user_id=user_id).delete()
-        
-        new_skills = data.get("skills", [])
-        college = data.get("college", "Not Set")
-        
-        # Add skills back
-        if not new_skills:
-            # Even with no skills, store college info
-            db.session.add(Skill(user_id=user_id, college=college, skill_name=""))
-        else:
-            for skill_name in new_skills:
-                if skill_name.strip():
-                    db.session.add(Skill(
-                        user_id=user_id,
-                        college=college,
-                        skill_name=skill_name.strip()
-                    ))
-        
+        data = request.get_json() or {}
+        user = db.session.get(User, user_id)
+        if not user:
+            return jsonify({"message": "User not found"}), 404
+
+        if "skills" in data and not isinstance(data["skills"], list):
+            return jsonify({"message": "skills must be a list"}), 400
+
+        college_changed = "college" in data and set_college(user_id, data["college"])
+        added, removed = set_skills(user, data["skills"]) if "skills" in data else (0, 0)
+
         db.session.commit()
-        print(f"✅ Profile updated for user {user_id}")
-        return jsonify({"message": "Profile updated successfully"}), 200
+        if added or removed:
+            after_commit("User cache/index refresh", invalidate_user, user_id)
+        elif college_changed:
+            profile_cache.pop(user_id)
+        print(f"✅ Profile updated for user {user_id} (+{added} -{removed} skills"
+              f"{', college' if college_changed else ''})")
+        return jsonify({
+            "message": "Profile updated successfully",
+            "skills_added": added,
+            "skills_removed": removed,
+            "college_changed": bool(college_changed)
+        }), 200
         
     except Exception as e:
         db.session.rollback()
@@ -237,13 +807,20 @@ def update_profile(user_id):
         return jsonify({"message": str(e)}), 500
 
 @app.route("/dashboard-stats", methods=["GET"])
+@response_cache.cached("users", "events", "jobs")
 def get_dashboard_stats():
     try:
-        total_connections = User.query.count()
-        total_events = Event.query.count()
-        total_jobs = Job.query.count()
-        alumni_count = User.query.filter_by(role='alumni').count()
-        student_count = User.query.filter_by(role='student').count()
+        counters = {c.name: c.value for c in StatCounter.query.all()}
+        if "users" not in counters:
+            # First load on a database that predates the counters
+            reconcile_counters()
+            counters = {c.name: c.value for c in StatCounter.query.all()}
+
+        total_connections = counters.get("users", 0)
+        total_events = counters.get("events", 0)
+        total_jobs = counters.get("jobs", 0)
+        alumni_count = counters.get("users:alumni", 0)
+        student_count = counters.get("users:student", 0)
         others_count = total_connections - (alumni_count + student_count)
 
         return jsonify({
@@ -263,49 +840,129 @@ def get_dashboard_stats():
 
 # --- CALENDAR & EVENT ROUTES ---
 
+CALENDAR_MAX_DAYS = 366
+
+def _date_param(value):
+    return datetime.strptime(value, '%Y-%m-%d').date()
+
+def calendar_window():
+    """(start, end) from ?month=YYYY-MM or ?start=&end=YYYY-MM-DD; the current month by default"""
+    if request.args.get("start") or request.args.get("end"):
+        if not (request.args.get("start") and request.args.get("end")):
+            raise ValueError("Give both start and end (YYYY-MM-DD), or month=YYYY-MM")
+        try:
+            start = _date_param(request.args["start"])
+            end = _date_param(request.args["end"])
+        except ValueError:
+            raise ValueError("start and end must be dates like 2026-01-31")
+    else:
+        month = request.args.get("month") or date.today().strftime('%Y-%m')
+        start = datetime.strptime(month, '%Y-%m').date()
+        end = (start + timedelta(days=32)).replace(day=1) - timedelta(days=1)
+    if end < start or (end - start).days >= CALENDAR_MAX_DAYS:
+        raise ValueError(f"Date range must be 1 to {CALENDAR_MAX_DAYS} days")
+    return start, end
+
+def calendar_cache_key():
+    """
+    Today and the resolved window: the default month and the "upcoming"
+    count both move on with the date, not only with the query string
+    """
+    try:
+        start, end = calendar_window()
+    except ValueError:
+        return "invalid"    # the view answers 400, which is never cached
+    return f"{date.today()}:{start}:{end}"
+
+def events_between(start, end):
+    """[(event, occurrence date)] within [start, end], by date and start time"""
+    found = [(ev, ev.event_date) for ev in Event.query.filter(
+        Event.recurrence.is_(None), Event.event_date.between(start, end)
+    )]
+    # Only series still running in the window are expanded, and only inside it
+    for ev in Event.query.filter(Event.series_end >= start, Event.event_date <= end):
+        found.extend((ev, day) for day in recurrence.occurrences(ev.recurrence, ev.event_date, start, end))
+    found.sort(key=lambda pair: (pair[1], pair[0].start_time, pair[0].id))
+    return found
+
+def upcoming_event_count():
+    """Events (a series counts once) with an occurrence from today on"""
+    today = date.today()
+    return Event.query.filter(db.or_(
+        db.and_(Event.recurrence.is_(None), Event.event_date >= today),
+        Event.series_end >= today
+    )).count()
+
+def set_recurrence(event, rule):
+    """Attach an RRULE to the event, or clear it; ValueError if the rule is invalid"""
+    if rule and rule.strip():
+        event.series_end = recurrence.series_end(rule, event.event_date)
+        event.recurrence = rule.strip()
+    else:
+        event.recurrence = None
+        event.series_end = None
+
 @app.route("/api/calendar-events", methods=["GET"])
+@response_cache.cached("events", vary=calendar_cache_key)
 def get_calendar_events():
-    """Returns events formatted for calendar pins (simple date + title)"""
+    """Calendar pins (date + title) for ?month=YYYY-MM or ?start=&end=, recurring events expanded"""
+    try:
+        start, end = calendar_window()
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
     try:
-        events = Event.query.all()
         calendar_data = [{
-            "id": e.id,
-            "title": e.title,
-            "start": e.event_date.strftime('%Y-%m-%d'),
+            "id": ev.id,
+            "title": ev.title,
+            "start": day.strftime('%Y-%m-%d'),
             "allDay": True
-        } for e in events]
+        } for ev, day in events_between(start, end)]
         
-        print(f"📅 Returning {len(calendar_data)} calendar events")
+        print(f"📅 Returning {len(calendar_data)} calendar events for {start} - {end}")
         return jsonify(calendar_data), 200
     except Exception as e:
         print(f"❌ Calendar events error: {str(e)}")
         return jsonify({"error": str(e)}), 500
 
 @app.route("/api/events", methods=["GET", "POST"])
+@response_cache.cached("events", "rsvps", vary=calendar_cache_key)
 def handle_events():
     """
-    GET: Returns all events with full details for the calendar UI
-    POST: Creates a new event
+    GET: Events with full details for one calendar window (?month=YYYY-MM,
+         default the current month, or ?start=&end=), one entry per occurrence
+    POST: Creates a new event (optional "recurrence": an RRULE, see recurrence.py)
     """
     if request.method == "GET":
         try:
-            events = Event.query.order_by(Event.event_date.asc()).all()
-            
+            start, end = calendar_window()
+        except ValueError as e:
+            return jsonify({"success": False, "error": str(e)}), 400
+        try:
+            occurrences = events_between(start, end)
+            remaining = seats_remaining({e.id for e, _ in occurrences})
             events_list = []
-            for e in events:
+            for e, day in occurrences:
                 events_list.append({
                     "id": e.id,
                     "title": e.title,
                     "category": e.mode or "General",
                     "location": e.location or "TBD",
-                    "date": e.event_date.strftime('%Y-%m-%d'),
+                    "date": day.strftime('%Y-%m-%d'),
                     "time": e.start_time.strftime('%H:%M') if e.start_time else "TBD",
                     "description": e.description or "",
-                    "capacity": e.capacity or 0
+                    "capacity": e.capacity or 0,
+                    "seats_remaining": remaining.get(e.id, e.capacity or 0),
+                    "recurrence": e.recurrence
                 })
             
-            print(f"✅ Returning {len(events_list)} events for calendar")
-            return jsonify({"success": True, "events": events_list}), 200
+            print(f"✅ Returning {len(events_list)} events for calendar ({start} - {end})")
+            return jsonify({
+                "success": True,
+                "events": events_list,
+                "start": start.strftime('%Y-%m-%d'),
+                "end": end.strftime('%Y-%m-%d'),
+                "upcoming": upcoming_event_count()
+            }), 200
             
         except Exception as e:
             print(f"❌ Get events error: {str(e)}")
@@ -337,9 +994,15 @@ def handle_events():
                 capacity=int(data.get('capacity', 50)),
                 description=data.get('description', '')
             )
+            try:
+                set_recurrence(new_event, data.get('recurrence'))
+            except ValueError as e:
+                return jsonify({"success": False, "error": f"Invalid recurrence: {e}"}), 400
             
             db.session.add(new_event)
+            bump_counter("events")
             db.session.commit()
+            after_commit("Listing cache invalidation", response_cache.invalidate, "events")
             
             print(f"✅ Event created: {new_event.title} on {date_obj}")
             return jsonify({"success": True, "message": "Event created successfully"}), 201
@@ -349,25 +1012,37 @@ def handle_events():
             print(f"❌ Create event error: {str(e)}")
             return jsonify({"success": False, "error": str(e)}), 500
 
+EVENTS_LISTING = Listing(
+    sort=[(Event.event_date, False), (Event.id, False)],
+    fields={
+        "id": Field(Event.id),
+        "title": Field(Event.title),
+        "mode": Field(Event.mode),
+        "location": Field(Event.location),
+        "event_date": Field(Event.event_date, render=lambda d: d.strftime('%Y-%m-%d') if hasattr(d, 'strftime') else d),
+        "description": Field(Event.description),
+        "capacity": Field(Event.capacity)
+    },
+    default_fields=["id", "title", "mode", "location", "event_date", "description", "capacity"],
+    filters={
+        "mode": lambda v: Event.mode == v,
+        "date_from": lambda v: Event.event_date >= _date_param(v),
+        "date_to": lambda v: Event.event_date <= _date_param(v)
+    },
+    cursor_types=[date.fromisoformat, int]
+)
+
 @app.route("/get-all-events", methods=["GET"])
+@response_cache.cached("events")
 def get_all_events():
-    """Legacy endpoint - returns events list"""
-    try:
-        events = Event.query.all()
-        
-        event_list = []
-        for ev in events:
-            event_list.append({
-                "id": ev.id,
-                "title": ev.title,
-                "mode": ev.mode,
-                "location": ev.location,
-                "event_date": ev.event_date.strftime('%Y-%m-%d') if hasattr(ev.event_date, 'strftime') else ev.event_date,
-                "description": ev.description,
-                "capacity": ev.capacity
-            })
-        
-        return jsonify(event_list), 200
+    """
+    Events by date, e.g. /get-all-events?mode=Online&date_from=2025-01-01&fields=id,title&limit=20
+    The next page's cursor comes back in the X-Next-Cursor header; pass it as ?after=.
+    """
+    try:
+        return EVENTS_LISTING.respond(db.session)
+    except BadListingRequest as e:
+        return jsonify({"error": str(e)}), 400
     except Exception as e:
         print(f"❌ Get all events error: {str(e)}")
         return jsonify({"error": str(e)}), 500
@@ -386,13 +1061,183 @@ def get_event(event_id):
             "start_time": ev.start_time.strftime("%H:%M") if ev.start_time else "TBD",
             "location": ev.location,
             "capacity": ev.capacity,
-            "mode": ev.mode
+            "seats_remaining": seats_remaining([ev.id]).get(ev.id, ev.capacity),
+            "mode": ev.mode,
+            "recurrence": ev.recurrence
         }), 200
         
     except Exception as e:
         print(f"❌ Get event error: {str(e)}")
         return jsonify({"message": str(e)}), 500
 
+# --- EVENT RSVPS ---
+# A recurring event is one series: an RSVP holds a seat for the whole series.
+
+RSVP_CONFIRMED = "confirmed"
+RSVP_WAITLISTED = "waitlisted"
+
+# event id -> seats left; written through by every RSVP change in this
+# process, other workers catch up within the TTL
+seats_cache = LRUCache(max_size=10000, ttl=int(os.environ.get("SEATS_CACHE_TTL", 30)))
+
+def seats_remaining(event_ids):
+    """{event_id: seats left} for the given events, one query for the uncached ones"""
+    remaining = {}
+    missing = []
+    for event_id in event_ids:
+        cached = seats_cache.get(event_id)
+        if cached is None:
+            missing.append(event_id)
+        else:
+            remaining[event_id] = cached
+    if missing:
+        rows = db.session.query(
+            Event.id, Event.capacity - db.func.coalesce(EventSeats.taken, 0)
+        ).outerjoin(EventSeats, EventSeats.event_id == Event.id).filter(Event.id.in_(missing))
+        for event_id, left in rows:
+            remaining[event_id] = max(left or 0, 0)
+            seats_cache.set(event_id, remaining[event_id])
+    return remaining
+
+def _refresh_seats(event_id):
+    seats_cache.pop(event_id)
+    response_cache.invalidate("rsvps")
+    return seats_remaining([event_id]).get(event_id, 0)
+
+def _ensure_seat_row(event_id):
+    """Counter row for the event, seeded from its confirmed RSVPs the first time"""
+    db.session.execute(db.text("""
+        INSERT INTO event_seats (event_id, taken)
+        SELECT :eid, count(*) FROM event_rsvps WHERE event_id = :eid AND status = 'confirmed'
+        ON CONFLICT (event_id) DO NOTHING
+    """), {"eid": event_id})
+
+def reserve_seat(event_id, user_id):
+    """
+    RSVP user_id: a confirmed seat if one is left, otherwise a waitlist
+    place. The seat is taken by a single conditional UPDATE on the counter
+    row, so concurrent requests can never oversell. Returns (rsvp, created).
+    """
+    _ensure_seat_row(event_id)
+    rsvp = EventRSVP(event_id=event_id, user_id=user_id, status=RSVP_WAITLISTED)
+    db.session.add(rsvp)
+    try:
+        db.session.flush()
+    except IntegrityError:
+        db.session.rollback()   # already registered
+        return EventRSVP.query.filter_by(event_id=event_id, user_id=user_id).first(), False
+
+    took_seat = db.session.execute(db.text("""
+        UPDATE event_seats SET taken = taken + 1
+        WHERE event_id = :eid AND taken < (SELECT capacity FROM events WHERE id = :eid)
+    """), {"eid": event_id}).rowcount
+    if took_seat:
+        rsvp.status = RSVP_CONFIRMED
+    db.session.commit()
+    return rsvp, True
+
+def cancel_rsvp(event_id, user_id):
+    """
+    Drop user_id's RSVP. A freed seat passes straight to the oldest
+    waitlisted RSVP; only when nobody is waiting does the counter go down.
+    Returns (cancelled, promoted user id or None).
+    """
+    _ensure_seat_row(event_id)
+    deleted = db.session.execute(db.text(
+        "DELETE FROM event_rsvps WHERE event_id = :eid AND user_id = :uid RETURNING status"
+    ), {"eid": event_id, "uid": user_id}).first()
+    if deleted is None:
+        db.session.rollback()
+        return False, None
+
+    promoted = None
+    if deleted[0] == RSVP_CONFIRMED:
+        row = db.session.execute(db.text("""
+            UPDATE event_rsvps SET status = 'confirmed'
+            WHERE id = (SELECT id FROM event_rsvps WHERE event_id = :eid AND status = 'waitlisted'
+                        ORDER BY id LIMIT 1)
+            RETURNING user_id
+        """), {"eid": event_id}).first()
+        if row is not None:
+            promoted = row[0]
+        else:
+            db.session.execute(db.text(
+                "UPDATE event_seats SET taken = taken - 1 WHERE event_id = :eid AND taken > 0"
+            ), {"eid": event_id})
+    db.session.commit()
+    return True, promoted
+
+def rsvp_status(rsvp):
+    """{"status", "waitlist_position"} for an RSVP (position is None once confirmed)"""
+    if rsvp is None:
+        return {"status": None, "waitlist_position": None}
+    position = None
+    if rsvp.status == RSVP_WAITLISTED:
+        position = EventRSVP.query.filter(
+            EventRSVP.event_id == rsvp.event_id,
+            EventRSVP.status == RSVP_WAITLISTED,
+            EventRSVP.id <= rsvp.id
+        ).count()
+    return {"status": rsvp.status, "waitlist_position": position}
+
+@app.route("/rsvp-event/<int:event_id>", methods=["POST"])
+def rsvp_event(event_id):
+    """Register for an event: {"user_id": ...} -> confirmed or waitlisted"""
+    data = request.get_json(silent=True) or {}
+    user_id = acting_user_id(data.get('user_id'))
+    if not user_id:
+        return jsonify({"message": "user_id is required"}), 400
+    try:
+        if not db.session.get(Event, event_id):
+            return jsonify({"message": "Event not found"}), 404
+
+        rsvp, created = reserve_seat(event_id, int(user_id))
+        result = rsvp_status(rsvp)
+        result["seats_remaining"] = _refresh_seats(event_id)
+        if created:
+            print(f"🎟️  RSVP: user {user_id} → event {event_id} ({rsvp.status})")
+        return jsonify(result), 201 if created else 200
+    except Exception as e:
+        db.session.rollback()
+        print(f"❌ RSVP error: {str(e)}")
+        return jsonify({"message": str(e)}), 500
+
+@app.route("/cancel-rsvp/<int:event_id>", methods=["POST"])
+def cancel_event_rsvp(event_id):
+    """Withdraw an RSVP: {"user_id": ...}; the next waitlisted user is promoted"""
+    data = request.get_json(silent=True) or {}
+    user_id = acting_user_id(data.get('user_id'))
+    if not user_id:
+        return jsonify({"message": "user_id is required"}), 400
+    try:
+        cancelled, promoted = cancel_rsvp(event_id, int(user_id))
+        if not cancelled:
+            return jsonify({"message": "No RSVP for this event"}), 404
+
+        if promoted:
+            print(f"⬆️  Waitlist: user {promoted} promoted for event {event_id}")
+        return jsonify({
+            "cancelled": True,
+            "promoted_user_id": promoted,
+            "seats_remaining": _refresh_seats(event_id)
+        }), 200
+    except Exception as e:
+        db.session.rollback()
+        print(f"❌ Cancel RSVP error: {str(e)}")
+        return jsonify({"message": str(e)}), 500
+
+@app.route("/rsvp-status/<int:event_id>/<int:user_id>", methods=["GET"])
+def get_rsvp_status(event_id, user_id):
+    user_id = acting_user_id(user_id)
+    try:
+        rsvp = EventRSVP.query.filter_by(event_id=event_id, user_id=user_id).first()
+        result = rsvp_status(rsvp)
+        result["seats_remaining"] = seats_remaining([event_id]).get(event_id)
+        return jsonify(result), 200
+    except Exception as e:
+        print(f"❌ RSVP status error: {str(e)}")
+        return jsonify({"message": str(e)}), 500
+
 @app.route("/add-event", methods=["POST"])
 def add_event():
     try:
@@ -414,9 +1259,15 @@ def add_event():
             capacity=int(data['capacity']),
             description=data['description']
         )
+        try:
+            set_recurrence(new_event, data.get('recurrence'))
+        except ValueError as e:
+            return jsonify({"message": f"Invalid recurrence: {e}"}), 400
 
         db.session.add(new_event)
+        bump_counter("events")
         db.session.commit()
+        after_commit("Listing cache invalidation", response_cache.invalidate, "events")
         
         print(f"✅ Event added: {data['title']}")
         return jsonify({"message": "Event created successfully"}), 201
@@ -436,17 +1287,20 @@ def add_job():
         if not data.get('role') or not data.get('company_name'):
             return jsonify({"message": "Role and Company Name are required"}), 400
 
+        # Facets are stored trimmed so the search filters and the counters agree
+        facets = {facet: job_search.facet_value(data[facet]) for facet in job_search.FACETS}
         new_job = Job(
             role=data['role'],
             company_name=data['company_name'],
-            location=data['location'],
-            paid_status=data['paid_status'],
-            duration=data['duration'],
-            posted_by=data.get('posted_by')
+            posted_by=data.get('posted_by'),
+            **facets
         )
 
         db.session.add(new_job)
+        bump_counter("jobs")
+        count_job_facets(facets)
         db.session.commit()
+        after_commit("Listing cache invalidation", response_cache.invalidate, "jobs")
         print(f"✅ New job posted: {data['role']} at {data['company_name']}")
         return jsonify({"message": "Job posted successfully"}), 201
     except Exception as e:
@@ -454,143 +1308,669 @@ def add_job():
         print(f"❌ Add job error: {str(e)}")
         return jsonify({"message": f"Server error: {str(e)}"}), 500
 
+JOBS_LISTING = Listing(
+    sort=[(Job.created_at, True), (Job.id, True)],
+    fields={
+        "id": Field(Job.id),
+        "role": Field(Job.role),
+        "company": Field(Job.company_name),
+        "location": Field(Job.location),
+        "paid_status": Field(Job.paid_status),
+        "duration": Field(Job.duration),
+        "logo_letter": Field(Job.company_name, render=lambda name: name[0].upper() if name else "J")
+    },
+    default_fields=["id", "role", "company", "location", "paid_status", "duration", "logo_letter"],
+    filters={
+        "location": lambda v: Job.location == v,
+        "paid_status": lambda v: Job.paid_status == v
+    },
+    cursor_types=[datetime.fromisoformat, int]
+)
+
 @app.route("/get-all-jobs", methods=["GET"])
+@response_cache.cached("jobs")
 def get_all_jobs():
+    """Newest jobs first; ?location=, ?paid_status=, ?fields=, ?limit= and ?after= (see X-Next-Cursor)"""
     try:
-        jobs = Job.query.order_by(Job.created_at.desc()).all()
-        output = []
-        
-        for job in jobs:
-            logo_letter = job.company_name[0].upper() if job.company_name else "J"
-            
-            output.append({
-                "id": job.id,
-                "role": job.role,
-                "company": job.company_name,
-                "location": job.location,
-                "paid_status": job.paid_status,
-                "duration": job.duration,
-                "logo_letter": logo_letter
-            })
-        return jsonify(output), 200
-        
+        return JOBS_LISTING.respond(db.session)
+    except BadListingRequest as e:
+        return jsonify({"message": str(e)}), 400
     except Exception as e:
         print(f"❌ Get jobs error: {str(e)}")
         return jsonify({"message": str(e)}), 500
 
+@app.route("/search-jobs", methods=["GET"])
+@response_cache.cached("jobs")
+def search_jobs():
+    """
+    Job board search, e.g. /search-jobs?q=data&location=Remote&paid_status=Paid&page=2
+    Matches role and company (best match first), or newest first without ?q=.
+    Facet counts for location, paid_status and duration come from maintained counters.
+    """
+    try:
+        limit = request.args.get("limit", job_search.JOB_SEARCH_LIMIT, type=int)
+        limit = max(1, min(limit, job_search.JOB_SEARCH_LIMIT_MAX))
+        page = max(1, request.args.get("page", 1, type=int))
+        rows, total = job_search.search(
+            db.session,
+            request.args.get("q", ""),
+            {facet: request.args.get(facet) for facet in job_search.FACETS},
+            limit=limit,
+            offset=(page - 1) * limit
+        )
+        return jsonify({
+            "jobs": [{
+                "id": job_id,
+                "role": role,
+                "company": company,
+                "location": location,
+                "paid_status": paid_status,
+                "duration": duration,
+                "logo_letter": company[0].upper() if company else "J"
+            } for job_id, role, company, location, paid_status, duration in rows],
+            "total": total,
+            "page": page,
+            "has_more": page * limit < total,
+            "facets": job_facets()
+        }), 200
+    except Exception as e:
+        print(f"❌ Job search error: {str(e)}")
+        return jsonify({"message": str(e)}), 500
+
+# --- BULK IMPORT ---
+
+IMPORT_API_KEY = os.environ.get("IMPORT_API_KEY")
+
+def bulk_access_allowed():
+    """Imports and exports need the X-Import-Key header to match IMPORT_API_KEY"""
+    return bool(IMPORT_API_KEY) and hmac.compare_digest(request.headers.get("X-Import-Key", ""), IMPORT_API_KEY)
+
+def count_imported(kind, rows):
+    """Counter updates for one imported batch (committed with it)"""
+    if kind != "users":
+        bump_counter(kind, len(rows))
+        if kind == "jobs":
+            facets = {}
+            for row in rows:
+                for facet in job_search.FACETS:
+                    name = job_search.facet_counter(facet, row[facet])
+                    facets[name] = facets.get(name, 0) + 1
+            for name, n in facets.items():
+                bump_counter(name, n)
+        return
+    bump_counter("users", len(rows))
+    roles = {}
+    for row in rows:
+        roles[row["role"]] = roles.get(row["role"], 0) + 1
+    for role, n in roles.items():
+        bump_counter(f"users:{role}", n)
+
+def make_importer(batch_size=bulk_import.BATCH_SIZE, bcrypt_rounds=bulk_import.IMPORT_BCRYPT_ROUNDS):
+    return bulk_import.Importer(db.session, tables={
+        "users": User.__table__,
+        "skills": Skill.__table__,
+        "events": Event.__table__,
+        "jobs": Job.__table__
+    }, batch_size=batch_size, on_batch=count_imported, bcrypt_rounds=bcrypt_rounds)
+
+def after_import(kind):
+    """Drop caches and indexes built from the imported kind"""
+    response_cache.invalidate(kind)
+    if kind == "users":
+        skill_index.invalidate()   # rebuilt on the next /discover; users_fts is kept by triggers
+
+@app.route("/import/<kind>", methods=["POST"])
+def import_records(kind):
+    """
+    Bulk import of users, events or jobs. POST a CSV file (with a header
+    row) or JSONL, either as the raw body or as a multipart "file" field.
+        ?format=csv|jsonl - defaults from the filename or Content-Type
+        ?dry_run=1        - validate and report only
+    Requires the X-Import-Key header to match IMPORT_API_KEY. Column names
+    are the model's (see bulk_import.py); errors are reported per line.
+    """
+    if not bulk_access_allowed():
+        return jsonify({"message": "Bulk import is not allowed"}), 403
+    if kind not in bulk_import.KINDS:
+        return jsonify({"message": f"Unknown import kind: {kind}"}), 404
+
+    upload = request.files.get("file")
+    if upload is not None:
+        stream, name, mimetype = upload.stream, upload.filename or "", upload.mimetype or ""
+    else:
+        stream, name, mimetype = io.BufferedReader(request.stream), "", request.mimetype or ""
+    fmt = request.args.get("format") or ("csv" if name.endswith(".csv") or "csv" in mimetype else "jsonl")
+    if fmt not in bulk_import.FORMATS:
+        return jsonify({"message": "format must be csv or jsonl"}), 400
+
+    try:
+        report = make_importer().run(
+            kind,
+            bulk_import.read_records(stream, fmt),
+            dry_run=request.args.get("dry_run") in ("1", "true")
+        )
+        if report.inserted and not report.dry_run:
+            after_import(kind)
+        print(f"📥 Import {kind}: {report.inserted} inserted, {report.failed} failed")
+        return jsonify(report.as_dict()), 200
+    except UnicodeDecodeError:
+        db.session.rollback()
+        return jsonify({"message": "The file must be UTF-8 encoded"}), 400
+    except Exception as e:
+        db.session.rollback()
+        print(f"❌ Import error: {str(e)}")
+        return jsonify({"message": str(e)}), 500
+
+# --- EXPORT ---
+
+EXPORT_MAX_CONCURRENT = int(os.environ.get("EXPORT_MAX_CONCURRENT", 2))
+_export_slots = threading.BoundedSemaphore(EXPORT_MAX_CONCURRENT)
+
+def export_tables():
+    return {
+        "users": User.__table__,
+        "skills": Skill.__table__,
+        "messages": Message.__table__,
+        "archived_messages": message_archive.table if message_archive.enabled() else None,
+        "events": Event.__table__,
+        "jobs": Job.__table__
+    }
+
+@app.route("/export/<kind>", methods=["GET"])
+def export_records(kind):
+    """
+    Stream every user, message, event or job as ?format=ndjson (default) or
+    csv, gzip-compressed with ?gzip=1. Same X-Import-Key as /import.
+    At most EXPORT_MAX_CONCURRENT exports run at once so long downloads
+    cannot take every worker; beyond that the answer is 503 + Retry-After.
+    """
+    if not bulk_access_allowed():
+        return jsonify({"message": "Export is not allowed"}), 403
+    if kind not in export.KINDS:
+        return jsonify({"message": f"Unknown export kind: {kind}"}), 404
+    fmt = request.args.get("format", "ndjson")
+    if fmt not in export.FORMATS:
+        return jsonify({"message": "format must be ndjson or csv"}), 400
+    gzip = request.args.get("gzip") in ("1", "true")
+
+    if not _export_slots.acquire(blocking=False):
+        return busy_response()
+
+    # The rows are read on a connection of the export's own, not the request session
+    engine = db.engine
+    stmt = export.build_statement(kind, export_tables())
+
+    released = []
+    def release():
+        if not released:
+            released.append(True)
+            _export_slots.release()
+
+    def generate():
+        try:
+            yield from export.encode(export.iter_chunks(engine, stmt, fmt), gzip=gzip)
+            print(f"📤 Export {kind} ({fmt}) finished")
+        finally:
+            release()
+
+    filename = f"{kind}.{'jsonl' if fmt == 'ndjson' else 'csv'}"
+    headers = {"Content-Disposition": f'attachment; filename="{filename}"', "Cache-Control": "no-store"}
+    if gzip:
+        headers["Content-Encoding"] = "gzip"
+    response = Response(generate(), mimetype=export.FORMATS[fmt], headers=headers)
+    # Also covers a client that goes away before the first chunk
+    response.call_on_close(release)
+    return response
+
 # --- USER ROUTES ---
 
+USERS_LISTING = Listing(
+    # Alumni first, then by id
+    sort=[(db.case((db.func.lower(User.role) == "alumni", 0), else_=1), False), (User.id, False)],
+    fields={
+        "id": Field(User.id),
+        "username": Field(User.username),
+        "email": Field(User.email),
+        "role": Field(User.role, render=lambda role: role.lower() if role else "student"),
+        "department": Field(User.department),
+        "batch_year": Field(User.batch_year)
+    },
+    default_fields=["username", "email", "role"],
+    filters={
+        "role": lambda v: db.func.lower(User.role) == v.lower(),
+        "department": lambda v: User.department == v,
+        "batch_year": lambda v: User.batch_year == int(v)
+    },
+    default_limit=10
+)
+
 @app.route('/get-all-users', methods=['GET'])
 def get_all_users():
+    """Alumni first, 10 per page; ?role=, ?department=, ?batch_year=, ?fields=, ?limit= and ?after= (see X-Next-Cursor)"""
     try:
-        users = User.query.all()
+        return USERS_LISTING.respond(db.session)
+    except BadListingRequest as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@app.route("/discover", methods=["GET"])
+def discover_users():
+    """
+    Skill-based discovery, e.g. /discover?skills=kubernetes,docker&department=CS&batch_from=2018&batch_to=2020
+    Every filter given must match. Results are ordered by user id; pass
+    next_cursor back as ?after= for the next page.
+    """
+    try:
+        skills = [s for arg in request.args.getlist('skills') for s in arg.split(',') if s.strip()]
+        after = request.args.get('after', type=int)
+        limit = request.args.get('limit', DISCOVER_LIMIT, type=int)
+
+        skill_index.ensure_fresh(db.session)
+        ids, total, next_cursor = skill_index.search(
+            skills=skills,
+            department=request.args.get('department'),
+            batch_from=request.args.get('batch_from', type=int),
+            batch_to=request.args.get('batch_to', type=int),
+            role=request.args.get('role'),
+            after=after,
+            limit=limit
+        )
+
+        rows = db.session.query(
+            User.id, User.username, User.role, User.department, User.batch_year
+        ).filter(User.id.in_(ids)).all() if ids else []
+        by_id = {r.id: r for r in rows}
+
+        results = [{
+            "id": i,
+            "username": by_id[i].username,
+            "role": by_id[i].role,
+            "department": by_id[i].department,
+            "batch_year": by_id[i].batch_year,
+            "skills": skill_index.skills_of(i)
+        } for i in ids if i in by_id]
+
+        return jsonify({
+            "results": results,
+            "total": total,
+            "next_cursor": next_cursor
+        }), 200
         
-        user_list = []
-        for user in users:
-            user_list.append({
-                "username": user.username,
-                "email": user.email,
-                "role": user.role.lower() if user.role else "student"
-            })
+    except Exception as e:
+        print(f"❌ Discover error: {str(e)}")
+        return jsonify({"message": str(e)}), 500
 
-        # Sort by role (Alumni first)
-        user_list.sort(key=lambda x: x['role'] != 'alumni')
+@app.route("/recommend-mentors/<int:student_id>", methods=["GET"])
+def recommend_mentors(student_id):
+    """
+    Best matching alumni for a student, from the precomputed table (read
+    only: new and changed students are scored by the background thread
+    within RECOMMEND_INTERVAL seconds, an empty list until then)
+    """
+    try:
+        limit = max(1, min(request.args.get('limit', recommendations.TOP_K, type=int), recommendations.TOP_K))
+        rows = db.session.query(
+            MentorRecommendation.score,
+            MentorRecommendation.shared_skills,
+            User.id, User.username, User.email, User.role, User.department, User.batch_year
+        ).join(User, User.id == MentorRecommendation.alumni_id).filter(
+            MentorRecommendation.student_id == student_id
+        ).order_by(MentorRecommendation.rank).limit(limit).all()
 
-        return jsonify(user_list[:10])
+        return jsonify([{
+            "id": r.id,
+            "username": r.username,
+            "email": r.email,
+            "role": r.role.lower() if r.role else "alumni",
+            "department": r.department,
+            "batch_year": r.batch_year,
+            "score": r.score,
+            "shared_skills": [s for s in (r.shared_skills or "").split(", ") if s]
+        } for r in rows]), 200
+        
     except Exception as e:
-        return jsonify({"error": str(e)}), 500
+        db.session.rollback()
+        print(f"❌ Recommend mentors error: {str(e)}")
+        return jsonify({"message": str(e)}), 500
 
 # --- CHAT ROUTES ---
 
 @app.route("/chat-users/<int:current_user_id>", methods=["GET"])
 def get_chat_users(current_user_id):
-    """Fetches all unique users who have message history with the logged-in user"""
+    """
+    Fetches all unique users who have message history with the logged-in user,
+    or with ?search= any matching user (same index as /search-users)
+    """
+    current_user_id = acting_user_id(current_user_id)
+    search_query = request.args.get('search', '').strip()
+    if search_query:
+        return search_users_response(search_query, current_user_id)
     try:
-        sent_ids = db.session.query(Message.receiver_id).filter(Message.sender_id == current_user_id).all()
-        received_ids = db.session.query(Message.sender_id).filter(Message.receiver_id == current_user_id).all()
-
-        history_ids = {id_tuple[0] for id_tuple in sent_ids} | {id_tuple[0] for id_tuple in received_ids}
-
-        if current_user_id in history_ids:
-            history_ids.remove(current_user_id)
-
-        if not history_ids:
-            return jsonify([]), 200
-
-        chat_partners = User.query.filter(User.id.in_(history_ids)).all()
+        # One indexed query: most recent conversation first, with preview and unread count
+        rows = db.session.query(
+            Conversation.partner_id,
+            Conversation.last_message_id,
+            Conversation.last_sender_id,
+            Conversation.last_snippet,
+            Conversation.last_message_at,
+            Conversation.unread_count,
+            User.username,
+            User.role,
+            User.department
+        ).join(User, User.id == Conversation.partner_id).filter(
+            Conversation.user_id == current_user_id
+        ).order_by(Conversation.last_message_id.desc()).all()
 
         return jsonify([{
-            "id": u.id,
-            "username": u.username,
-            "role": u.role,
-            "dept": u.department
-        } for u in chat_partners]), 200
+            "id": r.partner_id,
+            "username": r.username,
+            "role": r.role,
+            "dept": r.department,
+            "last_message": r.last_snippet,
+            "last_message_id": r.last_message_id,
+            "last_sender": r.last_sender_id,
+            "last_time": r.last_message_at.strftime("%H:%M") if r.last_message_at else None,
+            "unread": r.unread_count
+        } for r in rows]), 200
 
     except Exception as e:
         print(f"❌ Sidebar Error: {str(e)}")
         return jsonify({"message": "Failed to load chat history"}), 500
 
+def write_messages(items):
+    """
+    Insert a batch of {"sender", "receiver", "content", "client_id"} messages in one
+    transaction; returns their ids. Open streams get them from the
+    message tail (see publish_new_messages), in every worker.
+    """
+    with app.app_context():
+        try:
+            # One multi-row INSERT ... RETURNING for the whole batch, plus
+            # one conversations upsert per side
+            msgs = message_service.send_many(db.session, items)
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+        return [msg.id for msg in msgs]
+
+# Group commits for /send-message when MESSAGE_WRITE_MODE is group or
+# queued (see write_behind.py); None in the default sync mode
+message_writer = write_behind.writer_for(write_messages)
+
 @app.route("/send-message", methods=["POST"])
 def send_message():
-    """Save a new message"""
+    """
+    Save a new message. 202 when it is accepted but not yet committed
+    (MESSAGE_WRITE_MODE=queued, or a group commit that timed out): resend
+    with the returned client_id and it is stored at most once.
+    """
+    data = request.get_json(silent=True) or {}
+    sender_id = acting_user_id(data.get('sender'))
+    if data.get('receiver') is None or data.get('content') is None:
+        # Checked up front: a queued message has no later chance to report it
+        return jsonify({"message": "receiver and content are required"}), 400
     try:
-        data = request.get_json()
-        
-        new_msg = Message(
-            sender_id=data['sender'],
-            receiver_id=data['receiver'],
-            content=data['content']
-        )
-        
-        db.session.add(new_msg)
-        db.session.commit()
+        client_id = message_service.client_id(data.get('client_id'))
+    except ValueError as e:
+        return jsonify({"message": str(e)}), 400
+    try:
+        item = {"sender": sender_id, "receiver": data['receiver'], "content": data['content'],
+                "client_id": client_id}
+        if message_writer is None:
+            write_messages([item])
+        else:
+            message_writer.submit(item)
         
-        print(f"✅ Message sent: User {data['sender']} → User {data['receiver']}")
-        return jsonify({"ok": True}), 201
+        print(f"✅ Message sent: User {sender_id} → User {data['receiver']}")
+        if message_writer is not None and message_writer.mode == "queued":
+            return jsonify({"ok": True, "queued": True, "client_id": client_id}), 202
+        return jsonify({"ok": True, "client_id": client_id}), 201
         
+    except write_behind.CommitTimeout:
+        # The batch may still commit; a resend with client_id cannot duplicate it
+        return jsonify({"ok": True, "queued": True, "client_id": client_id}), 202
+    except write_behind.WriterBusy:
+        return jsonify({"message": "Server busy, please try again shortly"}), 503, {
+            "Retry-After": str(write_behind.RETRY_AFTER_SECONDS)
+        }
     except Exception as e:
         db.session.rollback()
         print(f"❌ Send message error: {str(e)}")
         return jsonify({"message": str(e)}), 500
 
+@app.route("/mark-read/<int:user_id>/<int:partner_id>", methods=["POST"])
+def mark_read(user_id, partner_id):
+    """Clear the unread count for one conversation (optionally up to ?message_id=)"""
+    user_id = acting_user_id(user_id)
+    try:
+        convo = Conversation.query.get((user_id, partner_id))
+        if not convo:
+            return jsonify({"unread": 0}), 200
+
+        read_up_to = request.args.get('message_id', type=int) or convo.last_message_id
+        read_up_to = min(read_up_to, convo.last_message_id)
+        if read_up_to > convo.last_read_message_id:
+            if read_up_to == convo.last_message_id:
+                unread = 0
+            else:
+                unread = Message.query.filter(
+                    Message.sender_id == partner_id,
+                    Message.receiver_id == user_id,
+                    Message.id > read_up_to
+                ).count() + message_archive.count_after(db.session, partner_id, user_id, read_up_to)
+            convo.last_read_message_id = read_up_to
+            convo.unread_count = unread
+            db.session.commit()
+
+        return jsonify({"unread": convo.unread_count}), 200
+        
+    except Exception as e:
+        db.session.rollback()
+        print(f"❌ Mark read error: {str(e)}")
+        return jsonify({"message": str(e)}), 500
+
+MESSAGE_PAGE_SIZE = 50
+MESSAGE_PAGE_MAX = 200
+
+def serialize_message(m):
+    return {
+        "id": m.id,
+        "sender": m.sender_id,
+        "content": m.content,
+        "time": m.timestamp.strftime("%H:%M")
+    }
+
 @app.route("/get-messages/<int:u1>/<int:u2>", methods=["GET"])
 def get_messages(u1, u2):
-    """Get chat history between two users"""
+    """
+    Get chat history between two users, one page at a time.
+
+    Query params (message ids are the cursor, since timestamps can tie):
+        after  - only messages newer than this id (used for polling)
+        before - a page of history older than this id (used for scrollback)
+        limit  - page size, defaults to MESSAGE_PAGE_SIZE
+    Without a cursor the most recent page is returned. Archived history is
+    included (message_service.page reads both tables).
+    """
+    u1 = acting_user_id(u1)
     try:
-        msgs = Message.query.filter(
-            ((Message.sender_id == u1) & (Message.receiver_id == u2)) |
-            ((Message.sender_id == u2) & (Message.receiver_id == u1))
-        ).order_by(Message.timestamp.asc()).all()
-        
-        return jsonify([{
-            "sender": m.sender_id,
-            "content": m.content,
-            "time": m.timestamp.strftime("%H:%M")
-        } for m in msgs]), 200
+        after = request.args.get('after', type=int)
+        before = request.args.get('before', type=int)
+        limit = request.args.get('limit', MESSAGE_PAGE_SIZE, type=int)
+        limit = max(1, min(limit, MESSAGE_PAGE_MAX))
+
+        if after is not None:
+            # Oldest-first so a burst larger than one page is delivered in order
+            rows = message_service.page(db.session, u1, u2, after=after, limit=limit + 1)
+            has_more = len(rows) > limit
+            msgs = rows[:limit]
+        else:
+            rows = message_service.page(db.session, u1, u2, before=before, limit=limit + 1)
+            has_more = len(rows) > limit
+            msgs = list(reversed(rows[:limit]))
+
+        return jsonify({
+            "messages": [serialize_message(m) for m in msgs],
+            # Newest id seen; pass back as ?after= on the next poll
+            "next_cursor": msgs[-1].id if msgs else after,
+            # Oldest id in this page; pass back as ?before= to load older history
+            "prev_cursor": msgs[0].id if msgs else before,
+            "has_more": has_more
+        }), 200
         
     except Exception as e:
         print(f"❌ Get messages error: {str(e)}")
         return jsonify({"message": str(e)}), 500
 
+STREAM_KEEPALIVE_SECONDS = 15
+STREAM_REPLAY_LIMIT = 200
+# How often each worker looks for messages committed by any worker or app
+STREAM_POLL_MS = int(os.environ.get("MESSAGE_STREAM_POLL_MS", 500))
+
+def publish_new_messages(after_id):
+    """
+    Publish messages with an id above after_id to this worker's streams,
+    both sides of each conversation; returns the highest id seen
+    """
+    while True:
+        rows = Message.query.filter(Message.id > after_id).order_by(Message.id.asc()) \
+            .limit(STREAM_REPLAY_LIMIT).all()
+        for m in rows:
+            payload = serialize_message(m)
+            payload["receiver"] = m.receiver_id
+            broker.publish(m.receiver_id, payload)
+            if m.sender_id != m.receiver_id:
+                broker.publish(m.sender_id, payload)
+            after_id = m.id
+        if len(rows) < STREAM_REPLAY_LIMIT:
+            return after_id
+
+def _tail_messages_forever():
+    # SQLite commits one writer at a time, so ids become visible in order
+    # and one high-water id is enough. It keeps moving while no stream is
+    # open: a stream subscribes first and replays from the database, so
+    # only what commits after that has to come from here.
+    last_id = None
+    while True:
+        with app.app_context():
+            try:
+                if last_id is None:
+                    last_id = db.session.query(db.func.max(Message.id)).scalar() or 0
+                else:
+                    last_id = publish_new_messages(last_id)
+            except Exception as e:
+                print(f"❌ Message tail error: {str(e)}")
+            finally:
+                db.session.remove()
+        time.sleep(STREAM_POLL_MS / 1000)
+
+def format_sse(payload, event="message"):
+    return f"id: {payload['id']}\nevent: {event}\ndata: {json.dumps(payload)}\n\n"
+
+@app.route("/stream/<int:user_id>", methods=["GET"])
+def stream_messages(user_id):
+    """
+    Server-Sent Events channel delivering new messages for user_id
+    within MESSAGE_STREAM_POLL_MS of their commit, whichever worker or
+    app wrote them (each worker tails the messages table into its
+    broker). Browsers reconnect automatically with Last-Event-ID, and
+    anything missed in between is replayed first. EventSource cannot set
+    headers, so the session token goes in ?token=.
+
+    Every open stream occupies a worker for as long as the tab is open:
+    run sapp.py under an async worker class, e.g.
+    `gunicorn -k gevent sapp:app` (or `-k gthread --threads 100`).
+    Plain sync workers are used up by a handful of idle tabs.
+    """
+    user_id = acting_user_id(user_id)
+    last_event_id = request.headers.get("Last-Event-ID", type=int)
+    if last_event_id is None:
+        last_event_id = request.args.get("after", type=int)
+
+    # Subscribe before replaying so nothing committed in between is lost
+    q = broker.subscribe(user_id)
+
+    missed = []
+    if last_event_id is not None:
+        try:
+            rows = Message.query.filter(
+                ((Message.sender_id == user_id) | (Message.receiver_id == user_id)) &
+                (Message.id > last_event_id)
+            ).order_by(Message.id.asc()).limit(STREAM_REPLAY_LIMIT).all()
+            for m in rows:
+                payload = serialize_message(m)
+                payload["receiver"] = m.receiver_id
+                missed.append(payload)
+        except Exception as e:
+            print(f"❌ Stream replay error: {str(e)}")
+        finally:
+            db.session.remove()
+
+    def generate():
+        sent_id = last_event_id or 0
+        try:
+            yield f"retry: 3000\n\n"
+            for payload in missed:
+                sent_id = payload["id"]
+                yield format_sse(payload)
+            while True:
+                try:
+                    payload = q.get(timeout=STREAM_KEEPALIVE_SECONDS)
+                except queue.Empty:
+                    yield ": keepalive\n\n"
+                    continue
+                if q.overflowed:
+                    # Events were dropped: end the stream so the browser
+                    # reconnects from sent_id and the replay fills the gap
+                    return
+                if payload["id"] <= sent_id:
+                    continue  # already delivered by the replay
+                sent_id = payload["id"]
+                yield format_sse(payload)
+        finally:
+            broker.unsubscribe(user_id, q)
+
+    return Response(generate(), mimetype="text/event-stream", headers={
+        "Cache-Control": "no-cache",
+        "X-Accel-Buffering": "no"
+    })
+
 @app.route("/search-users", methods=["GET"])
 def search_users():
     query = request.args.get('q', '')
     current_id = request.args.get('me', type=int)
     
-    if not query:
+    if not query.strip():
         return jsonify([])
 
-    users = User.query.filter(
-        User.username.ilike(f"%{query}%"),
-        User.id != current_id
-    ).all()
-    
-    return jsonify([{
-        "id": u.id,
-        "username": u.username,
-        "role": u.role,
-        "dept": u.department
-    } for u in users]), 200
+    return search_users_response(query, current_id)
+
+def search_users_response(query, exclude_id):
+    """Ranked prefix search over username, department, batch year and skills"""
+    try:
+        limit = request.args.get('limit', search_index.SEARCH_LIMIT, type=int)
+        ids = search_index.search_user_ids(db.session, query, limit=limit, exclude_id=exclude_id)
+        if not ids:
+            return jsonify([]), 200
+
+        rows = db.session.query(User.id, User.username, User.role, User.department).filter(
+            User.id.in_(ids)
+        ).all()
+        by_id = {r.id: r for r in rows}
+
+        return jsonify([{
+            "id": by_id[i].id,
+            "username": by_id[i].username,
+            "role": by_id[i].role,
+            "dept": by_id[i].department
+        } for i in ids if i in by_id]), 200
+        
+    except Exception as e:
+        db.session.rollback()
+        print(f"❌ Search users error: {str(e)}")
+        return jsonify({"message": str(e)}), 500
 
 # --- TEST SETUP ROUTE ---
 
@@ -626,12 +2006,7 @@ def setup_test():
         # Create sample message
         existing_msg = Message.query.filter_by(sender_id=user_a.id, receiver_id=user_b.id).first()
         if not existing_msg:
-            init_msg = Message(
-                sender_id=user_a.id,
-                receiver_id=user_b.id,
-                content="Hello! This is our chat history."
-            )
-            db.session.add(init_msg)
+            message_service.send(db.session, user_a.id, user_b.id, "Hello! This is our chat history.")
         
         # Create sample events for testing calendar
         sample_events = [
@@ -679,18 +2054,33 @@ def setup_test():
                 db.session.add(new_event)
         
         db.session.commit()
+        reconcile_counters()
+        response_cache.invalidate("users", "events")
 
         return f"✅ Test setup complete! Users created (IDs: {user_a.id}, {user_b.id}) and sample events added."
     except Exception as e:
         db.session.rollback()
         return f"❌ Error: {str(e)}"
 
+# --- SCHEMA ---
+
+# Tables, columns and indexes added since the database was created
+# (messages.client_id, events.recurrence, ...), for every way the app is
+# started - gunicorn imports this module and never runs __main__
+with app.app_context():
+    if not message_service.prepare_schema(db.engine, db.metadata.sorted_tables, database.ALAPP_LEGACY_PATH):
+        print("⚠️  Schema not updated: messages still need 12_migrate_messages.py")
+
 # --- MAIN ---
 
 if __name__ == "__main__":
     with app.app_context():
-        db.create_all()
-        db.session.commit()
+        if message_service.is_legacy(db.session):
+            print("❌ messages still has alapp.py's old layout - run 12_migrate_messages.py first")
+            raise SystemExit(1)
+        if message_service.legacy_file_pending(db.session, database.ALAPP_LEGACY_PATH):
+            print(f"❌ {database.ALAPP_LEGACY_PATH} still holds alapp.py's old data - run 12_migrate_messages.py first")
+            raise SystemExit(1)
         print("="*60)
         print("🚀 Alumni Network Backend Server")
         print("="*60)
@@ -0,0 +1,139 @@
+"""
+Full-text user search (SQLite FTS5) for /search-users and /chat-users?search=.
+
+users_fts holds one row per user (rowid = users.id) with the username,
+department, batch year and a space separated list of skills. Triggers on
+users and skills keep it in sync for every writer - signup,
+update_profile, alapp.py and bulk imports alike - so nothing in the
+request path has to maintain it by hand.
+
+Queries are matched per word as prefixes ("ali cs" finds "Alice_Alumni"
+in "CS"; underscores split words) and ranked with bm25, username weighted highest.
+"""
+
+import re
+import threading
+
+from sqlalchemy import text
+
+SEARCH_LIMIT = 20
+SEARCH_LIMIT_MAX = 50
+
+# bm25 column weights: username, department, batch_year, skills
+_BM25_WEIGHTS = "10.0, 2.0, 2.0, 4.0"
+
+_SKILLS_OF = "(SELECT group_concat(skill_name, ' ') FROM skills WHERE user_id = {ref}.user_id)"
+
+_SCHEMA = [
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS users_fts USING fts5(
+        username, department, batch_year, skills,
+        tokenize = 'unicode61',
+        prefix = '2 3'
+    )
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS users_fts_insert AFTER INSERT ON users BEGIN
+        INSERT INTO users_fts (rowid, username, department, batch_year, skills)
+        VALUES (new.id, new.username, new.department, new.batch_year, '');
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS users_fts_update
+    AFTER UPDATE OF username, department, batch_year ON users BEGIN
+        UPDATE users_fts SET username = new.username, department = new.department,
+                             batch_year = new.batch_year
+        WHERE rowid = new.id;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS users_fts_delete AFTER DELETE ON users BEGIN
+        DELETE FROM users_fts WHERE rowid = old.id;
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS users_fts_skill_insert AFTER INSERT ON skills BEGIN
+        UPDATE users_fts SET skills = coalesce({_SKILLS_OF.format(ref="new")}, '')
+        WHERE rowid = new.user_id;
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS users_fts_skill_delete AFTER DELETE ON skills BEGIN
+        UPDATE users_fts SET skills = coalesce({_SKILLS_OF.format(ref="old")}, '')
+        WHERE rowid = old.user_id;
+    END
+    """,
+]
+
+_TRIGGERS = ("users_fts_insert", "users_fts_update", "users_fts_delete",
+             "users_fts_skill_insert", "users_fts_skill_delete")
+
+_ready = False
+_lock = threading.Lock()
+
+
+def _has_skills(session):
+    # chat.py / alapp.py databases may not have a skills table
+    return session.execute(text(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'skills'"
+    )).first() is not None
+
+
+def rebuild(session):
+    """Repopulate users_fts from users (and skills when that table exists)"""
+    skills = "coalesce((SELECT group_concat(s.skill_name, ' ') FROM skills s WHERE s.user_id = u.id), '')" \
+        if _has_skills(session) else "''"
+    session.execute(text("DELETE FROM users_fts"))
+    session.execute(text(f"""
+        INSERT INTO users_fts (rowid, username, department, batch_year, skills)
+        SELECT u.id, u.username, u.department, u.batch_year, {skills}
+        FROM users u
+    """))
+
+
+def ensure_index(session):
+    """Create the FTS table and triggers if missing, backfilling when (re)created"""
+    global _ready
+    if _ready:
+        return
+    with _lock:
+        if _ready:
+            return
+        has_skills = _has_skills(session)
+        schema = _SCHEMA if has_skills else _SCHEMA[:4]
+        triggers = _TRIGGERS if has_skills else _TRIGGERS[:3]
+
+        present = {row[0] for row in session.execute(text(
+            "SELECT name FROM sqlite_master WHERE name = 'users_fts' OR name LIKE 'users_fts_%'"
+        ))}
+        if "users_fts" not in present or not all(t in present for t in triggers):
+            # Also covers a drop_all() that removed users/skills (and their triggers)
+            for statement in schema:
+                session.execute(text(statement))
+            rebuild(session)
+            session.commit()
+            print("🔎 User search index built")
+        _ready = True
+
+
+def to_match_query(raw):
+    """'ali  cs-2020' -> '"ali"* "cs"* "2020"*' (every word must prefix-match)"""
+    words = re.findall(r"\w+", raw or "")
+    return " ".join(f'"{w}"*' for w in words[:8])
+
+
+def search_user_ids(session, raw, limit=SEARCH_LIMIT, exclude_id=None):
+    """Best matching user ids, best first"""
+    match = to_match_query(raw)
+    if not match:
+        return []
+    ensure_index(session)
+
+    limit = max(1, min(limit, SEARCH_LIMIT_MAX))
+    rows = session.execute(text(f"""
+        SELECT rowid FROM users_fts
+        WHERE users_fts MATCH :match AND rowid != :exclude
+        ORDER BY bm25(users_fts, {_BM25_WEIGHTS})
+        LIMIT :limit
+    """), {"match": match, "exclude": exclude_id if exclude_id is not None else -1, "limit": limit})
+    return [row[0] for row in rows]
@@ -0,0 +1,222 @@
+"""
+In-memory inverted index for skill-based alumni discovery (/discover).
+
+Every posting list is a sorted list of user ids: one per normalized
+skill, department, batch year and role. A query intersects the lists it
+needs, smallest first, so "kubernetes + CS + 2018-2020" costs about the
+size of the rarest list, not the size of the directory.
+
+update_profile and signup refresh a single user in place. Other worker
+processes pick the change up at their next full rebuild, which happens
+lazily once the index is older than max_age seconds.
+"""
+
+import re
+import threading
+import time
+from bisect import bisect_left, bisect_right, insort
+
+from sqlalchemy import text
+
+DISCOVER_LIMIT = 20
+DISCOVER_LIMIT_MAX = 100
+
+
+def normalize(value):
+    """'  Machine   Learning ' -> 'machine learning'"""
+    return re.sub(r"\s+", " ", str(value or "")).strip().lower()
+
+
+def parse_year(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def intersect(lists):
+    """Intersection of sorted id lists, galloping through the larger ones"""
+    if not lists:
+        return []
+    lists = sorted(lists, key=len)
+    result = lists[0]
+    for other in lists[1:]:
+        if not result:
+            break
+        kept = []
+        lo = 0
+        for uid in result:
+            lo = bisect_left(other, uid, lo)
+            if lo == len(other):
+                break
+            if other[lo] == uid:
+                kept.append(uid)
+        result = kept
+    return list(result)
+
+
+def union(lists):
+    merged = set()
+    for ids in lists:
+        merged.update(ids)
+    return sorted(merged)
+
+
+def _remove(postings, key, uid):
+    ids = postings.get(key)
+    if not ids:
+        return
+    i = bisect_left(ids, uid)
+    if i < len(ids) and ids[i] == uid:
+        del ids[i]
+        if not ids:
+            del postings[key]
+
+
+def _add(postings, key, uid):
+    ids = postings.setdefault(key, [])
+    i = bisect_left(ids, uid)
+    if i == len(ids) or ids[i] != uid:
+        insort(ids, uid)
+
+
+class SkillIndex:
+    def __init__(self, max_age=300):
+        self.max_age = max_age
+        self._lock = threading.RLock()
+        self._built_at = None
+        self._clear()
+
+    def _clear(self):
+        self.by_skill = {}
+        self.by_department = {}
+        self.by_year = {}
+        self.by_role = {}
+        self.users = {}         # id -> {"department", "batch_year", "role", "skills"}
+
+    @property
+    def lock(self):
+        """Hold while reading the posting lists directly (see recommendations.py)"""
+        return self._lock
+
+    # --- building ---
+
+    def _set_user(self, uid, department, batch_year, role, skills):
+        self._drop_user(uid)
+        names = []
+        seen = set()
+        for skill in skills:
+            key = normalize(skill)
+            if key and key not in seen:
+                seen.add(key)
+                names.append(str(skill).strip())
+                _add(self.by_skill, key, uid)
+        if normalize(department):
+            _add(self.by_department, normalize(department), uid)
+        if parse_year(batch_year) is not None:
+            _add(self.by_year, parse_year(batch_year), uid)
+        if normalize(role):
+            _add(self.by_role, normalize(role), uid)
+        self.users[uid] = {
+            "department": department,
+            "batch_year": batch_year,
+            "role": role,
+            "skills": names
+        }
+
+    def _drop_user(self, uid):
+        old = self.users.pop(uid, None)
+        if old is None:
+            return
+        for skill in old["skills"]:
+            _remove(self.by_skill, normalize(skill), uid)
+        _remove(self.by_department, normalize(old["department"]), uid)
+        if parse_year(old["batch_year"]) is not None:
+            _remove(self.by_year, parse_year(old["batch_year"]), uid)
+        _remove(self.by_role, normalize(old["role"]), uid)
+
+    def _load_rows(self, session, user_id=None):
+        where = "WHERE u.id = :uid" if user_id is not None else ""
+        rows = session.execute(text(f"""
+            SELECT u.id, u.department, u.batch_year, u.role, s.skill_name
+            FROM users u LEFT JOIN skills s ON s.user_id = u.id AND s.skill_name != ''
+            {where}
+            ORDER BY u.id
+        """), {"uid": user_id})
+        grouped = {}
+        for uid, department, batch_year, role, skill in rows:
+            entry = grouped.setdefault(uid, [department, batch_year, role, []])
+            if skill:
+                entry[3].append(skill)
+        return grouped
+
+    def rebuild(self, session):
+        grouped = self._load_rows(session)
+        with self._lock:
+            self._clear()
+            for uid, (department, batch_year, role, skills) in grouped.items():
+                self._set_user(uid, department, batch_year, role, skills)
+            self._built_at = time.monotonic()
+
+    def ensure_fresh(self, session, max_age=None):
+        """Rebuild if never built, invalidated or older than max_age (default self.max_age)"""
+        max_age = self.max_age if max_age is None else max_age
+        with self._lock:
+            stale = self._built_at is None or time.monotonic() - self._built_at > max_age
+        if stale:
+            self.rebuild(session)
+
+    def invalidate(self):
+        """Rebuild on the next query (after bulk changes)"""
+        with self._lock:
+            self._built_at = None
+
+    def refresh_user(self, session, user_id):
+        """Re-read one user after signup or a profile change"""
+        if self._built_at is None:
+            return  # nothing built yet; the first query loads everything
+        grouped = self._load_rows(session, user_id)
+        with self._lock:
+            if user_id in grouped:
+                self._set_user(user_id, *grouped[user_id])
+            else:
+                self._drop_user(user_id)
+
+    # --- querying ---
+
+    def search(self, skills=(), department=None, batch_from=None, batch_to=None,
+               role=None, after=None, limit=DISCOVER_LIMIT):
+        """(page of user ids, total matches, cursor for the next page or None)"""
+        with self._lock:
+            lists = []
+            for skill in skills:
+                lists.append(self.by_skill.get(normalize(skill), []))
+            if department:
+                lists.append(self.by_department.get(normalize(department), []))
+            if role:
+                lists.append(self.by_role.get(normalize(role), []))
+            if batch_from is not None or batch_to is not None:
+                years = [
+                    ids for year, ids in self.by_year.items()
+                    if (batch_from is None or year >= batch_from) and (batch_to is None or year <= batch_to)
+                ]
+                lists.append(union(years))
+
+            if lists:
+                matches = intersect(lists)
+            else:
+                matches = sorted(self.users)
+
+        start = bisect_right(matches, after) if after is not None else 0
+        limit = max(1, min(limit, DISCOVER_LIMIT_MAX))
+        page = matches[start:start + limit]
+        next_cursor = page[-1] if start + limit < len(matches) else None
+        return page, len(matches), next_cursor
+
+    def skills_of(self, user_id):
+        with self._lock:
+            user = self.users.get(user_id)
+            return list(user["skills"]) if user else []
+
+
+skill_index = SkillIndex()
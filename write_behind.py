@@ -0,0 +1,208 @@
+"""
+Write-behind group commit for chat messages.
+
+With MESSAGE_WRITE_MODE=group or queued, /send-message hands the message
+to a GroupCommitWriter instead of committing it itself. One writer
+thread per process takes whatever is waiting - up to MESSAGE_BATCH_MAX
+messages, or what arrived within MESSAGE_FLUSH_MS of the first one - and
+writes it in a single transaction, so concurrent senders share one
+commit and one turn at SQLite's write lock.
+
+Durability levels (MESSAGE_WRITE_MODE):
+    sync   - no queue: every message commits on its own (default)
+    group  - the request waits until its batch has committed; nothing
+             confirmed (201/200) is ever lost. If the commit takes longer
+             than MESSAGE_SUBMIT_TIMEOUT (2s) the request answers 202
+             instead: the message may or may not be stored yet, and the
+             worker is free again instead of blocking behind the lock
+    queued - NOT DURABLE. The request returns 202 as soon as the message
+             is queued, and the queue is only in memory: a crash, an OOM
+             kill or SIGKILL loses every message still waiting - up to
+             MESSAGE_QUEUE_MAX accepted messages if the writer has fallen
+             behind. Only a clean exit (atexit, e.g. gunicorn's graceful
+             SIGTERM) drains it, for up to DRAIN_TIMEOUT. Use group where
+             accepted must mean stored.
+
+A 202 carries the message's client_id; sending it again with that
+client_id stores it at most once (see message_service.send_many).
+
+Messages are written in the order they were queued. If a batch fails,
+its messages are retried one by one so a single bad message only fails
+its own request.
+"""
+
+import atexit
+import os
+import queue
+import threading
+import time
+
+MODES = ("sync", "group", "queued")
+WRITE_MODE = os.environ.get("MESSAGE_WRITE_MODE", "sync").lower()
+FLUSH_MS = float(os.environ.get("MESSAGE_FLUSH_MS", 5))
+BATCH_MAX = int(os.environ.get("MESSAGE_BATCH_MAX", 200))
+QUEUE_MAX = int(os.environ.get("MESSAGE_QUEUE_MAX", 10000))
+SUBMIT_TIMEOUT = float(os.environ.get("MESSAGE_SUBMIT_TIMEOUT", 2))
+RETRY_AFTER_SECONDS = 1
+DRAIN_TIMEOUT = 10.0
+
+if WRITE_MODE not in MODES:
+    raise ValueError(f"MESSAGE_WRITE_MODE must be one of {', '.join(MODES)}, not {WRITE_MODE!r}")
+
+
+class WriterBusy(Exception):
+    """The queue is full (or shutting down); answer 503 and let the client retry"""
+
+
+class CommitTimeout(TimeoutError):
+    """group mode: the item was queued but not committed within the timeout"""
+
+
+class _Pending:
+    __slots__ = ("item", "done", "result", "error")
+
+    def __init__(self, item):
+        self.item = item
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+_STOP = object()
+
+
+class GroupCommitWriter:
+    """
+    write_batch - fn(items) that writes and commits a list of items in one
+                  transaction and returns one result per item
+    """
+
+    def __init__(self, write_batch, mode=WRITE_MODE, batch_max=BATCH_MAX,
+                 flush_ms=FLUSH_MS, queue_max=QUEUE_MAX, name="message-writer"):
+        if mode not in ("group", "queued"):
+            raise ValueError(f"GroupCommitWriter needs mode 'group' or 'queued', not {mode!r}")
+        self.write_batch = write_batch
+        self.mode = mode
+        self.batch_max = max(1, batch_max)
+        self.flush_delay = max(0.0, flush_ms) / 1000
+        self.queue_max = queue_max
+        self.name = name
+        self._closed = False
+        self._lock = threading.Lock()
+        self._stats = {"batches": 0, "written": 0, "failed": 0, "largest_batch": 0}
+        self._pid = None
+        atexit.register(self.close)
+
+    def _ensure_started(self):
+        # Started on first use in each process: a thread from before a
+        # gunicorn fork does not exist in the worker
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid != os.getpid():
+                self._queue = queue.Queue(maxsize=self.queue_max)
+                self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+                self._thread.start()
+                self._pid = os.getpid()
+
+    def submit(self, item, timeout=SUBMIT_TIMEOUT):
+        """
+        Queue one item. In group mode, block until it is committed and
+        return write_batch's result for it (or raise its error, or
+        CommitTimeout); in queued mode return None straight away.
+        """
+        if self._closed:
+            raise WriterBusy("Writer is shutting down")
+        self._ensure_started()
+        pending = _Pending(item)
+        try:
+            self._queue.put_nowait(pending)
+        except queue.Full:
+            raise WriterBusy("Message queue is full")
+        if self.mode == "queued":
+            return None
+        if not pending.done.wait(timeout):
+            raise CommitTimeout("Message was not committed in time")
+        if pending.error is not None:
+            raise pending.error
+        return pending.result
+
+    def _collect(self, first):
+        batch = [first]
+        deadline = time.monotonic() + self.flush_delay
+        while len(batch) < self.batch_max:
+            remaining = deadline - time.monotonic()
+            try:
+                pending = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if pending is _STOP:
+                self._queue.put(_STOP)   # finish this batch, then stop
+                break
+            batch.append(pending)
+        return batch
+
+    def _run(self):
+        while True:
+            first = self._queue.get()
+            if first is _STOP:
+                break
+            self._flush(self._collect(first))
+        # Anything that slipped in while close() was stopping us
+        leftovers = []
+        while True:
+            try:
+                pending = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if pending is not _STOP:
+                leftovers.append(pending)
+        for start in range(0, len(leftovers), self.batch_max):
+            self._flush(leftovers[start:start + self.batch_max])
+
+    def _flush(self, batch):
+        try:
+            results = self.write_batch([p.item for p in batch])
+            for pending, result in zip(batch, results):
+                pending.result = result
+        except Exception:
+            # One bad message must not fail everyone else's: retry them singly
+            for pending in batch:
+                try:
+                    pending.result = self.write_batch([pending.item])[0]
+                except Exception as e:
+                    pending.error = e
+                    print(f"❌ Message write failed: {e}")
+
+        failed = sum(1 for p in batch if p.error is not None)
+        with self._lock:
+            self._stats["batches"] += 1
+            self._stats["written"] += len(batch) - failed
+            self._stats["failed"] += failed
+            self._stats["largest_batch"] = max(self._stats["largest_batch"], len(batch))
+        for pending in batch:
+            pending.done.set()
+
+    def stats(self):
+        with self._lock:
+            queued = self._queue.qsize() if self._pid == os.getpid() else 0
+            return dict(self._stats, queued=queued, mode=self.mode)
+
+    def close(self, timeout=DRAIN_TIMEOUT):
+        """Stop accepting messages and write everything still queued"""
+        if self._closed:
+            return
+        self._closed = True
+        if self._pid != os.getpid():
+            return   # never used in this process
+        self._queue.put(_STOP)
+        self._thread.join(timeout)
+        if self._thread.is_alive():
+            print(f"⚠️  Message writer did not drain within {timeout}s ({self._queue.qsize()} queued)")
+
+
+def writer_for(write_batch, mode=WRITE_MODE, **options):
+    """A GroupCommitWriter for mode, or None in sync mode"""
+    if mode == "sync":
+        return None
+    return GroupCommitWriter(write_batch, mode, **options)